@@ -0,0 +1,143 @@
+import math
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.api.deps import token_user_id
+from app.core.rate_limit import RateLimitBackend, get_rate_limit_backend
+from app.database.async_connect import pool_stats
+from app.database.pool import PoolStats
+from app.settings.config import settings
+
+READ_METHODS = ("GET", "HEAD")
+# probes and scrapes must be answered while the worker sheds load, and are not a user's traffic
+EXEMPT_PATHS = frozenset({f"{settings.API_V1_STR}/health/live", f"{settings.API_V1_STR}/health/ready",
+                          settings.METRICS_PATH})
+
+
+class AdmissionController:
+    """
+    Decides whether a request may run, before any of its work is done.
+
+    Load shedding comes first: while `max_in_flight` requests are already
+    running in this worker, or checkouts from the DB pool waited more than
+    `max_pool_wait` seconds on average over the last `pool_wait_window`,
+    every request gets 503. Then the caller's read or write token bucket is
+    charged; an empty one gets 429. Both carry `Retry-After`, so clients
+    back off instead of waiting for a timeout. A limit of 0 turns it off.
+    """
+
+    def __init__(self, *, backend: RateLimitBackend, rate_limit: bool = True,
+                 read_rate: float, read_burst: int, write_rate: float, write_burst: int,
+                 max_in_flight: int, max_pool_wait: float, pool_wait_window: float,
+                 retry_after: int = 1, pool: PoolStats = pool_stats):
+        self.backend = backend
+        self.rate_limit = rate_limit
+        self.read_rate = read_rate
+        self.read_burst = read_burst
+        self.write_rate = write_rate
+        self.write_burst = write_burst
+        self.max_in_flight = max_in_flight
+        self.max_pool_wait = max_pool_wait
+        self.pool_wait_window = pool_wait_window
+        self.retry_after = retry_after
+        self.pool = pool
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.limited = 0
+        self.shed_in_flight = 0
+        self.shed_pool_wait = 0
+
+    def shed_reason(self) -> Optional[str]:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self.shed_in_flight += 1
+            return "Too many requests in progress"
+        if self.max_pool_wait and self.pool.recent_wait(self.pool_wait_window) > self.max_pool_wait:
+            self.shed_pool_wait += 1
+            return "Database is overloaded"
+        return None
+
+    async def admit(self, request: Request) -> Optional[Response]:
+        """None if the request may run, otherwise the response rejecting it."""
+        reason = self.shed_reason()
+        if reason is not None:
+            return JSONResponse({"detail": reason}, status_code=503,
+                                headers={"Retry-After": str(self.retry_after)})
+
+        if self.rate_limit:
+            user_id = token_user_id(request)
+            if user_id is not None:
+                caller = f"user:{user_id}"
+            else:
+                caller = f"ip:{request.client.host if request.client else ''}"
+            if request.method in READ_METHODS:
+                wait = await self.backend.take(f"read:{caller}", self.read_rate, self.read_burst)
+            else:
+                wait = await self.backend.take(f"write:{caller}", self.write_rate, self.write_burst)
+            if wait > 0:
+                self.limited += 1
+                return JSONResponse({"detail": "Rate limit exceeded"}, status_code=429,
+                                    headers={"Retry-After": str(max(1, math.ceil(wait)))})
+
+        self.admitted += 1
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rate_limited": self.limited,
+            "shed_in_flight": self.shed_in_flight,
+            "shed_pool_wait": self.shed_pool_wait,
+            "pool_wait_ms": self.pool.recent_wait(self.pool_wait_window) * 1000,
+            "backend": type(self.backend).__name__,
+        }
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+class AdmissionMiddleware:
+    """
+    Runs every HTTP request past `controller` and counts those in flight.
+    CORS preflights and `exempt_paths` (health probes, metrics) are let through.
+    """
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None,
+                 exempt_paths: frozenset = EXEMPT_PATHS):
+        self.app = app
+        self.controller = controller if controller is not None else admission
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = await self.controller.admit(Request(scope))
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+
+        self.controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.in_flight -= 1
+
+
+admission = AdmissionController(
+    backend=get_rate_limit_backend(),
+    rate_limit=settings.RATE_LIMIT_ENABLED,
+    read_rate=settings.RATE_LIMIT_READS_PER_SECOND,
+    read_burst=settings.RATE_LIMIT_READ_BURST,
+    write_rate=settings.RATE_LIMIT_WRITES_PER_SECOND,
+    write_burst=settings.RATE_LIMIT_WRITE_BURST,
+    max_in_flight=settings.LOAD_SHED_MAX_IN_FLIGHT,
+    max_pool_wait=settings.LOAD_SHED_POOL_WAIT_MS / 1000,
+    pool_wait_window=settings.LOAD_SHED_WINDOW_SECONDS,
+    retry_after=settings.LOAD_SHED_RETRY_AFTER_SECONDS,
+)
@@ -1,28 +1,62 @@
 
-from typing import Annotated
+import logging
+from typing import Annotated, AsyncGenerator, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
+from pydantic import ValidationError
 
 from app.settings.config import settings
-from app.database.async_connect import get_async_session
+from app.database.async_connect import (async_session_maker, pinned_to_primary, primary_bind,
+                                        route_reads_to_replica)
+from app.core.principals import principal_cache
 from app.models.user import User
 from app.schemas.users import TokenData
 
+logger = logging.getLogger(__name__)
+
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
 
-SessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+def token_user_id(request: Request) -> Optional[str]:
+    """`user_id` claim of a valid bearer token, without failing the request if there is none."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("user_id")
+    except InvalidTokenError:
+        return None
+
+
+async def get_routed_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session of one request: reads of GET/HEAD requests go to the read replica
+    (when configured and reachable), everything else to the primary. A user
+    whose request committed a write reads from the primary for the next
+    READ_YOUR_WRITES_SECONDS.
+    """
+    async with async_session_maker() as session:
+        user_id = token_user_id(request)
+        if request.method in ("GET", "HEAD"):
+            if not pinned_to_primary(user_id):
+                route_reads_to_replica(session)
+        else:
+            session.info["writer_id"] = user_id
+        yield session
+
+
+SessionDep = Annotated[AsyncSession, Depends(get_routed_session)]
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
 
-async def verify_access_token(token: str, credentials_exception, db: AsyncSession):
+def verify_access_token(token: str, credentials_exception) -> TokenData:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: UUID = payload.get("user_id")
@@ -30,22 +64,12 @@ async def verify_access_token(token: str, credentials_exception, db: AsyncSessio
         if user_id is None:
             raise credentials_exception
 
-        user = await db.execute(select(User).where(User.id == user_id))
-        user = user.scalar_one_or_none()
+        return TokenData(id=user_id)
 
-        if user is None:
-            raise credentials_exception
-
-        token_data = TokenData(id=user_id)
-        return token_data
-
-    except InvalidTokenError:
-        # oauth2_logger.error(f"Invalid JWT token: {token}")
-        print("Invalid JWT token")
-    except Exception as e:
-        # oauth2_logger.error(f"Error verifying access token: {e}")
-        raise HTTPException(status_code=404, detail=f"User not found: {e}")
-        # raise credentials_exception
+    except (InvalidTokenError, ValidationError):
+        # a signed token whose user_id is not a UUID is as invalid as a forged one
+        logger.info("Invalid JWT token")
+        raise credentials_exception
 
 async def get_current_user(session: SessionDep, token: TokenDep) -> User:
     credentials_exception = HTTPException(
@@ -53,24 +77,34 @@ async def get_current_user(session: SessionDep, token: TokenDep) -> User:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = await verify_access_token(token, credentials_exception, session)
-
-        user = await session.execute(
-            select(User).where(User.id == token.id)
-        )
-        user = user.scalar_one_or_none()
+    token_data = verify_access_token(token, credentials_exception)
+
+    # the signature is already verified - a cached user needs no database round trip
+    user = principal_cache.get(token_data.id)
+    if user is None:
+        try:
+            # from the primary: a user created a moment ago may not be on the replica yet
+            result = await session.execute(
+                select(User).where(User.id == token_data.id),
+                bind_arguments={"bind": primary_bind()},
+            )
+            user = result.scalar_one_or_none()
+        except Exception as e:
+            logger.error("Error getting current user: %r", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error getting current user",
+            )
         if not user:
-            print("User not found")
-            # oauth2_logger.error("Could not find user")
+            logger.warning("User %s from a valid token not found", token_data.id)
+            raise credentials_exception
 
-        return user
-    except Exception as e:
-        # oauth2_logger.error(f"Error getting current user: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error getting current user",
-        )
+        session.expunge(user)
+        principal_cache.set(user.id, user)
+
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
 
 
 CurrentUser = Annotated[User, Depends(get_current_user)]
@@ -81,4 +115,17 @@ async def get_current_active_superuser(current_user: CurrentUser) -> User:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+async def is_superuser_request(request: Request) -> bool:
+    """Whether the request carries the token of an active superuser, as `get_current_active_superuser` checks it."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    async with async_session_maker() as session:
+        try:
+            await get_current_active_superuser(await get_current_user(session, token))
+        except HTTPException:
+            return False
+    return True
@@ -1,8 +1,11 @@
 from fastapi import APIRouter
-from .routers import user, login, products
+from .routers import user, login, products, analytics, health, system
 
 api_router = APIRouter()
 
 api_router.include_router(login.router, tags=["login"])
 api_router.include_router(user.router, prefix="/users", tags=["users"])
 api_router.include_router(products.router, prefix="/products", tags=["products"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(health.router, prefix="/health", tags=["health"])
+api_router.include_router(system.router, prefix="/system", tags=["system"])
@@ -0,0 +1,68 @@
+import secrets
+import time
+
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.jobs import job_queue
+from app.core.metrics import (Gauge, finish_request, registry, request_duration, request_phase_duration,
+                              requests_in_flight, requests_total, start_request)
+from app.database.async_connect import pool_stats
+from app.settings.config import settings
+
+# route label of requests that did not reach an endpoint (404, rejected by admission control)
+UNMATCHED_ROUTE = "unmatched"
+
+registry.register(Gauge("db_pool_waiting", "Checkouts waiting for a database connection.",
+                        read=lambda: pool_stats.waiting))
+registry.register(Gauge("jobs_in_flight", "Background jobs being executed.", read=lambda: job_queue.in_flight))
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request in `app.core.metrics`: count by status code,
+    latency by route template (not the raw path, so ids do not multiply the
+    series) and the time it spent in the database, rendering and storage.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        phases, token = start_request()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            finish_request(token)
+            # set by the router once an endpoint matched
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            requests_total.inc((method, route, str(status_code)))
+            request_duration.observe((method, route), time.perf_counter() - started)
+            for phase, seconds in phases.items():
+                request_phase_duration.observe((route, phase), seconds)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Metrics in the Prometheus text format; with METRICS_TOKEN set, only for `Authorization: Bearer <token>`."""
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(token, settings.METRICS_TOKEN):
+            return PlainTextResponse("Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,75 @@
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.deps import is_superuser_request
+from app.api.metrics import UNMATCHED_ROUTE
+from app.core.metrics import request_queries
+from app.core.profiler import QueryProfile, finish_profile, start_profile
+from app.settings.config import settings
+
+logger = logging.getLogger("app.profiler")
+
+
+def profile_headers(profile: QueryProfile) -> dict:
+    repeated = profile.repeated(2)
+    return {
+        "X-Query-Count": str(profile.count),
+        "X-Query-Time-Ms": f"{profile.seconds * 1000:.1f}",
+        # distinct statements run more than once - N+1 candidates
+        "X-Query-Repeated": str(len(repeated)),
+        "Server-Timing": f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries"',
+    }
+
+
+class QueryProfilerMiddleware:
+    """
+    Profiles the SQL of every HTTP request: the statement count goes to the
+    `http_request_queries` metric, statements repeated QUERY_REPEAT_THRESHOLD
+    times are logged as N+1 candidates. For an active superuser sending
+    PROFILER_DEBUG_HEADER, the count, DB time and repeated statements come
+    back in response headers and every statement is logged.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.debug_header = settings.PROFILER_DEBUG_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug = any(name == self.debug_header for name, _ in scope["headers"])
+        # checked before profiling starts, so the user lookup is not part of the profile
+        if debug:
+            debug = await is_superuser_request(Request(scope))
+
+        profile, token = start_profile()
+
+        async def send_with_profile(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(profile_headers(profile))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile if debug else send)
+        finally:
+            finish_profile(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            request_queries.observe((route,), profile.count)
+            self.report(scope["method"], route, profile, debug)
+
+    @staticmethod
+    def report(method: str, route: str, profile: QueryProfile, debug: bool) -> None:
+        if settings.QUERY_REPEAT_THRESHOLD:
+            for sql, count, seconds in profile.repeated(settings.QUERY_REPEAT_THRESHOLD):
+                logger.warning("Possible N+1 in %s %s: %d executions, %.1f ms: %s",
+                               method, route, count, seconds * 1000, sql)
+        if debug:
+            logger.info("%s %s: %d statements, %.1f ms in the database", method, route, profile.count,
+                        profile.seconds * 1000)
+            for sql, count, seconds in profile.summary():
+                logger.info("  %4dx %8.1f ms  %s", count, seconds * 1000, sql)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, status, Query
+
+from app.schemas import analytics
+from app.api.deps import SessionDep, CurrentUser
+from app.core.analytics import load_rollups
+
+router = APIRouter()
+
+
+def _figures(receipts_count, total, payment_amount, rest, cash_count, cash_total, card_count, card_total):
+    return dict(
+        receipts_count=receipts_count,
+        total=round(total, 2),
+        payment_amount=round(payment_amount, 2),
+        rest=round(rest, 2),
+        cash=analytics.PaymentSplit(count=cash_count, total=round(cash_total, 2)),
+        card=analytics.PaymentSplit(count=card_count, total=round(card_total, 2)),
+    )
+
+
+@router.get("/sales", response_model=analytics.SalesReport)
+async def get_sales(*, session: SessionDep, current_user: CurrentUser,
+                    granularity: Literal["day", "hour"] = Query("day"),
+                    start_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS"),
+                    end_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS")) -> Any:
+    """
+    GET /analytics/sales
+    Опис: Зведені продажі користувача за період - з готових агрегатів по днях/годинах,
+    без перегляду всіх чеків. Агрегати оновлюються разом зі створенням чеків.
+    Вхідні параметри:
+    - `granularity` (str, опціонально): "day" (за замовчуванням) або "hour" - розмір інтервалу.
+    - `start_date` (datetime, опціонально): Початок періоду; інтервали рахуються в UTC,
+      тому період розширюється до початку дня/години, в який потрапляє `start_date`.
+    - `end_date` (datetime, опціонально): Кінець періоду (включно з інтервалом, в який він потрапляє).
+      Дати без часового поясу вважаються UTC.
+    Вихідні дані:
+    - Об'єкт JSON, що містить:
+        - `summary`: Підсумок за весь період.
+        - `buckets`: Список інтервалів від найстаршого:
+            - `bucket` (datetime): Початок інтервалу (UTC).
+            - `receipts_count` (int): Кількість чеків.
+            - `total` (float): Сума чеків.
+            - `payment_amount` (float): Сума оплат.
+            - `rest` (float): Сума решти.
+            - `cash`, `card`: Кількість і сума чеків за типом оплати."""
+    try:
+        rollups = await load_rollups(session, user_id=current_user.id, granularity=granularity,
+                                     start=start_date, end=end_date)
+    except Exception as err:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(err))
+
+    columns = ("receipts_count", "total", "payment_amount", "rest",
+               "cash_count", "cash_total", "card_count", "card_total")
+    rows = [[getattr(rollup, column) for column in columns] for rollup in rollups]
+    summary = [sum(values) for values in zip(*rows)] if rows else [0] * len(columns)
+
+    return analytics.SalesReport(
+        granularity=granularity,
+        start_date=start_date,
+        end_date=end_date,
+        summary=analytics.SalesFigures(**_figures(*summary)),
+        buckets=[analytics.SalesBucket(bucket=rollup.bucket, **_figures(*row)) for rollup, row in zip(rollups, rows)],
+    )
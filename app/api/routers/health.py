@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any, Dict
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.storage import get_storage
+from app.database.async_connect import ping_database
+from app.settings.config import settings
+
+router = APIRouter()
+
+
+@router.get("/live", response_model=Dict[str, Any])
+async def liveness() -> Any:
+    """
+    GET /health/live
+    Опис: Перевірка, що процес працює і обробляє запити. Не звертається до залежностей.
+    Вихідні дані:
+    - `status` (str): "ok"."""
+    return {"status": "ok"}
+
+
+@router.get("/ready", response_model=Dict[str, Any])
+async def readiness() -> Any:
+    """
+    GET /health/ready
+    Опис: Перевірка готовності приймати трафік: база даних відповідає на `SELECT 1`,
+    сховище чеків доступне. Кожна перевірка обмежена `DB_CONNECT_TIMEOUT_SECONDS`.
+    Вихідні дані:
+    - `status` (str): "ok" або "unavailable".
+    - `checks`: Результат кожної перевірки ("ok" або текст помилки).
+    Помилки:
+    - **503 Service Unavailable**: Хоча б одна залежність недоступна."""
+    timeout = settings.DB_CONNECT_TIMEOUT_SECONDS
+    results = await asyncio.gather(
+        ping_database(timeout),
+        asyncio.wait_for(get_storage().check(), timeout=timeout),
+        return_exceptions=True,
+    )
+    checks = {name: "ok" if result is None else repr(result)
+              for name, result in zip(("database", "storage"), results)}
+    ready = all(result is None for result in results)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ok" if ready else "unavailable", "checks": checks},
+    )
@@ -1,25 +1,41 @@
-import os
-from datetime import datetime
-from typing import Any, Optional, Dict
-from uuid import UUID
+from datetime import datetime, timezone
+from typing import Any, Optional, Dict, Literal
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, Header, HTTPException, status, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.schemas import  products
 from app.api.deps import SessionDep, CurrentUser
-from app.models.products import Receipt, Products
-from app.core.utils import upload_to_backblaze
+from app.models.products import Receipt
+from app.core.receipts import (insert_receipt, receipts_query, receipt_text_cache, price_receipt,
+                               copy_receipts, BulkReceipt, RENDER_RECEIPT_JOB, RENDER_RECEIPTS_JOB)
+from app.core.jobs import enqueue_job, enqueue_jobs, job_queue
+from app.core.json_stream import iter_json_items
+from app.core.export import export_query, export_ndjson, export_csv
+from app.core.receipt_json import documents_query, complete, receipt_page_json
+from app.core.search import search_receipts, MIN_QUERY_LENGTH
+from app.core.group_commit import receipt_batcher
+from app.core.idempotency import run_idempotent, request_hash, StoredResponse, IdempotencyKeyReused
+from app.database.async_connect import pinned_to_primary
+from app.settings.config import settings
+from app.core.pagination import encode_cursor, decode_cursor, estimate_count
+from app.core.receipt_text import render_receipt_lines
+from app.core.metrics import timed
 
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import cast, String, func
+from sqlalchemy import func, tuple_
 
 router = APIRouter()
 
 @router.post("/receipts/", response_model=products.ReceiptOutput)
 async def create_receipt(*, session: SessionDep, current_user: CurrentUser,
                          receipt_input: products.ReceiptInput,
+                         idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key",
+                                                                 min_length=1, max_length=255),
                          ) -> Any:
     """
     POST /receipts/
@@ -32,6 +48,12 @@ async def create_receipt(*, session: SessionDep, current_user: CurrentUser,
             - `quantity` (int): Кількість товару.
         - `payment_type` (str): Тип оплати ("cash" або "card").
         - `payment_amount` (float): Сума оплати.
+    - Заголовок `Idempotency-Key` (str, опціонально): Унікальний ключ запиту (наприклад, UUID).
+      Повторний запит із тим самим ключем протягом IDEMPOTENCY_KEY_TTL_SECONDS не створює
+      новий чек, а повертає відповідь першого запиту з заголовком `Idempotent-Replayed: true`;
+      дублікат, що надійшов, поки перший запит ще виконується, чекає на його результат.
+    Примітка: за RECEIPT_WRITE_MODE=batched чеки запитів без `Idempotency-Key` записуються
+    групами - один INSERT і один коміт на кілька запитів (`app.core.group_commit`).
     Вихідні дані:
     - Об'єкт JSON, що містить:
         - `id` (UUID): Унікальний ідентифікатор чека.
@@ -40,69 +62,157 @@ async def create_receipt(*, session: SessionDep, current_user: CurrentUser,
         - `total` (float): Загальна сума чека.
         - `rest` (float): Решта (здача).
         - `created_at` (datetime): Час створення чека.
-        - `recept_url` (str): URL чека."""
+        - `recept_url` (str | None): URL чека. Текстова версія формується у фоні,
+          тому одразу після створення тут `null` - URL з'явиться у
+          `GET /receipts/{receipt_id}/file-url`, щойно чек буде завантажено.
+    Помилки:
+    - **400 Bad Request**: Недостатня сума оплати або помилка збереження.
+    - **422 Unprocessable Entity**: `Idempotency-Key` уже використано з іншим тілом запиту."""
+    hashed = request_hash(receipt_input.model_dump_json()) if idempotency_key is not None else ""
+    # the key is claimed in the request's own transaction, so keyed requests are never batched
+    batched = settings.RECEIPT_WRITE_MODE == "batched" and idempotency_key is None
+
+    async def write() -> StoredResponse:
+        products_data, total, rest = price_receipt(receipt_input)
+        if rest < 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
+
+        if batched:
+            # written and committed together with other requests' receipts, render job included
+            receipt_id, created_at = await receipt_batcher.submit(user_id=current_user.id, receipt=BulkReceipt(
+                id=uuid4(), receipt_input=receipt_input, products_data=products_data, total=total, rest=rest))
+        else:
+            receipt_id, created_at = await insert_receipt(
+                session=session,
+                user_id=current_user.id,
+                total=total,
+                rest=rest,
+                payment_type=receipt_input.payment_type,
+                payment_amount=receipt_input.payment_amount,
+                products_data=products_data
+            )
+            # the text version is rendered and uploaded by a background job
+            await enqueue_job(session=session, kind=RENDER_RECEIPT_JOB,
+                              payload={"receipt_id": str(receipt_id), "line_width": 32})
+
+        # Prepare response
+        response = products.ReceiptOutput(
+            id=receipt_id,
+            products=products_data,
+            payment=products.ReceiptPayment(
+                type=receipt_input.payment_type,
+                amount=receipt_input.payment_amount
+            ),
+            total=total,
+            rest=rest,
+            created_at=created_at,
+            recept_url=None
+        )
+        return StoredResponse(hashed, status.HTTP_200_OK, response.model_dump_json())
+
+    replayed = False
     try:
-       total = 0
-       products_data = []
-       for product in receipt_input.products:
-           product_total = product.price * product.quantity
-           total += product_total
-           product_data = products.ProductOutput(
-               name=product.name,
-               price=product.price,
-               quantity=product.quantity,
-               total=product_total
-           )
-           products_data.append(product_data)
-
-       rest = round(receipt_input.payment_amount - total, 2)
-       if rest < 0:
-           raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds")
-
-       receipt = Receipt(
-           user_id=current_user.id,
-           total=round(total, 2),
-           rest=rest,
-           payment_type=receipt_input.payment_type,
-           payment_amount=receipt_input.payment_amount
-       )
-       session.add(receipt)
-       await session.commit()
-       await session.refresh(receipt)
-
-       # Create product entries
-       for product_data in products_data:
-           product = Products(
-               receipt_id=receipt.id,
-               name=product_data.name,
-               price=product_data.price,
-               quantity=product_data.quantity,
-               total=product_data.total
-           )
-           session.add(product)
-       await session.commit()
-
-       recept_url = await get_receipt_text_url(session=session, receipt_id=receipt.id, line_width=32)
-       # Prepare response
-       response = products.ReceiptOutput(
-           id=receipt.id,
-           products=products_data,
-           payment=products.ReceiptPayment(
-               type=receipt_input.payment_type,
-               amount=receipt_input.payment_amount
-           ),
-           total=round(total, 2),
-           rest=rest,
-           created_at=receipt.created_at,
-           recept_url=recept_url
-       )
+        if batched:
+            stored = await write()
+        elif idempotency_key is None:
+            stored = await write()
+            await session.commit()
+        else:
+            stored, replayed = await run_idempotent(session, user_id=current_user.id, key=idempotency_key,
+                                                    hashed=hashed, handler=write)
+    except IdempotencyKeyReused as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    except Exception as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
 
+    if not replayed and not batched:
+        job_queue.notify()
+    return Response(content=stored.body, status_code=stored.status_code, media_type="application/json",
+                    headers={"Idempotent-Replayed": "true"} if replayed else None)
 
-    except Exception as err:
+BULK_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        content_type: {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/ReceiptInput"}}}
+        for content_type in ("application/json", "application/x-ndjson")
+    },
+}
+
+
+@router.post("/receipts/bulk", response_model=Dict[str, Any], openapi_extra={"requestBody": BULK_REQUEST_BODY})
+async def create_receipts_bulk(*, request: Request, session: SessionDep, current_user: CurrentUser) -> Any:
+    """
+    POST /receipts/bulk
+    Опис: Створює багато чеків за один запит (наприклад, каса відправляє чеки,
+    накопичені офлайн). Тіло читається потоково, кожен чек перевіряється окремо,
+    а всі коректні чеки записуються однією транзакцією через `COPY`.
+    Текстові версії формуються у фоні, як і для `POST /receipts/`.
+    Вхідні параметри:
+    - Тіло запиту: JSON-масив об'єктів `ReceiptInput` (`Content-Type: application/json`)
+      або по одному об'єкту `ReceiptInput` на рядок (`Content-Type: application/x-ndjson`).
+      Не більше `BULK_RECEIPTS_MAX_ITEMS` чеків.
+    Вихідні дані:
+    - Словник, що містить:
+        - `created` (int): Кількість створених чеків.
+        - `rejected` (int): Кількість відхилених чеків.
+        - `items`: Результат для кожного чека в порядку надсилання:
+            - `index` (int): Позиція чека в запиті.
+            - `status` (str): "created", "rejected" (недостатньо коштів) або "invalid" (помилка формату).
+            - `id`, `total`, `rest`, `created_at`: Для створених чеків.
+            - `detail`: Причина для відхилених чеків.
+    Помилки:
+    - **400 Bad Request**: Тіло запиту не є коректним JSON-масивом.
+    - **413 Request Entity Too Large**: Забагато чеків в одному запиті."""
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    results = []
+    accepted = []
+    try:
+        async for value, error in iter_json_items(request.stream(), ndjson=ndjson):
+            index = len(results)
+            if index >= settings.BULK_RECEIPTS_MAX_ITEMS:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    detail=f"At most {settings.BULK_RECEIPTS_MAX_ITEMS} receipts per request")
+            if error is not None:
+                results.append({"index": index, "status": "invalid", "detail": error})
+                continue
+            try:
+                receipt_input = products.ReceiptInput.model_validate(value)
+            except ValidationError as err:
+                results.append({"index": index, "status": "invalid",
+                                "detail": err.errors(include_url=False, include_context=False, include_input=False)})
+                continue
+
+            products_data, total, rest = price_receipt(receipt_input)
+            if rest < 0:
+                results.append({"index": index, "status": "rejected", "detail": "Insufficient funds"})
+                continue
+            receipt = BulkReceipt(id=uuid4(), receipt_input=receipt_input, products_data=products_data,
+                                  total=total, rest=rest)
+            accepted.append(receipt)
+            results.append({"index": index, "status": "created", "id": receipt.id, "total": total, "rest": rest})
+    except ValueError as err:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
-    return response
 
-@router.get("/receipts/", response_model=Dict[str, Any])
+    created_at = datetime.now(timezone.utc)
+    if accepted:
+        try:
+            await copy_receipts(session=session, user_id=current_user.id, receipts=accepted, created_at=created_at)
+            batch = settings.BULK_RENDER_JOB_SIZE
+            await enqueue_jobs(session=session, kind=RENDER_RECEIPTS_JOB, payloads=[
+                {"receipt_ids": [str(receipt.id) for receipt in accepted[start:start + batch]], "line_width": 32}
+                for start in range(0, len(accepted), batch)
+            ])
+            await session.commit()
+        except Exception as err:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(err))
+        job_queue.notify()
+
+    for result in results:
+        if result["status"] == "created":
+            result["created_at"] = created_at
+    return {"created": len(accepted), "rejected": len(results) - len(accepted), "items": results}
+
+@router.get("/receipts/", response_model=products.ReceiptPage)
 async def get_all_receipts(*, session: SessionDep,
                            current_user: CurrentUser,
                            offset: int = 0,
@@ -111,13 +221,23 @@ async def get_all_receipts(*, session: SessionDep,
                            max_total: Optional[float] = Query(None),
                            payment_type: Optional[str] = Query(None),
                            start_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS"),
-                           end_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS")) -> Any:
+                           end_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS"),
+                           pagination: Literal["offset", "cursor"] = Query("offset"),
+                           cursor: Optional[str] = Query(None),
+                           count: Literal["exact", "estimated", "none"] = Query("exact")) -> Any:
     """
     GET /receipts/
     Опис: Повертає список чеків для аутентифікованого користувача з можливістю фільтрації.
+    Чеки впорядковані від найновіших (`created_at`, `id`).
     Вхідні параметри:
     - `offset` (int, опціонально): Кількість чеків для пропуску (пагінація).
     - `limit` (int, опціонально): Максимальна кількість чеків, яку потрібно повернути.
+    - `pagination` (str, опціонально): "offset" (за замовчуванням) або "cursor".
+      У режимі "cursor" `offset` ігнорується, а наступна сторінка береться за `next_cursor`
+      без сканування попередніх сторінок.
+    - `cursor` (str, опціонально): `next_cursor` з попередньої відповіді; вмикає режим "cursor".
+    - `count` (str, опціонально): "exact" (за замовчуванням) - точний `count(*)`,
+      "estimated" - оцінка планувальника PostgreSQL, "none" - без підрахунку.
     - `min_total` (float, опціонально): Мінімальна загальна сума чека.
     - `max_total` (float, опціонально): Максимальна загальна сума чека.
     - `payment_type` (str, опціонально): Тип оплати ("cash" або "card").
@@ -125,60 +245,152 @@ async def get_all_receipts(*, session: SessionDep,
     - `end_date` (datetime, опціонально): Кінцева дата створення.
     Вихідні дані:
     - Словник, що містить:
-        - `total_count` (int): Загальна кількість чеків.
-        - `items`: Список чеків у форматі JSON."""
+        - `total_count` (int | None): Загальна кількість чеків (точна, оцінка або `null` залежно від `count`).
+        - `items`: Список чеків у форматі JSON.
+        - `next_cursor` (str | None): Курсор наступної сторінки (лише в режимі "cursor")."""
     try:
-        query = select(Receipt).options(selectinload(Receipt.products)).where(Receipt.user_id == current_user.id)
-
-        if min_total is not None:
-            query = query.where(Receipt.total >= min_total)
-        if max_total is not None:
-            query = query.where(Receipt.total <= max_total)
-        if payment_type is not None:
-            query = query.where(cast(Receipt.payment["type"], String) == payment_type)
-        if start_date is not None:
-            query = query.where(Receipt.created_at >= start_date)
-        if end_date is not None:
-            query = query.where(Receipt.created_at <= end_date)
-
-        # Correcting with_only_columns to use positional arguments
-        total_query = query.with_only_columns(func.count())
-        total_count = await session.execute(total_query)
-        total_count = total_count.scalar()
-
-        query = query.offset(offset).limit(limit)
+        query = receipts_query(
+            user_id=current_user.id,
+            min_total=min_total,
+            max_total=max_total,
+            payment_type=payment_type,
+            start_date=start_date,
+            end_date=end_date
+        ).options(selectinload(Receipt.products))
+
+        total_count = None
+        if count == "exact":
+            # Correcting with_only_columns to use positional arguments
+            total_query = query.with_only_columns(func.count())
+            total_count = await session.execute(total_query)
+            total_count = total_count.scalar()
+        elif count == "estimated":
+            total_count = await estimate_count(session, query.with_only_columns(Receipt.id))
+
+        query = query.order_by(Receipt.created_at.desc(), Receipt.id.desc())
+        keyset = pagination == "cursor" or cursor is not None
+        if keyset:
+            if cursor is not None:
+                cursor_created_at, cursor_id = decode_cursor(cursor)
+                query = query.where(tuple_(Receipt.created_at, Receipt.id) < tuple_(cursor_created_at, cursor_id))
+            query = query.limit(limit + 1)
+        else:
+            query = query.offset(offset).limit(limit)
+
+        if settings.RECEIPT_LIST_READ_ENGINE == "sql":
+            # the documents come from Postgres ready to send
+            rows = (await session.execute(documents_query(query))).all()
+            if complete(rows):
+                next_cursor = None
+                if keyset and len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+                return Response(content=receipt_page_json(total_count, [row.document for row in rows], next_cursor),
+                                media_type="application/json")
+
         result = await session.execute(query)
         receipts = result.scalars().all()
-
-        return {
-            "total_count": total_count,
-            "items": [
-                products.ReceiptOutput(
-                    id=receipt.id,
-                    products=[
-                        products.ProductOutput(
-                            name=product.name,
-                            price=product.price,
-                            quantity=product.quantity,
-                            total=product.total
-                        ) for product in receipt.products
-                    ],
-                    payment=products.ReceiptPayment(
-                        type=receipt.payment_type,
-                        amount=receipt.payment_amount
-                    ),
-                    total=receipt.total,
-                    rest=receipt.rest,
-                    created_at=receipt.created_at,
-                    recept_url=receipt.recept_url
-                ) for receipt in receipts
-            ]
-        }
+        next_cursor = None
+        if keyset and len(receipts) > limit:
+            receipts = receipts[:limit]
+            next_cursor = encode_cursor(receipts[-1].created_at, receipts[-1].id)
+
+        # validated once from the ORM rows and encoded by pydantic-core, without FastAPI's second pass
+        page = products.ReceiptPage.model_validate(
+            {"total_count": total_count, "items": receipts, "next_cursor": next_cursor}, from_attributes=True
+        )
+        return Response(content=page.model_dump_json(), media_type="application/json")
 
     except Exception as err:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
 
 
+@router.get("/receipts/export", response_class=StreamingResponse)
+async def export_receipts(*, current_user: CurrentUser,
+                          format: Literal["ndjson", "csv"] = Query("ndjson"),
+                          cursor: Optional[str] = Query(None),
+                          min_total: Optional[float] = Query(None),
+                          max_total: Optional[float] = Query(None),
+                          payment_type: Optional[str] = Query(None),
+                          start_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS"),
+                          end_date: Optional[datetime] = Query(None, description="Format: YYYY-MM-DDTHH:MM:SS")):
+    """
+    GET /receipts/export
+    Опис: Потоково вивантажує всі чеки користувача разом із товарами - для синхронізації
+    з обліковими системами. Рядки читаються серверним курсором порціями, тож обсяг
+    пам'яті не залежить від кількості чеків. Порядок - від найновіших (`created_at`, `id`).
+    Вхідні параметри:
+    - `format` (str, опціонально): "ndjson" (за замовчуванням) або "csv".
+    - `cursor` (str, опціонально): Значення `cursor` останнього повністю отриманого чека -
+      вивантаження продовжиться з наступного чека (для перерваних завантажень).
+    - `min_total`, `max_total`, `payment_type`, `start_date`, `end_date`: Ті самі фільтри,
+      що й у `GET /receipts/`.
+    Вихідні дані:
+    - "ndjson": По одному об'єкту на рядок - поля `ReceiptOutput` та `cursor`.
+    - "csv": Заголовок, далі по рядку на кожен товар (поля чека повторюються, чек без товарів -
+      один рядок із порожніми полями товару); остання колонка - `cursor`. Рядки останнього чека
+      перерваного завантаження можуть бути неповними - відкиньте їх і продовжте з `cursor`
+      попереднього чека.
+    Помилки:
+    - **400 Bad Request**: Некоректний `cursor`."""
+    query = receipts_query(
+        user_id=current_user.id,
+        min_total=min_total,
+        max_total=max_total,
+        payment_type=payment_type,
+        start_date=start_date,
+        end_date=end_date
+    )
+    if cursor is not None:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError as err:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+        query = query.where(tuple_(Receipt.created_at, Receipt.id) < tuple_(cursor_created_at, cursor_id))
+    query = export_query(query)
+    replica = not pinned_to_primary(str(current_user.id))
+
+    if format == "csv":
+        return StreamingResponse(export_csv(query, replica=replica), media_type="text/csv; charset=utf-8",
+                                 headers={"Content-Disposition": 'attachment; filename="receipts.csv"'})
+    return StreamingResponse(export_ndjson(query, replica=replica), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="receipts.ndjson"'})
+
+
+@router.get("/receipts/search", response_model=products.ReceiptSearchPage)
+async def search_receipts_by_product(*, session: SessionDep, current_user: CurrentUser,
+                                     q: str = Query(..., min_length=MIN_QUERY_LENGTH, max_length=200),
+                                     fuzzy: bool = Query(True),
+                                     offset: int = Query(0, ge=0),
+                                     limit: int = Query(10, ge=1, le=100)) -> Any:
+    """
+    GET /receipts/search
+    Опис: Шукає чеки користувача за назвою товару - підрядок без урахування регістру або,
+    з `fuzzy`, схожа назва (опечатки, інший порядок слів). Найкращі збіги першими,
+    при однаковій оцінці - новіші чеки.
+    Вхідні параметри:
+    - `q` (str): Частина назви товару, щонайменше 3 символи.
+    - `fuzzy` (bool, опціонально): Нечіткий пошук (за замовчуванням true; потребує pg_trgm на сервері БД,
+      без нього шукається лише підрядок).
+    - `offset` (int, опціонально): Кількість результатів для пропуску.
+    - `limit` (int, опціонально): Кількість результатів на сторінці (1-100, за замовчуванням 10).
+    Вихідні дані:
+    - `items`: Чеки у форматі `ReceiptOutput` з полями `score` (1 - знайдено підрядок, інакше
+      схожість від 0 до 1) та `matches` (назви товарів, що збіглися).
+    - `next_offset` (int | None): `offset` наступної сторінки або `null`, якщо це остання."""
+    hits = await search_receipts(session, user_id=current_user.id, query=q, offset=offset,
+                                 limit=limit + 1, fuzzy=fuzzy)
+    page = products.ReceiptSearchPage(
+        items=[
+            products.ReceiptSearchResult(**dict(products.ReceiptOutput.model_validate(hit.receipt)),
+                                         score=hit.score, matches=hit.matches)
+            for hit in hits[:limit]
+        ],
+        next_offset=offset + limit if len(hits) > limit else None,
+    )
+    return Response(content=page.model_dump_json(), media_type="application/json")
+
+
 @router.get("/receipts/{receipt_id}/", response_model=products.ReceiptOutput)
 async def get_receipt(receipt_id: UUID, current_user: CurrentUser, session: SessionDep):
     """
@@ -198,30 +410,23 @@ async def get_receipt(receipt_id: UUID, current_user: CurrentUser, session: Sess
     try:
         query = select(Receipt).options(selectinload(Receipt.products)).where(Receipt.id == receipt_id,
                                       Receipt.user_id == current_user.id)
+        if settings.RECEIPT_DETAIL_READ_ENGINE == "sql":
+            row = (await session.execute(documents_query(query))).first()
+            if not row:
+                raise HTTPException(status_code=404, detail="Receipt not found")
+            if row.document is not None:
+                return Response(content=row.document, media_type="application/json")
+
         result = await session.execute(query)
         receipt = result.scalars().first()
 
         if not receipt:
             raise HTTPException(status_code=404, detail="Receipt not found")
 
-        return products.ReceiptOutput(
-            id=receipt.id,
-            products=[products.ProductOutput(
-                    name=product.name,
-                    price=product.price,
-                    quantity=product.quantity,
-                    total=product.total
-                        ) for product in receipt.products
-                    ],
-            payment=products.ReceiptPayment(
-                    type=receipt.payment_type,
-                    amount=receipt.payment_amount
-                    ),
-            total=receipt.total,
-            rest=receipt.rest,
-            created_at=receipt.created_at,
-            recept_url=receipt.recept_url
-        )
+        return Response(content=products.ReceiptOutput.model_validate(receipt).model_dump_json(),
+                        media_type="application/json")
+    except HTTPException:
+        raise
     except Exception as err:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(err))
 
@@ -259,7 +464,11 @@ async def get_receipt_text_version(*, session: SessionDep, receipt_id: UUID, lin
     - `line_width` (int, опціонально): Ширина рядка тексту (за замовчуванням 32 символи).
     Вихідні дані:
     - Tекстовий файл з чеком"""
-    lines, _ = await create_receipt_text(session=session, receipt_id=receipt_id, line_width=line_width)
+    # a receipt never changes after creation - a cached rendering needs no database access
+    lines = receipt_text_cache.get((receipt_id, line_width))
+    if lines is None:
+        lines, _ = await create_receipt_text(session=session, receipt_id=receipt_id, line_width=line_width)
+        receipt_text_cache.set((receipt_id, line_width), lines)
     return lines
 
 
@@ -272,38 +481,16 @@ async def create_receipt_text(*, session: AsyncSession, receipt_id: UUID, line_w
         if not receipt:
             raise HTTPException(status_code=404, detail="Receipt not found")
 
-        lines = []
-        lines.append("ФОП Джонсонюк Борис".center(line_width, ' '))
-        lines.append("=" * line_width)
-
-        for index, product in enumerate(receipt.products):
-            quantity_price = f"{product.quantity:.2f} x {product.price:.2f}"
-            total_price = f"{product.total:.2f}"
-
-            for wrapped_line in split_long_words(product.name, line_width):
-                lines.append(wrapped_line)
-
-            spaces = line_width - len(quantity_price) - len(total_price)
-            lines.append(f"{quantity_price}{' ' * spaces}{total_price}")
-
-            if index < len(receipt.products) - 1:
-                lines.append("-" * line_width)
-
-        lines.append("=" * line_width)
-
-        total_line = f"СУМА{' ' * (line_width - len('СУМА') - len(f'{receipt.total:.2f}'))}{receipt.total:.2f}"
-        lines.append(total_line)
-
-        payment_type = "Готівка" if receipt.payment_type == "cash" else "Картка"
-        payment_line = f"{payment_type}{' ' * (line_width - len(payment_type) - len(f'{receipt.payment_amount:.2f}'))}{receipt.payment_amount:.2f}"
-        lines.append(payment_line)
-
-        rest_line = f"Решта{' ' * (line_width - len('Решта') - len(f'{receipt.rest:.2f}'))}{receipt.rest:.2f}"
-        lines.append(rest_line)
-
-        lines.append("=" * line_width)
-        lines.append(receipt.created_at.strftime("%d.%m.%Y %H:%M").center(line_width, ' '))
-        lines.append("Дякуємо за покупку!".center(line_width, ' '))
+        with timed("render"):
+            lines = render_receipt_lines(
+                products=receipt.products,
+                total=receipt.total,
+                payment_type=receipt.payment_type,
+                payment_amount=receipt.payment_amount,
+                rest=receipt.rest,
+                created_at=receipt.created_at,
+                line_width=line_width
+            )
 
         return lines, receipt
     except Exception as err:
@@ -311,39 +498,3 @@ async def create_receipt_text(*, session: AsyncSession, receipt_id: UUID, line_w
 
 def check_params(params):
     return len(f"{int(params):.2f}") + 1
-
-def split_long_words(text, line_width):
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        if len(current_line) + len(word) + 1 <= line_width:
-            current_line += (" " if current_line else "") + word
-        else:
-            lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
-    return lines
-
-async def save_receipt_to_file(lines, filename):
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, "w", encoding="utf-8") as file:
-        file.write("\n".join(lines))
-
-async def get_receipt_text_url(*, session: SessionDep, receipt_id: UUID, line_width: int = 32):
-    try:
-        lines, receipt = await create_receipt_text(session=session, receipt_id=receipt_id, line_width=line_width)
-        if receipt.recept_url is None:
-            await save_receipt_to_file(lines, "app/checks/" + str(receipt_id))
-            check = await upload_to_backblaze("app/checks/" + str(receipt_id), str(receipt_id))
-            receipt.recept_url = check
-            session.add(receipt)
-            await session.commit()
-        else:
-            check = receipt.recept_url
-
-        return check
-    except Exception as err:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(err))
-
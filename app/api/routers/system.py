@@ -0,0 +1,79 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from app.api.admission import admission
+from app.api.deps import get_current_active_superuser
+from app.core.group_commit import receipt_batcher
+from app.core.jobs import job_queue
+from app.core.principals import principal_cache
+from app.core.receipts import receipt_text_cache
+from app.core.security import password_hasher
+from app.database.async_connect import get_pool_status
+
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+
+@router.get("/jobs", response_model=Dict[str, Any])
+async def get_jobs_stats() -> Any:
+    """
+    Стан фонової черги задач: глибина черги, задачі у роботі,
+    лічильники успіхів/повторів/помилок та затримка виконання.
+    Доступно лише суперкористувачам.
+    """
+    return await job_queue.stats()
+
+
+@router.get("/caches", response_model=Dict[str, Any])
+async def get_caches_stats() -> Any:
+    """
+    Статистика внутрішньопроцесних кешів: розмір, влучання/промахи, витіснення.
+    Доступно лише суперкористувачам.
+    """
+    return {
+        "principals": principal_cache.stats(),
+        "receipt_text": receipt_text_cache.stats(),
+    }
+
+
+@router.get("/password-hasher", response_model=Dict[str, Any])
+async def get_password_hasher_stats() -> Any:
+    """
+    Стан пулу хешування паролів: активні та очікуючі операції, відхилені запити.
+    Доступно лише суперкористувачам.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/db-pool", response_model=Dict[str, Any])
+async def get_db_pool_stats() -> Any:
+    """
+    Стан пулу з'єднань з базою даних цього процесу: зайняті та вільні з'єднання,
+    overflow, час очікування з'єднання (середній/p95/максимальний) і кількість
+    тайм-аутів - зростання очікування означає, що пулу бракує з'єднань.
+    Окремо - основна база (`primary`) і репліка для читання (`replica`, null, якщо
+    не налаштована); `replica_available` - false, поки після помилки читання йдуть в основну.
+    Доступно лише суперкористувачам.
+    """
+    return get_pool_status()
+
+
+@router.get("/receipt-batcher", response_model=Dict[str, Any])
+async def get_receipt_batcher_stats() -> Any:
+    """
+    Стан групового запису чеків (RECEIPT_WRITE_MODE=batched): чеки в черзі,
+    кількість записаних пакетів і чеків, помилки, середній і максимальний розмір пакета.
+    Доступно лише суперкористувачам.
+    """
+    return receipt_batcher.stats()
+
+
+@router.get("/admission", response_model=Dict[str, Any])
+async def get_admission_stats() -> Any:
+    """
+    Стан контролю допуску запитів цього процесу: запити у роботі, пропущені запити,
+    відхилені через ліміт користувача (429) та через перевантаження (503) -
+    окремо за кількістю запитів у роботі і за часом очікування з'єднання з пулу.
+    Доступно лише суперкористувачам.
+    """
+    return admission.stats()
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.analytics import SalesRollup
+
+GRANULARITIES = ("day", "hour")
+
+# (created_at, total, payment_amount, rest, payment_type) of one receipt
+ReceiptFigures = Tuple[datetime, float, float, float, str]
+
+_SUMMED = ("receipts_count", "total", "payment_amount", "rest",
+           "cash_count", "cash_total", "card_count", "card_total")
+
+# Same aggregation as `add_to_rollups`, straight from `receipts`.
+REBUILD_ROLLUPS_SQL = """
+    INSERT INTO sales_rollups (user_id, granularity, bucket, receipts_count, total, payment_amount, rest,
+                               cash_count, cash_total, card_count, card_total)
+    SELECT r.user_id, g.granularity,
+           date_trunc(g.granularity, r.created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+           count(*), coalesce(sum(r.total), 0), coalesce(sum(r.payment_amount), 0), coalesce(sum(r.rest), 0),
+           count(*) FILTER (WHERE r.payment_type = 'cash'),
+           coalesce(sum(r.total) FILTER (WHERE r.payment_type = 'cash'), 0),
+           count(*) FILTER (WHERE r.payment_type IS DISTINCT FROM 'cash'),
+           coalesce(sum(r.total) FILTER (WHERE r.payment_type IS DISTINCT FROM 'cash'), 0)
+    FROM receipts r CROSS JOIN (VALUES ('day'), ('hour')) AS g (granularity)
+    WHERE r.user_id IS NOT NULL {user_filter}
+    GROUP BY 1, 2, 3
+"""
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the UTC day/hour containing `moment`; naive datetimes are taken as UTC."""
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+async def add_to_rollups(*, session: AsyncSession, user_id: UUID, receipts: Iterable[ReceiptFigures]) -> None:
+    """
+    Adds new receipts to the user's day and hour rollups inside the current
+    transaction, with one `INSERT ... ON CONFLICT DO UPDATE`. Receipts are
+    aggregated per bucket first and the rows are written in key order, so
+    concurrent writers of the same user lock them in the same order.
+    """
+    deltas: Dict[Tuple[str, datetime], List[float]] = {}
+    for created_at, total, payment_amount, rest, payment_type in receipts:
+        total = total or 0
+        cash = payment_type == "cash"
+        for granularity in GRANULARITIES:
+            delta = deltas.setdefault((granularity, bucket_start(created_at, granularity)), [0] * len(_SUMMED))
+            delta[0] += 1
+            delta[1] += total
+            delta[2] += payment_amount or 0
+            delta[3] += rest or 0
+            delta[4 if cash else 6] += 1
+            delta[5 if cash else 7] += total
+    if not deltas:
+        return
+
+    statement = pg_insert(SalesRollup).values([
+        {"user_id": user_id, "granularity": granularity, "bucket": bucket, **dict(zip(_SUMMED, delta))}
+        for (granularity, bucket), delta in sorted(deltas.items())
+    ])
+    await session.execute(statement.on_conflict_do_update(
+        index_elements=[SalesRollup.user_id, SalesRollup.granularity, SalesRollup.bucket],
+        set_={name: getattr(SalesRollup, name) + statement.excluded[name] for name in _SUMMED},
+    ))
+
+
+async def rebuild_rollups(session: AsyncSession, user_id: Optional[UUID] = None) -> int:
+    """
+    Recomputes rollups (of one user or everyone) from `receipts` and returns
+    the number of rollup rows. The table lock makes receipt inserts wait for
+    the rebuild, so none of them is counted twice or lost. Committing is left to the caller.
+    """
+    await session.execute(text("LOCK TABLE sales_rollups IN EXCLUSIVE MODE"))
+    if user_id is None:
+        await session.execute(delete(SalesRollup))
+        result = await session.execute(text(REBUILD_ROLLUPS_SQL.format(user_filter="")))
+    else:
+        await session.execute(delete(SalesRollup).where(SalesRollup.user_id == user_id))
+        result = await session.execute(text(REBUILD_ROLLUPS_SQL.format(user_filter="AND r.user_id = :user_id")),
+                                       {"user_id": user_id})
+    return result.rowcount
+
+
+async def load_rollups(session: AsyncSession, *, user_id: UUID, granularity: str,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[SalesRollup]:
+    """Rollup rows of a user whose buckets overlap `[start, end]`, oldest first."""
+    query = select(SalesRollup).where(SalesRollup.user_id == user_id, SalesRollup.granularity == granularity)
+    if start is not None:
+        query = query.where(SalesRollup.bucket >= bucket_start(start, granularity))
+    if end is not None:
+        query = query.where(SalesRollup.bucket <= end if end.tzinfo else end.replace(tzinfo=timezone.utc))
+    result = await session.execute(query.order_by(SalesRollup.bucket))
+    return list(result.scalars().all())
+
+
+async def main() -> None:
+    from app.database.async_connect import async_session_maker, dispose_engine
+
+    parser = argparse.ArgumentParser(description="Rebuild sales rollups from receipts.")
+    parser.add_argument("--user-id", type=UUID, help="rebuild only this user's rollups")
+    args = parser.parse_args()
+    try:
+        async with async_session_maker() as session:
+            rows = await rebuild_rollups(session, args.user_id)
+            await session.commit()
+        print(f"Rebuilt {rows} rollup rows.")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
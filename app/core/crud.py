@@ -1,13 +1,13 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.core.security import get_password_hash, verify_password
+from app.core.security import password_hasher
 from app.models.user import User
 from app.schemas.users import UserCreate
 
 
 async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
-    hashed_password = get_password_hash(user_create.password)
+    hashed_password = await password_hasher.hash(user_create.password)
     db_obj = User(username=user_create.username,
                     email=user_create.email,
                     hashed_password=hashed_password
@@ -28,7 +28,13 @@ async def authenticate(*, session: AsyncSession, email: str, password: str) -> U
     db_user = await get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = await password_hasher.verify_and_update(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # BCRYPT_ROUNDS changed since the password was hashed
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
     return db_user
 
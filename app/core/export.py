@@ -0,0 +1,129 @@
+import csv
+import io
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import Row
+from sqlalchemy.sql import Select
+
+from app.core.pagination import encode_cursor
+from app.database.async_connect import async_session_maker, route_reads_to_replica
+from app.models.products import Products, Receipt
+from app.schemas import products
+
+# rows fetched from the server-side cursor per round trip
+EXPORT_FETCH_ROWS = 1000
+# response chunks are flushed once they reach this size
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = ["receipt_id", "created_at", "payment_type", "payment_amount", "total", "rest", "recept_url",
+               "product_name", "product_price", "product_quantity", "product_total", "cursor"]
+
+
+def export_query(receipts: Select) -> Select:
+    """
+    Turns a `receipts_query` into a flat `receipts LEFT JOIN products` select in
+    keyset order, so every receipt's rows come out next to each other (its
+    products ordered by id, so a resumed export repeats them identically).
+    """
+    return (
+        receipts.with_only_columns(
+            Receipt.id, Receipt.created_at, Receipt.payment_type, Receipt.payment_amount,
+            Receipt.total, Receipt.rest, Receipt.recept_url,
+            Products.id.label("product_id"), Products.name.label("product_name"),
+            Products.price.label("product_price"), Products.quantity.label("product_quantity"),
+            Products.total.label("product_total"),
+        )
+        .join_from(Receipt, Products, Products.receipt_id == Receipt.id, isouter=True)
+        .order_by(Receipt.created_at.desc(), Receipt.id.desc(), Products.id)
+    )
+
+
+async def iter_receipt_rows(query: Select, *, replica: bool = False) -> AsyncIterator[Tuple[Row, List[Row]]]:
+    """
+    Streams `export_query` results through a server-side cursor and yields
+    `(receipt row, product rows)` per receipt. Uses its own session, as the
+    response body is sent after the request's session has been closed;
+    with `replica` it reads from the read replica if that is available.
+    """
+    async with async_session_maker() as session:
+        if replica:
+            route_reads_to_replica(session)
+        result = await session.stream(query.execution_options(yield_per=EXPORT_FETCH_ROWS))
+        current: Optional[Row] = None
+        product_rows: List[Row] = []
+        async for row in result:
+            if current is None or row.id != current.id:
+                if current is not None:
+                    yield current, product_rows
+                current, product_rows = row, []
+            if row.product_id is not None:
+                product_rows.append(row)
+        if current is not None:
+            yield current, product_rows
+
+
+async def _chunked(lines: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    buffer = []
+    size = 0
+    async for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+async def _ndjson_lines(query: Select, replica: bool) -> AsyncIterator[str]:
+    async for receipt, product_rows in iter_receipt_rows(query, replica=replica):
+        record = products.ReceiptExportRecord(
+            id=receipt.id,
+            products=[
+                products.ProductOutput(
+                    name=row.product_name,
+                    price=row.product_price,
+                    quantity=row.product_quantity,
+                    total=row.product_total
+                ) for row in product_rows
+            ],
+            payment=products.ReceiptPayment(type=receipt.payment_type, amount=receipt.payment_amount),
+            total=receipt.total,
+            rest=receipt.rest,
+            created_at=receipt.created_at,
+            recept_url=receipt.recept_url,
+            cursor=encode_cursor(receipt.created_at, receipt.id),
+        )
+        yield record.model_dump_json() + "\n"
+
+
+async def _csv_lines(query: Select, replica: bool) -> AsyncIterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out)
+
+    def line(values) -> str:
+        writer.writerow(values)
+        text = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return text
+
+    yield line(CSV_COLUMNS)
+    async for receipt, product_rows in iter_receipt_rows(query, replica=replica):
+        head = [receipt.id, receipt.created_at.isoformat(), receipt.payment_type, receipt.payment_amount,
+                receipt.total, receipt.rest, receipt.recept_url]
+        cursor = encode_cursor(receipt.created_at, receipt.id)
+        if not product_rows:
+            yield line(head + [None, None, None, None, cursor])
+        for row in product_rows:
+            yield line(head + [row.product_name, row.product_price, row.product_quantity, row.product_total, cursor])
+
+
+def export_ndjson(query: Select, *, replica: bool = False) -> AsyncIterator[bytes]:
+    """One `ReceiptExportRecord` JSON object per line."""
+    return _chunked(_ndjson_lines(query, replica))
+
+
+def export_csv(query: Select, *, replica: bool = False) -> AsyncIterator[bytes]:
+    """A header row, then one row per product (one row with empty product columns for an empty receipt)."""
+    return _chunked(_csv_lines(query, replica))
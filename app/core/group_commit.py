@@ -0,0 +1,165 @@
+import asyncio
+import contextvars
+import logging
+from collections import deque
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from app.core.jobs import enqueue_jobs, job_queue
+from app.core.receipts import BulkReceipt, RENDER_RECEIPTS_JOB, insert_receipts
+from app.database.async_connect import async_session_maker, pin_to_primary
+from app.settings.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PendingReceipt(NamedTuple):
+    user_id: UUID
+    receipt: BulkReceipt
+    queued_at: float
+    future: "asyncio.Future[datetime]"
+
+
+class ReceiptBatcher:
+    """
+    Group commit for `POST /receipts/` (RECEIPT_WRITE_MODE=batched).
+
+    Requests hand their priced receipt to an in-process queue and wait. A
+    single flusher writes everything queued within `window` seconds of the
+    oldest item, or `max_items` as soon as that many are waiting, with one
+    multi-row INSERT per table and one commit, then resolves every request
+    with its own `created_at`. Flushes run one at a time, so receipts arriving
+    during a commit form the next batch.
+    """
+
+    def __init__(self, *, window: float, max_items: int, session_maker=async_session_maker):
+        self.window = window
+        self.max_items = max_items
+        self.session_maker = session_maker
+
+        self._pending: List[PendingReceipt] = []
+        self._arrived: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.batches = 0
+        self.items = 0
+        self.failed = 0
+        self._sizes = deque(maxlen=1000)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._closing = False
+        # started by the first request: in an empty context, so that the flusher does not
+        # add every later batch to that request's metrics and SQL profile
+        self._task = contextvars.Context().run(asyncio.create_task, self._run())
+
+    async def stop(self) -> None:
+        """Writes what is still queued, then stops the flusher."""
+        if not self.running:
+            return
+        self._closing = True
+        self._arrived.set()
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def submit(self, *, user_id: UUID, receipt: BulkReceipt) -> Tuple[UUID, datetime]:
+        """
+        Queues the receipt and returns its `(id, created_at)` once the batch
+        holding it is committed; raises the error of its own insert otherwise.
+        """
+        if not self.running:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(PendingReceipt(user_id, receipt, loop.time(), future))
+        self._arrived.set()
+        if len(self._pending) >= self.max_items:
+            self._full.set()
+        # a client that goes away does not take the write out of its batch
+        return receipt.id, await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        sizes = sorted(self._sizes)
+        return {
+            "running": self.running,
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "failed": self.failed,
+            "batch_size_avg": round(sum(sizes) / len(sizes), 1) if sizes else None,
+            "batch_size_max": sizes[-1] if sizes else None,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            if not self._pending:
+                if self._closing:
+                    return
+                self._arrived.clear()
+                continue
+
+            wait = self._pending[0].queued_at + self.window - loop.time()
+            if wait > 0 and not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_items]
+            del self._pending[:self.max_items]
+            if len(self._pending) < self.max_items and not self._closing:
+                self._full.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingReceipt]) -> None:
+        try:
+            await self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self.failed += 1
+                if not batch[0].future.done():
+                    batch[0].future.set_exception(e)
+                return
+            # one bad receipt must not fail the others - write them one by one
+            logger.warning("Receipt batch of %d failed, retrying one by one: %r", len(batch), e)
+            for item in batch:
+                await self._flush([item])
+
+    async def _write(self, batch: List[PendingReceipt]) -> None:
+        async with self.session_maker() as session:
+            created = await insert_receipts(session=session, receipts=[(item.user_id, item.receipt) for item in batch])
+            size = settings.BULK_RENDER_JOB_SIZE
+            await enqueue_jobs(session=session, kind=RENDER_RECEIPTS_JOB, payloads=[
+                {"receipt_ids": [str(item.receipt.id) for item in batch[start:start + size]], "line_width": 32}
+                for start in range(0, len(batch), size)
+            ])
+            await session.commit()
+
+        self.batches += 1
+        self.items += len(batch)
+        self._sizes.append(len(batch))
+        for user_id in {item.user_id for item in batch}:
+            pin_to_primary(str(user_id))
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(created[item.receipt.id])
+        job_queue.notify()
+
+
+receipt_batcher = ReceiptBatcher(
+    window=settings.RECEIPT_BATCH_WINDOW_MS / 1000,
+    max_items=settings.RECEIPT_BATCH_MAX_ITEMS,
+)
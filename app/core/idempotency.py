@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.settings.config import settings
+
+# Claims a key inside the request's transaction. A conflicting insert waits
+# for the transaction holding the key, so a duplicate from another process
+# either sees its committed response or, if that transaction rolled back,
+# takes the key itself. Expired keys are claimed as if they did not exist.
+CLAIM_KEY_SQL = text("""
+    INSERT INTO idempotency_keys (user_id, key, request_hash, expires_at)
+    VALUES (:user_id, :key, :request_hash, now() + make_interval(secs => :ttl))
+    ON CONFLICT (user_id, key) DO UPDATE
+    SET request_hash = EXCLUDED.request_hash, expires_at = EXCLUDED.expires_at,
+        status_code = NULL, response = NULL, created_at = now()
+    WHERE idempotency_keys.expires_at <= now()
+    RETURNING 1
+""")
+
+
+class StoredResponse(NamedTuple):
+    request_hash: str
+    status_code: int
+    body: str
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+# Completed responses by (user id, key), so a retry is answered without the database.
+idempotency_cache = LRUCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+# Requests of this process still running, by (user id, key) - duplicates wait for them.
+_in_flight: Dict[Tuple[UUID, str], "asyncio.Future[StoredResponse]"] = {}
+
+
+def request_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _checked(stored: StoredResponse, expected_hash: str) -> StoredResponse:
+    if stored.request_hash != expected_hash:
+        raise IdempotencyKeyReused("Idempotency-Key has already been used with a different request")
+    return stored
+
+
+async def _claim(session: AsyncSession, user_id: UUID, key: str, hashed: str) -> Optional[StoredResponse]:
+    """None if the key is now ours, otherwise the response stored under it."""
+    params = {"user_id": user_id, "key": key, "request_hash": hashed, "ttl": settings.IDEMPOTENCY_KEY_TTL_SECONDS}
+    if (await session.execute(CLAIM_KEY_SQL, params)).first() is not None:
+        return None
+    row = (await session.execute(text(
+        "SELECT request_hash, status_code, response FROM idempotency_keys WHERE user_id = :user_id AND key = :key"
+    ), params)).one()
+    return StoredResponse(row.request_hash, row.status_code, row.response)
+
+
+async def run_idempotent(session: AsyncSession, *, user_id: UUID, key: str, hashed: str,
+                         handler: Callable[[], Awaitable[StoredResponse]]) -> Tuple[StoredResponse, bool]:
+    """
+    Runs `handler` - the request's writes, without committing - at most once
+    per `(user_id, key)` within IDEMPOTENCY_KEY_TTL_SECONDS, stores its
+    response in the same transaction and commits. Returns the response and
+    whether it is a replay of an earlier request.
+
+    A repeated key is answered from the in-memory cache, then from
+    `idempotency_keys`; a duplicate of a request still running in this
+    process waits for it. Failed requests store nothing, so a retry runs again.
+    """
+    cache_key = (user_id, key)
+    stored = idempotency_cache.get(cache_key)
+    if stored is not None:
+        return _checked(stored, hashed), True
+    pending = _in_flight.get(cache_key)
+    if pending is not None:
+        return _checked(await asyncio.shield(pending), hashed), True
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[cache_key] = future
+    try:
+        stored = await _claim(session, user_id, key, hashed)
+        replayed = stored is not None
+        if not replayed:
+            stored = await handler()
+            await session.execute(text(
+                "UPDATE idempotency_keys SET status_code = :status_code, response = :response "
+                "WHERE user_id = :user_id AND key = :key"
+            ), {"status_code": stored.status_code, "response": stored.body, "user_id": user_id, "key": key})
+            await session.commit()
+        else:
+            # nothing was written - release the row lock of the claim attempt
+            await session.rollback()
+        idempotency_cache.set(cache_key, stored)
+        future.set_result(stored)
+    except BaseException as err:
+        if isinstance(err, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(err)
+            # waiters get the same error; without them nobody retrieves it
+            future.exception()
+        raise
+    finally:
+        _in_flight.pop(cache_key, None)
+    # checked once the future is resolved, so that a reused key does not fail it a second time
+    return _checked(stored, hashed), replayed
+
+
+async def purge_expired_keys(session: AsyncSession) -> int:
+    """Deletes expired keys and returns how many; committing is left to the caller."""
+    result = await session.execute(text("DELETE FROM idempotency_keys WHERE expires_at <= now()"))
+    return result.rowcount
+
+
+async def main() -> None:
+    from app.database.async_connect import async_session_maker, dispose_engine
+
+    argparse.ArgumentParser(description="Delete expired idempotency keys.").parse_args()
+    try:
+        async with async_session_maker() as session:
+            deleted = await purge_expired_keys(session)
+            await session.commit()
+        print(f"Deleted {deleted} expired idempotency keys.")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.metrics import finish_request, job_duration, job_phase_duration, start_request
+from app.database.async_connect import async_session_maker
+from app.models.jobs import Job
+from app.settings.config import settings
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Claims due jobs: pending ones whose run_at has passed and running ones whose
+# lease expired (the worker that took them died). SKIP LOCKED lets several
+# app processes share the table without handing the same job out twice.
+CLAIM_JOBS_SQL = text("""
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1,
+        run_at = now() + make_interval(secs => :lease), updated_at = now()
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE status IN ('pending', 'running') AND run_at <= now()
+        ORDER BY run_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, payload, attempts, created_at
+""").columns(Job.id, Job.kind, Job.payload, Job.attempts, Job.created_at)
+
+
+async def enqueue_job(*, session: AsyncSession, kind: str, payload: Dict[str, Any]) -> UUID:
+    """
+    Adds a job row inside the caller's transaction, so the job exists if and
+    only if the caller commits. Call `job_queue.notify()` after the commit to
+    wake the workers without waiting for the next poll.
+    """
+    result = await session.execute(insert(Job).values(kind=kind, payload=payload).returning(Job.id))
+    return result.scalar_one()
+
+
+async def enqueue_jobs(*, session: AsyncSession, kind: str, payloads: List[Dict[str, Any]]) -> None:
+    """`enqueue_job` for many jobs of one kind, as a single multi-row INSERT."""
+    if payloads:
+        await session.execute(insert(Job).values([{"kind": kind, "payload": payload} for payload in payloads]))
+
+
+class JobQueue:
+    """
+    Bounded asyncio worker pool backed by the `jobs` table.
+
+    A dispatcher claims due jobs from the database only when there is room in
+    the local buffer, `concurrency` workers execute them, failures are retried
+    with exponential backoff until `max_attempts` is reached.
+    """
+
+    def __init__(self, *, concurrency: int, max_attempts: int, backoff_base: float,
+                 backoff_max: float, poll_interval: float, lease_seconds: float,
+                 session_maker=async_session_maker):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.session_maker = session_maker
+
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+        self.in_flight = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self._latencies = deque(maxlen=1000)
+        self._durations = deque(maxlen=1000)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Hand claimed but not started jobs back instead of waiting for their lease.
+        unstarted = []
+        while not self._queue.empty():
+            unstarted.append(self._queue.get_nowait()["id"])
+        if unstarted:
+            async with self.session_maker() as session:
+                await session.execute(
+                    update(Job).where(Job.id.in_(unstarted)).values(status="pending", run_at=func.now())
+                )
+                await session.commit()
+
+    def notify(self) -> None:
+        """Wakes the dispatcher after new jobs were committed."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.9, 1.1)
+
+    async def _dispatch(self) -> None:
+        while True:
+            try:
+                free = self._queue.maxsize - self._queue.qsize()
+                claimed = await self._claim(free) if free > 0 else []
+                for job in claimed:
+                    await self._queue.put(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Failed to claim jobs: %s", e)
+                claimed = []
+
+            if len(claimed) < free or free <= 0:
+                # not wait_for: before Python 3.12 it can turn a cancellation that coincides with the
+                # timeout into TimeoutError, and stop() then waits for the dispatcher forever
+                wakeup = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({wakeup}, timeout=self.poll_interval)
+                finally:
+                    wakeup.cancel()
+                self._wakeup.clear()
+
+    async def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        async with self.session_maker() as session:
+            result = await session.execute(CLAIM_JOBS_SQL, {"lease": self.lease_seconds, "limit": limit})
+            jobs = [dict(row._mapping) for row in result]
+            await session.commit()
+        return jobs
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self.in_flight += 1
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # the job stays claimed and is retried once its lease expires; the worker carries on
+                logger.exception("Job %s (%s) could not be finished", job["id"], job["kind"])
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+                # a slot is free again - let the dispatcher refill it
+                self._wakeup.set()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        phases, token = start_request()
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind '{job['kind']}'")
+            await handler(job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._record_failure(job, e)
+            return
+        finally:
+            finish_request(token)
+            duration = time.perf_counter() - started
+            self._durations.append(duration)
+            job_duration.observe((job["kind"],), duration)
+            for phase, seconds in phases.items():
+                job_phase_duration.observe((job["kind"], phase), seconds)
+
+        async with self.session_maker() as session:
+            await session.execute(delete(Job).where(Job.id == job["id"]))
+            await session.commit()
+        self.completed += 1
+        self._latencies.append((datetime.now(timezone.utc) - job["created_at"]).total_seconds())
+
+    async def _record_failure(self, job: Dict[str, Any], error: Exception) -> None:
+        if job["attempts"] >= self.max_attempts:
+            values = {"status": "failed", "last_error": repr(error)}
+            self.failed += 1
+            logger.error("Job %s (%s) failed permanently: %r", job["id"], job["kind"], error)
+        else:
+            delay = self.backoff(job["attempts"])
+            values = {
+                "status": "pending",
+                "last_error": repr(error),
+                "run_at": func.now() + func.make_interval(0, 0, 0, 0, 0, 0, delay),
+            }
+            self.retried += 1
+            logger.warning("Job %s (%s) failed, retrying in %.1fs: %r", job["id"], job["kind"], delay, error)
+        async with self.session_maker() as session:
+            await session.execute(update(Job).where(Job.id == job["id"]).values(**values))
+            await session.commit()
+
+    async def stats(self) -> Dict[str, Any]:
+        async with self.session_maker() as session:
+            result = await session.execute(select(Job.status, func.count()).group_by(Job.status))
+            by_status = dict(result.all())
+
+        latencies = sorted(self._latencies)
+        durations = sorted(self._durations)
+        return {
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "queue_depth": by_status.get("pending", 0),
+            "buffered": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self.in_flight,
+            "jobs_by_status": by_status,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_seconds": _summary(latencies),
+            "duration_seconds": _summary(durations),
+        }
+
+
+def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "avg": None, "p95": None, "max": None}
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values),
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+job_queue = JobQueue(
+    concurrency=settings.JOBS_CONCURRENCY,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    backoff_base=settings.JOBS_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.JOBS_BACKOFF_MAX_SECONDS,
+    poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+)
@@ -0,0 +1,119 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+# one array element / NDJSON line may not exceed this many characters
+MAX_ITEM_CHARS = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+# (value, None) for a decoded item, (None, error message) for a malformed NDJSON line
+Item = Tuple[Any, Optional[str]]
+
+
+class JSONArrayParser:
+    """
+    Incremental parser for a top-level JSON array: `feed()` text as it arrives
+    and get back every element that is complete so far. Structural errors
+    raise `ValueError` - after a broken element the position of the next one
+    is unknown.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._state = "start"  # start -> first -> (separator -> item)* -> end
+
+    def feed(self, text: str, final: bool = False) -> List[Any]:
+        buffer = self._buffer + text
+        pos = 0
+        items = []
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                self._state = "first"
+                pos += 1
+            elif self._state == "separator":
+                if char not in ",]":
+                    raise ValueError(f"Expected ',' or ']' at item {len(items)}")
+                self._state = "item" if char == "," else "end"
+                pos += 1
+            elif self._state == "end":
+                raise ValueError("Unexpected data after the JSON array")
+            elif self._state == "first" and char == "]":
+                self._state = "end"
+                pos += 1
+            else:
+                try:
+                    value, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as err:
+                    if final or len(buffer) - pos > MAX_ITEM_CHARS:
+                        raise ValueError(f"Invalid JSON array item: {err.msg}") from None
+                    break  # incomplete - wait for more data
+                # a bare number at the end of the buffer may continue in the next chunk
+                if end == len(buffer) and not final and not isinstance(value, (dict, list, str)):
+                    break
+                items.append(value)
+                self._state = "separator"
+                pos = end
+
+        self._buffer = buffer[pos:]
+        if final and self._state != "end":
+            raise ValueError("Unexpected end of the JSON array")
+        return items
+
+    def close(self) -> List[Any]:
+        return self.feed("", final=True)
+
+
+class NDJSONParser:
+    """
+    Incremental parser for newline-delimited JSON. A malformed line does not
+    stop the stream - it is reported as `(None, error)` in its place.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str, final: bool = False) -> List[Item]:
+        lines = (self._buffer + text).split("\n")
+        self._buffer = "" if final else lines.pop()
+        if len(self._buffer) > MAX_ITEM_CHARS:
+            raise ValueError("NDJSON line is too long")
+
+        items = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                items.append((json.loads(line), None))
+            except json.JSONDecodeError as err:
+                items.append((None, f"Invalid JSON: {err.msg}"))
+        return items
+
+    def close(self) -> List[Item]:
+        return self.feed("", final=True)
+
+
+async def iter_json_items(chunks: AsyncIterator[bytes], *, ndjson: bool) -> AsyncIterator[Item]:
+    """
+    Decodes a request body stream (UTF-8 JSON array or NDJSON) into
+    `(value, error)` pairs as soon as each item is complete.
+    """
+    parser = NDJSONParser() if ndjson else JSONArrayParser()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(utf8.decode(chunk)):
+                yield item if ndjson else (item, None)
+        for item in parser.feed(utf8.decode(b"", final=True), final=True):
+            yield item if ndjson else (item, None)
+    except UnicodeDecodeError as err:
+        raise ValueError(f"Request body is not valid UTF-8: {err.reason}") from None
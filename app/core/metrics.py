@@ -0,0 +1,204 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.profiler import record_statement
+
+# Latency buckets in seconds, as in the Prometheus client libraries.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Where a request spends its time besides Python code of its own.
+PHASES = ("db", "render", "storage")
+
+# Seconds per phase of the request being handled; None outside requests.
+# The dict is shared with tasks and greenlets started by the request.
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_phases", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge:
+    """A value set with `inc`/`dec`, or read from `read` at scrape time."""
+
+    def __init__(self, name: str, documentation: str, read: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self._value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._value -= amount
+
+    def value(self) -> float:
+        return self.read() if self.read is not None else self._value
+
+    def collect(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_number(self.value())}"]
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: observations per bucket (the last one is +Inf) and their sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series is not None else 0
+
+    def sum(self, labels: Tuple[str, ...] = ()) -> float:
+        series = self._series.get(labels)
+        return series[1][0] if series is not None else 0.0
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(line for metric in self.metrics for line in metric.collect()) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route and status code.", ("method", "route", "status")))
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route.", ("method", "route")))
+request_phase_duration = registry.register(Histogram(
+    "http_request_phase_seconds", "Time a request spent in the database, rendering receipts and in storage.",
+    ("route", "phase")))
+request_queries = registry.register(Histogram(
+    "http_request_queries", "SQL statements run per request, by route.", ("route",),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100)))
+requests_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being handled."))
+job_duration = registry.register(Histogram(
+    "background_job_duration_seconds", "Background job run time by kind.", ("kind",)))
+job_phase_duration = registry.register(Histogram(
+    "background_job_phase_seconds", "Time a background job spent in the database, rendering receipts and in storage.",
+    ("kind", "phase")))
+
+
+def start_request() -> Tuple[Dict[str, float], Token]:
+    """
+    Starts collecting phase times for the current context - a request or a
+    background job; pass the token to `finish_request`.
+    """
+    phases = dict.fromkeys(PHASES, 0.0)
+    return phases, _phases.set(phases)
+
+
+def finish_request(token: Token) -> None:
+    _phases.reset(token)
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] += seconds
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Adds the time spent in the block to `phase` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def track_query_time(engine: AsyncEngine) -> None:
+    """
+    Adds the time of every statement run on `engine` to the `db` phase of
+    the current request and hands the statement to the query profiler.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_started"].pop()
+        record_phase("db", seconds)
+        record_statement(statement, parameters, seconds)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            seconds = time.perf_counter() - started.pop()
+            record_phase("db", seconds)
+            if context.statement is not None:
+                record_statement(context.statement, context.parameters, seconds)
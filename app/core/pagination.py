@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+def encode_cursor(created_at: datetime, receipt_id: UUID) -> str:
+    """Opaque keyset cursor pointing at the last row of a page."""
+    raw = json.dumps([created_at.isoformat(), str(receipt_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, receipt_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(receipt_id)
+    except (ValueError, TypeError) as err:
+        raise ValueError(f"Invalid cursor: {cursor}") from err
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON[, ANALYZE]) <statement>` with the statement's bind parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    options = "FORMAT JSON, ANALYZE" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+async def explain(session: AsyncSession, statement, analyze: bool = False) -> dict:
+    """Returns the top plan node of `statement`."""
+    result = await session.execute(Explain(statement, analyze=analyze))
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def estimate_count(session: AsyncSession, statement) -> int:
+    """
+    Planner's row estimate for `statement` - costs a planning pass instead of
+    a scan, but is only as accurate as the table statistics.
+    """
+    plan = await explain(session, statement)
+    return int(plan["Plan Rows"])
@@ -0,0 +1,44 @@
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.models.user import User
+from app.settings.config import settings
+
+# Authenticated users by id, so that a request with a valid token does not
+# have to select its user again. Entries are detached `User` objects.
+principal_cache = LRUCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_principal(user_id: UUID) -> None:
+    """
+    Drops a cached user. ORM changes to `User` rows are picked up automatically;
+    call this after bulk `update(User)`/`delete(User)` statements, which bypass the ORM.
+    Other worker processes only notice the change after PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    principal_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_principal(target.id)
+    # drop it once more after commit, in case a concurrent request re-cached
+    # the old row between the flush and the commit
+    Session.object_session(target).info.setdefault("changed_principals", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop("changed_principals", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop("changed_principals", None)
@@ -0,0 +1,89 @@
+import logging
+import re
+from contextvars import ContextVar, Token
+from typing import Dict, List, Optional, Tuple
+
+from app.settings.config import settings
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:::[\w\[\]]+)?(?:\s*,\s*\?(?:::[\w\[\]]+)?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    The statement with literals and bound parameters replaced by `?`, IN
+    lists collapsed to `(...)` and whitespace squeezed - safe to log and
+    the same for every execution of one query.
+    """
+    normalized = _STRING.sub("?", statement)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PARAMETER_LIST.sub("(...)", normalized)
+    return _SPACE.sub(" ", normalized).strip()
+
+
+def _parameter_count(parameters) -> int:
+    if isinstance(parameters, dict):
+        return len(parameters)
+    if isinstance(parameters, (list, tuple)):
+        return len(parameters)
+    return 0
+
+
+class QueryProfile:
+    """Statements run while handling one request, by statement text."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        # statement -> [executions, seconds]
+        self.statements: Dict[str, List[float]] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """N+1 candidates: statements run at least `threshold` times, as (normalized SQL, count, seconds)."""
+        return [(normalize_sql(statement), int(count), seconds)
+                for statement, (count, seconds) in self.statements.items() if count >= threshold]
+
+    def summary(self) -> List[Tuple[str, int, float]]:
+        """Every statement as (normalized SQL, count, seconds), slowest first."""
+        return sorted(((normalize_sql(statement), int(count), seconds)
+                       for statement, (count, seconds) in self.statements.items()), key=lambda row: -row[2])
+
+
+# Profile of the request being handled; None outside requests.
+_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def start_profile() -> Tuple[QueryProfile, Token]:
+    profile = QueryProfile()
+    return profile, _profile.set(profile)
+
+
+def finish_profile(token: Token) -> None:
+    _profile.reset(token)
+
+
+def record_statement(statement: str, parameters, seconds: float) -> None:
+    """Called for every statement run on an instrumented engine (`app.core.metrics.track_query_time`)."""
+    profile = _profile.get()
+    if profile is not None:
+        profile.record(statement, seconds)
+    if settings.SLOW_QUERY_MS and seconds * 1000 >= settings.SLOW_QUERY_MS:
+        slow_query_logger.warning("Slow query (%.1f ms, %d parameters redacted): %s",
+                                  seconds * 1000, _parameter_count(parameters), normalize_sql(statement))
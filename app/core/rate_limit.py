@@ -0,0 +1,127 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.cache import LRUCache
+from app.settings.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Spends a token of an existing bucket only if the refilled bucket has one;
+# a new bucket starts full. `now()` is the same for SET and WHERE.
+TAKE_TOKEN_SQL = text("""
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (:key, CAST(:burst AS float8) - 1, now())
+    ON CONFLICT (key) DO UPDATE
+    SET tokens = least(CAST(:burst AS float8),
+                       b.tokens + extract(epoch FROM now() - b.updated_at) * CAST(:rate AS float8)) - 1,
+        updated_at = now()
+    WHERE least(CAST(:burst AS float8),
+                b.tokens + extract(epoch FROM now() - b.updated_at) * CAST(:rate AS float8)) >= 1
+    RETURNING 1
+""")
+
+TOKEN_WAIT_SQL = text("""
+    SELECT (1 - least(CAST(:burst AS float8),
+                      tokens + extract(epoch FROM now() - updated_at) * CAST(:rate AS float8))) / CAST(:rate AS float8)
+    FROM rate_limit_buckets WHERE key = :key
+""")
+
+
+# A bucket idle this long is full again, the same as a missing one; the
+# Postgres backend deletes such rows every PURGE_EVERY checks.
+IDLE_BUCKET_SECONDS = 3600
+PURGE_EVERY = 1000
+
+
+class RateLimitBackend(ABC):
+    """
+    Token buckets: bucket `key` holds up to `burst` tokens and refills at
+    `rate` tokens per second. `take` spends one token and returns 0, or, if
+    the bucket is empty, leaves it as is and returns the seconds until a
+    token will be available.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets of this worker process; the least recently used ones are dropped beyond `maxsize`."""
+
+    def __init__(self, *, maxsize: int):
+        self._buckets = LRUCache(maxsize=maxsize)
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key, count=False)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        if tokens >= 1:
+            self._buckets.set(key, (tokens - 1, now))
+            return 0.0
+        return (1 - tokens) / rate
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """
+    Buckets shared by all workers, in the UNLOGGED `rate_limit_buckets`
+    table (migration 6): one upsert per admitted request. Uses a small pool
+    of its own, so checks never wait behind the requests they are guarding.
+    If the database cannot answer, requests are let through.
+    """
+
+    def __init__(self, *, url: str, pool_size: int, pool_timeout: float):
+        self.url = url
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._engine: Optional[AsyncEngine] = None
+        self._checks = 0
+
+    def _get_engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = create_async_engine(self.url, pool_size=self.pool_size, max_overflow=0,
+                                               pool_timeout=self.pool_timeout)
+        return self._engine
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        params = {"key": key, "rate": rate, "burst": burst}
+        try:
+            async with self._get_engine().connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                self._checks += 1
+                if self._checks % PURGE_EVERY == 0:
+                    await conn.execute(text(
+                        "DELETE FROM rate_limit_buckets WHERE updated_at < now() - make_interval(secs => :idle)"
+                    ), {"idle": IDLE_BUCKET_SECONDS})
+                if (await conn.execute(TAKE_TOKEN_SQL, params)).first() is not None:
+                    return 0.0
+                return max((await conn.execute(TOKEN_WAIT_SQL, params)).scalar() or 0.0, 0.0)
+        except Exception as e:
+            logger.warning("Rate limit check failed, letting the request through: %r", e)
+            return 0.0
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    """Returns a backend selected by `RATE_LIMIT_BACKEND`."""
+    backend = settings.RATE_LIMIT_BACKEND
+    if backend == "memory":
+        return MemoryRateLimitBackend(maxsize=settings.RATE_LIMIT_BUCKETS)
+    if backend == "postgres":
+        from app.database.async_connect import ASYNC_SQLALCHEMY_DATABASE_URL
+
+        return PostgresRateLimitBackend(url=ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=settings.RATE_LIMIT_DB_POOL_SIZE,
+                                        pool_timeout=settings.RATE_LIMIT_DB_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
@@ -0,0 +1,130 @@
+"""
+Receipt responses assembled by Postgres.
+
+`receipt_document()` is a SQL expression rendering one receipt with its
+products as the exact JSON text `ReceiptOutput.model_dump_json()` produces:
+compact separators, floats as Python prints them (`21.0`), timestamps as
+`2025-01-02T03:04:05.123000Z`. The endpoints join these documents without
+loading ORM objects or building pydantic models.
+
+Values the SQL formatting cannot reproduce exactly (floats Postgres writes
+in exponent notation, NaN, NULLs in required fields, non-v4 ids) turn the
+whole document into NULL; callers then fall back to the pydantic path, which
+also keeps its validation errors.
+"""
+import json
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Row, Text, case, cast, func, literal_column, select
+from sqlalchemy.sql import ColumnElement, Select
+
+from app.models.products import Products, Receipt
+
+# `float8::text` forms that match Python's repr: integral, or plain decimal
+_INTEGRAL = r"^-?[0-9]+$"
+_DECIMAL = r"^-?[0-9]*\.[0-9]+$"
+
+
+def _const(value) -> ColumnElement:
+    # inlined into the statement, the document constants are not bind parameters
+    if isinstance(value, int):
+        return literal_column(str(value))
+    return literal_column("'" + value.replace("'", "''") + "'", Text)
+
+
+def _concat(*parts) -> ColumnElement:
+    # `||` - NULL in any part makes the whole result NULL
+    parts = [_const(part) if isinstance(part, str) else part for part in parts]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op("||")(part)
+    return cast(document, Text)
+
+
+def json_float(column) -> ColumnElement:
+    as_text = cast(column, Text)
+    return case(
+        (as_text.op("~")(_const(_INTEGRAL)), _concat(as_text, ".0")),
+        (as_text.op("~")(_const(_DECIMAL)), as_text),
+        else_=None,
+    )
+
+
+def json_string(column, nullable: bool = False) -> ColumnElement:
+    encoded = cast(func.to_json(cast(column, Text)), Text)
+    return func.coalesce(encoded, _const("null")) if nullable else encoded
+
+
+def json_timestamp(column) -> ColumnElement:
+    utc = column.op("AT TIME ZONE")(_const("UTC"))
+    fraction = case((func.date_trunc(_const("second"), column) == column, _const("")),
+                    else_=_concat(".", func.to_char(utc, _const("US"))))
+    return _concat('"', func.to_char(utc, _const('YYYY-MM-DD"T"HH24:MI:SS')), fraction, 'Z"')
+
+
+def product_document(product=Products) -> ColumnElement:
+    return _concat(
+        '{"name":', json_string(product.name),
+        ',"price":', json_float(product.price),
+        ',"quantity":', json_float(product.quantity),
+        ',"total":', json_float(product.total),
+        "}",
+    )
+
+
+def products_array(receipt=Receipt) -> ColumnElement:
+    """`[...]` of the receipt's products, NULL if any of them is NULL."""
+    document = product_document()
+    return (
+        select(case(
+            (func.count() == func.count(document),
+             _concat("[", func.coalesce(func.string_agg(document, _const(",")), _const("")), "]")),
+            else_=None,
+        ))
+        .where(Products.receipt_id == receipt.id)
+        .scalar_subquery()
+    )
+
+
+@lru_cache(maxsize=None)
+def receipt_document(receipt=Receipt) -> ColumnElement:
+    """Built once: the expression is large, constructing it costs more than running it."""
+    receipt_id = cast(receipt.id, Text)
+    return case(
+        # `ReceiptOutput.id` is a UUID4
+        (func.substr(receipt_id, _const(15), _const(1)) == _const("4"), _concat(
+            '{"id":"', receipt_id,
+            '","products":', products_array(receipt),
+            ',"payment":{"type":', json_string(receipt.payment_type),
+            ',"amount":', json_float(receipt.payment_amount),
+            '},"total":', json_float(receipt.total),
+            ',"rest":', json_float(receipt.rest),
+            ',"created_at":', json_timestamp(receipt.created_at),
+            ',"recept_url":', json_string(receipt.recept_url, nullable=True),
+            "}",
+        )),
+        else_=None,
+    ).label("document")
+
+
+def documents_query(receipts: Select) -> Select:
+    """
+    Turns a `receipts_query` (with its order, cursor and limit applied) into
+    a select of `(document, created_at, id)` rows in the same order.
+    """
+    return receipts.with_only_columns(receipt_document(), Receipt.created_at, Receipt.id)
+
+
+def complete(rows: Sequence[Row]) -> bool:
+    return all(row.document is not None for row in rows)
+
+
+def receipt_page_json(total_count: Optional[int], documents: List[str], next_cursor: Optional[str]) -> bytes:
+    """The `ReceiptPage` JSON around documents from `documents_query`."""
+    return "".join((
+        '{"total_count":', "null" if total_count is None else str(int(total_count)),
+        ',"items":[', ",".join(documents),
+        '],"next_cursor":', json.dumps(next_cursor),
+        "}",
+    )).encode("utf-8")
@@ -0,0 +1,146 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+TITLE = "ФОП Джонсонюк Борис"
+THANKS = "Дякуємо за покупку!"
+TOTAL_LABEL = "СУМА"
+REST_LABEL = "Решта"
+PAYMENT_LABELS = {"cash": "Готівка"}
+CARD_LABEL = "Картка"
+
+
+def split_long_words(text, line_width):
+    """
+    Greedy word wrap. Words are never broken; a word that does not fit an
+    empty line is preceded by an empty line (kept for output compatibility).
+    """
+    # Common case: a short single-spaced name is its own only line. Printable
+    # text has no whitespace other than " ", so split() would not change it.
+    if len(text) < line_width and text.isprintable() and "  " not in text \
+            and text[:1] != " " and text[-1:] != " ":
+        return [text] if text else []
+
+    lines = []
+    parts = []
+    length = 0
+    for word in text.split():
+        if length + len(word) + 1 <= line_width:
+            length += len(word) + (1 if parts else 0)
+            parts.append(word)
+        else:
+            lines.append(" ".join(parts))
+            parts = [word]
+            length = len(word)
+    if parts:
+        lines.append(" ".join(parts))
+    return lines
+
+
+class PreparedReceipt(NamedTuple):
+    """Width-independent parts of a receipt, formatted once."""
+    products: Tuple[Tuple[str, str, str], ...]  # (name, "qty x price", "total")
+    total: str
+    payment_label: str
+    payment_amount: str
+    rest: str
+    created_at: str
+
+
+def prepare_receipt(*, products: Iterable, total: float, payment_type: str,
+                    payment_amount: float, rest: float, created_at: datetime) -> PreparedReceipt:
+    """
+    `products` may hold ORM `Products` rows or `ProductOutput` schemas - only
+    `name`, `price`, `quantity` and `total` attributes are used.
+    """
+    return PreparedReceipt(
+        products=tuple(
+            (product.name, f"{product.quantity:.2f} x {product.price:.2f}", f"{product.total:.2f}")
+            for product in products
+        ),
+        total=f"{total:.2f}",
+        payment_label=PAYMENT_LABELS.get(payment_type, CARD_LABEL),
+        payment_amount=f"{payment_amount:.2f}",
+        rest=f"{rest:.2f}",
+        created_at=created_at.strftime("%d.%m.%Y %H:%M"),
+    )
+
+
+class ReceiptLayout:
+    """
+    Receipt template compiled for one line width: the fixed lines are built
+    once and every variable line is a single pad-and-concatenate.
+    """
+
+    def __init__(self, line_width: int):
+        self.line_width = line_width
+        self.title = TITLE.center(line_width, ' ')
+        self.double_rule = "=" * line_width
+        self.single_rule = "-" * line_width
+        self.thanks = THANKS.center(line_width, ' ')
+        # room left for a right-aligned amount after each fixed label
+        self.total_room = line_width - len(TOTAL_LABEL)
+        self.rest_room = line_width - len(REST_LABEL)
+
+    def assemble(self, receipt: PreparedReceipt) -> List[str]:
+        width = self.line_width
+        lines = [self.title, self.double_rule]
+        append = lines.append
+        extend = lines.extend
+
+        last = len(receipt.products) - 1
+        for index, (name, quantity_price, total_price) in enumerate(receipt.products):
+            extend(split_long_words(name, width))
+            append(quantity_price + total_price.rjust(width - len(quantity_price)))
+            if index < last:
+                append(self.single_rule)
+
+        append(self.double_rule)
+        append(TOTAL_LABEL + receipt.total.rjust(self.total_room))
+        label = receipt.payment_label
+        append(label + receipt.payment_amount.rjust(width - len(label)))
+        append(REST_LABEL + receipt.rest.rjust(self.rest_room))
+        append(self.double_rule)
+        append(receipt.created_at.center(width, ' '))
+        append(self.thanks)
+        return lines
+
+
+@lru_cache(maxsize=64)
+def get_layout(line_width: int) -> ReceiptLayout:
+    return ReceiptLayout(line_width)
+
+
+def _prepare_from(receipt) -> PreparedReceipt:
+    return prepare_receipt(
+        products=receipt.products,
+        total=receipt.total,
+        payment_type=receipt.payment_type,
+        payment_amount=receipt.payment_amount,
+        rest=receipt.rest,
+        created_at=receipt.created_at,
+    )
+
+
+def render_receipt_lines(*, products: Iterable, total: float, payment_type: str,
+                         payment_amount: float, rest: float, created_at: datetime,
+                         line_width: int) -> List[str]:
+    """Builds the text version of a receipt from already loaded data."""
+    prepared = prepare_receipt(products=products, total=total, payment_type=payment_type,
+                               payment_amount=payment_amount, rest=rest, created_at=created_at)
+    return get_layout(line_width).assemble(prepared)
+
+
+def render_receipt_widths(receipt, line_widths: Sequence[int]) -> Dict[int, List[str]]:
+    """
+    Renders one receipt (anything with `Receipt` attributes) for several
+    terminal widths; numbers are formatted once for all of them.
+    """
+    prepared = _prepare_from(receipt)
+    return {width: get_layout(width).assemble(prepared) for width in line_widths}
+
+
+def render_receipts(receipts: Iterable, line_width: int) -> List[List[str]]:
+    """Renders a batch of receipts (anything with `Receipt` attributes) for one width."""
+    layout = get_layout(line_width)
+    return [layout.assemble(_prepare_from(receipt)) for receipt in receipts]
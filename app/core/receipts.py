@@ -0,0 +1,319 @@
+import asyncio
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.database.async_connect import async_session_maker
+from app.models.products import Receipt, Products
+from app.schemas import products
+from app.settings.config import settings
+from app.core.analytics import add_to_rollups
+from app.core.cache import LRUCache
+from app.core.metrics import timed
+from app.core.receipt_text import render_receipt_lines
+from app.core.storage import StorageBackend, get_storage
+
+RENDER_RECEIPT_JOB = "render_receipt"
+RENDER_RECEIPTS_JOB = "render_receipts"
+
+# uploads running at once inside one `render_receipts` job
+RENDER_UPLOAD_CONCURRENCY = 8
+
+
+def rendered_size(lines: List[str]) -> int:
+    return sys.getsizeof(lines) + sum(sys.getsizeof(line) for line in lines)
+
+
+# Rendered receipt text by (receipt_id, line_width). A receipt never changes
+# after creation, so entries are only dropped to stay within the memory budget.
+receipt_text_cache = LRUCache(
+    maxsize=settings.RECEIPT_TEXT_CACHE_SIZE,
+    max_bytes=settings.RECEIPT_TEXT_CACHE_MAX_BYTES,
+    sizeof=rendered_size,
+)
+
+# asyncpg accepts at most 32767 bind parameters per statement;
+# every product row takes 5 of them, every receipt row 6.
+PRODUCTS_INSERT_CHUNK = 5000
+RECEIPTS_INSERT_CHUNK = 5000
+
+
+def receipts_query(*, user_id: UUID, min_total: Optional[float] = None, max_total: Optional[float] = None,
+                   payment_type: Optional[str] = None, start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None):
+    """
+    `SELECT receipts` of one user with the list filters applied.
+    Each filter combination is covered by one of the `ix_receipts_user_id_*` indexes.
+    """
+    query = select(Receipt).where(Receipt.user_id == user_id)
+
+    if min_total is not None:
+        query = query.where(Receipt.total >= min_total)
+    if max_total is not None:
+        query = query.where(Receipt.total <= max_total)
+    if payment_type is not None:
+        query = query.where(Receipt.payment_type == payment_type)
+    if start_date is not None:
+        query = query.where(Receipt.created_at >= start_date)
+    if end_date is not None:
+        query = query.where(Receipt.created_at <= end_date)
+    return query
+
+
+def price_receipt(receipt_input: products.ReceiptInput) -> Tuple[List[products.ProductOutput], float, float]:
+    """
+    Product totals, the receipt total and the change for a receipt input.
+    A negative change means the payment does not cover the receipt.
+    """
+    total = 0
+    products_data = []
+    for product in receipt_input.products:
+        product_total = product.price * product.quantity
+        total += product_total
+        products_data.append(products.ProductOutput(
+            name=product.name,
+            price=product.price,
+            quantity=product.quantity,
+            total=product_total
+        ))
+    rest = round(receipt_input.payment_amount - total, 2)
+    return products_data, round(total, 2), rest
+
+
+class BulkReceipt(NamedTuple):
+    """A validated receipt of a bulk upload or a write batch, with its id generated up front."""
+    id: UUID
+    receipt_input: products.ReceiptInput
+    products_data: List[products.ProductOutput]
+    total: float
+    rest: float
+
+
+async def copy_receipts(*, session: AsyncSession, user_id: UUID, receipts: Sequence[BulkReceipt],
+                        created_at: datetime) -> None:
+    """
+    Loads receipts and their products with two `COPY ... FROM STDIN` streams
+    on the session's connection, inside the current transaction. Ids come
+    from the caller, so nothing has to be read back. Sales rollups are updated
+    in the same transaction. Committing is left to the caller.
+    """
+    connection = await session.connection()
+    # The asyncpg adapter sends BEGIN lazily, with the first statement. COPY
+    # bypasses it, so on a session that has not run anything yet (a cached
+    # principal) the rows would autocommit on their own; start the transaction.
+    await connection.execute(text("SELECT 1"))
+    driver = (await connection.get_raw_connection()).driver_connection
+
+    await driver.copy_records_to_table(
+        "receipts",
+        columns=("id", "user_id", "created_at", "total", "rest", "payment_type", "payment_amount"),
+        records=[
+            (receipt.id, user_id, created_at, receipt.total, receipt.rest,
+             receipt.receipt_input.payment_type, receipt.receipt_input.payment_amount)
+            for receipt in receipts
+        ],
+    )
+    await driver.copy_records_to_table(
+        "products",
+        columns=("receipt_id", "name", "price", "quantity", "total"),
+        records=[
+            (receipt.id, product.name, product.price, product.quantity, product.total)
+            for receipt in receipts
+            for product in receipt.products_data
+        ],
+    )
+    await add_to_rollups(session=session, user_id=user_id, receipts=[
+        (created_at, receipt.total, receipt.receipt_input.payment_amount, receipt.rest,
+         receipt.receipt_input.payment_type)
+        for receipt in receipts
+    ])
+
+
+async def insert_receipt(*, session: AsyncSession, user_id: UUID, total: float, rest: float,
+                         payment_type: str, payment_amount: float,
+                         products_data: List[products.ProductOutput]) -> Tuple[UUID, datetime]:
+    """
+    Inserts a receipt and all of its products inside the current transaction.
+
+    The receipt row comes back through `RETURNING id, created_at` and the products
+    go in as a single multi-row INSERT, so the number of round trips does not depend
+    on the basket size. The user's sales rollups are updated in the same
+    transaction. Committing is left to the caller.
+    """
+    result = await session.execute(
+        insert(Receipt)
+        .values(
+            user_id=user_id,
+            total=total,
+            rest=rest,
+            payment_type=payment_type,
+            payment_amount=payment_amount,
+        )
+        .returning(Receipt.id, Receipt.created_at)
+    )
+    receipt_id, created_at = result.one()
+
+    rows = [
+        {
+            "receipt_id": receipt_id,
+            "name": product.name,
+            "price": product.price,
+            "quantity": product.quantity,
+            "total": product.total,
+        }
+        for product in products_data
+    ]
+    for start in range(0, len(rows), PRODUCTS_INSERT_CHUNK):
+        await session.execute(insert(Products).values(rows[start:start + PRODUCTS_INSERT_CHUNK]))
+    await add_to_rollups(session=session, user_id=user_id,
+                         receipts=[(created_at, total, payment_amount, rest, payment_type)])
+
+    return receipt_id, created_at
+
+
+async def insert_receipts(*, session: AsyncSession,
+                          receipts: Sequence[Tuple[UUID, BulkReceipt]]) -> Dict[UUID, datetime]:
+    """
+    `insert_receipt` for receipts of any number of users, given as
+    `(user_id, receipt)`: one multi-row INSERT for the receipts and one for
+    their products. Returns `created_at` by receipt id. Rollups are updated
+    user by user in id order, so concurrent batches lock them in the same
+    order. Committing is left to the caller.
+    """
+    created: Dict[UUID, datetime] = {}
+    for start in range(0, len(receipts), RECEIPTS_INSERT_CHUNK):
+        result = await session.execute(
+            insert(Receipt)
+            .values([
+                {
+                    "id": receipt.id,
+                    "user_id": user_id,
+                    "total": receipt.total,
+                    "rest": receipt.rest,
+                    "payment_type": receipt.receipt_input.payment_type,
+                    "payment_amount": receipt.receipt_input.payment_amount,
+                }
+                for user_id, receipt in receipts[start:start + RECEIPTS_INSERT_CHUNK]
+            ])
+            .returning(Receipt.id, Receipt.created_at)
+        )
+        created.update(result.tuples().all())
+
+    rows = [
+        {
+            "receipt_id": receipt.id,
+            "name": product.name,
+            "price": product.price,
+            "quantity": product.quantity,
+            "total": product.total,
+        }
+        for _, receipt in receipts
+        for product in receipt.products_data
+    ]
+    for start in range(0, len(rows), PRODUCTS_INSERT_CHUNK):
+        await session.execute(insert(Products).values(rows[start:start + PRODUCTS_INSERT_CHUNK]))
+
+    by_user: Dict[UUID, List[BulkReceipt]] = {}
+    for user_id, receipt in receipts:
+        by_user.setdefault(user_id, []).append(receipt)
+    for user_id in sorted(by_user):
+        await add_to_rollups(session=session, user_id=user_id, receipts=[
+            (created[receipt.id], receipt.total, receipt.receipt_input.payment_amount, receipt.rest,
+             receipt.receipt_input.payment_type)
+            for receipt in by_user[user_id]
+        ])
+
+    return created
+
+
+async def _render_and_upload(receipt: Receipt, line_width: int, storage: StorageBackend) -> str:
+    lines = receipt_text_cache.get((receipt.id, line_width))
+    if lines is None:
+        with timed("render"):
+            lines = render_receipt_lines(
+                products=receipt.products,
+                total=receipt.total,
+                payment_type=receipt.payment_type,
+                payment_amount=receipt.payment_amount,
+                rest=receipt.rest,
+                created_at=receipt.created_at,
+                line_width=line_width
+            )
+        if settings.RECEIPT_TEXT_CACHE_PREWARM:
+            receipt_text_cache.set((receipt.id, line_width), lines)
+    with timed("storage"):
+        return await storage.put(str(receipt.id), "\n".join(lines).encode("utf-8"))
+
+
+async def render_receipt_job(payload: Dict[str, Any], *, storage: Optional[StorageBackend] = None) -> None:
+    """
+    Background job: renders the text version of a receipt, uploads it and
+    stores the resulting URL in `Receipt.recept_url`. The rendered text is
+    kept in `receipt_text_cache`, so the first `/text` request is a cache hit.
+
+    `storage` defaults to the configured backend.
+    Safe to run more than once - an already uploaded receipt is skipped.
+    """
+    if storage is None:
+        storage = get_storage()
+
+    receipt_id = UUID(payload["receipt_id"])
+    line_width = payload.get("line_width", 32)
+
+    async with async_session_maker() as session:
+        query = select(Receipt).options(selectinload(Receipt.products)).where(Receipt.id == receipt_id)
+        receipt = (await session.execute(query)).scalars().first()
+        if receipt is None or receipt.recept_url is not None:
+            return
+
+        recept_url = await _render_and_upload(receipt, line_width, storage)
+
+        await session.execute(update(Receipt).where(Receipt.id == receipt_id).values(recept_url=recept_url))
+        await session.commit()
+
+
+async def render_receipts_job(payload: Dict[str, Any], *, storage: Optional[StorageBackend] = None) -> None:
+    """
+    Background job: `render_receipt_job` for a batch of receipts (`receipt_ids`),
+    as enqueued by the bulk upload. Receipts and products are loaded with two
+    queries and uploads run concurrently. URLs of the receipts that did get
+    uploaded are saved even if others failed; the job is then retried and
+    skips them.
+    """
+    if storage is None:
+        storage = get_storage()
+
+    receipt_ids = [UUID(receipt_id) for receipt_id in payload["receipt_ids"]]
+    line_width = payload.get("line_width", 32)
+    semaphore = asyncio.Semaphore(RENDER_UPLOAD_CONCURRENCY)
+
+    async def upload(receipt: Receipt) -> str:
+        async with semaphore:
+            return await _render_and_upload(receipt, line_width, storage)
+
+    async with async_session_maker() as session:
+        query = (select(Receipt).options(selectinload(Receipt.products))
+                 .where(Receipt.id.in_(receipt_ids), Receipt.recept_url.is_(None)))
+        receipts = (await session.execute(query)).scalars().all()
+
+        results = await asyncio.gather(*(upload(receipt) for receipt in receipts), return_exceptions=True)
+        uploaded = [{"receipt_id": receipt.id, "url": result}
+                    for receipt, result in zip(receipts, results) if not isinstance(result, BaseException)]
+        if uploaded:
+            await session.execute(
+                update(Receipt.__table__)
+                .where(Receipt.__table__.c.id == bindparam("receipt_id"))
+                .values(recept_url=bindparam("url")),
+                uploaded,
+            )
+            await session.commit()
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
@@ -0,0 +1,78 @@
+from typing import List, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import case, func, literal, or_, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.products import Products, Receipt
+
+# shortest query a trigram index can serve
+MIN_QUERY_LENGTH = 3
+
+# None until the first search checks whether pg_trgm is installed (migration 4)
+_trigram_available: Optional[bool] = None
+
+
+class SearchHit(NamedTuple):
+    receipt: Receipt
+    score: float
+    matches: List[str]
+
+
+def like_pattern(query: str) -> str:
+    """`%query%` with LIKE wildcards in the query matched literally."""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def trigram_available(session: AsyncSession) -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        _trigram_available = (await session.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+        ))).scalar()
+    return _trigram_available
+
+
+async def search_receipts(session: AsyncSession, *, user_id: UUID, query: str, offset: int = 0,
+                          limit: int = 10, fuzzy: bool = True) -> List[SearchHit]:
+    """
+    Receipts of a user with a product whose name contains `query`
+    (case-insensitive) or, with pg_trgm and `fuzzy`, is word-similar to it,
+    best match first. A substring match scores 1, a fuzzy one its
+    `word_similarity`; ties go to the newer receipt.
+
+    The name condition is served by `ix_products_name_trgm`, the user
+    condition by `ix_receipts_user_id_created_at` - the planner starts from
+    whichever is more selective.
+    """
+    substring = Products.name.ilike(like_pattern(query))
+    if fuzzy and await trigram_available(session):
+        # `query <% name` - some word of the name is similar to the query
+        matches = or_(substring, literal(query).op("<%")(Products.name))
+        score = case((substring, 1.0), else_=func.word_similarity(query, Products.name))
+    else:
+        matches = substring
+        score = literal(1.0)
+
+    ranked = (
+        select(Receipt.id, func.max(score).label("score"),
+               func.array_agg(Products.name.distinct()).label("matches"))
+        .join(Products, Products.receipt_id == Receipt.id)
+        .where(Receipt.user_id == user_id, matches)
+        .group_by(Receipt.id)
+        .order_by(func.max(score).desc(), func.max(Receipt.created_at).desc(), Receipt.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = (await session.execute(ranked)).all()
+    if not rows:
+        return []
+
+    result = await session.execute(
+        select(Receipt).options(selectinload(Receipt.products)).where(Receipt.id.in_([row.id for row in rows]))
+    )
+    receipts = {receipt.id: receipt for receipt in result.scalars()}
+    return [SearchHit(receipts[row.id], row.score, sorted(row.matches)) for row in rows]
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from io import BytesIO
+from typing import BinaryIO, Dict, Optional, Union
+
+from app.settings.config import settings
+
+Payload = Union[bytes, BinaryIO]
+
+TEXT_CONTENT_TYPE = "text/plain; charset=utf-8"
+
+
+class StorageBackend(ABC):
+    """
+    Object storage for receipt artifacts.
+
+    `put` takes the object body either as bytes or as a binary file-like
+    object (streamed, never copied to a temporary file) and returns the
+    public URL of the stored object.
+    """
+
+    @abstractmethod
+    async def put(self, key: str, data: Payload, content_type: str = TEXT_CONTENT_TYPE) -> str:
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        ...
+
+    async def check(self) -> None:
+        """Readiness check: raises if the backend cannot be used right now."""
+
+    async def close(self) -> None:
+        pass
+
+
+class B2Storage(StorageBackend):
+    """
+    Backblaze B2 bucket. The account is authorized on first use and the
+    `B2Api` (with its HTTP connection pool) and bucket are kept for reuse.
+    b2sdk is synchronous, so every call runs in a worker thread.
+    """
+
+    def __init__(self, *, key_id: str, key: str, bucket_name: str, realm: str = "production"):
+        self.key_id = key_id
+        self.key = key
+        self.bucket_name = bucket_name
+        self.realm = realm
+        self._api = None
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    def _get_bucket(self):
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from b2sdk.v2 import InMemoryAccountInfo, B2Api
+
+                    api = B2Api(InMemoryAccountInfo())
+                    api.authorize_account(self.realm, self.key_id, self.key)
+                    bucket = api.get_bucket_by_name(self.bucket_name)
+                    # _api first: the unlocked check above lets other threads use it once _bucket is set
+                    self._api = api
+                    self._bucket = bucket
+        return self._bucket
+
+    def _put(self, key: str, data: Payload, content_type: str) -> str:
+        bucket = self._get_bucket()
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            bucket.upload_bytes(bytes(data), key, content_type=content_type)
+        else:
+            bucket.upload_unbound_stream(data, key, content_type=content_type)
+        return self._api.get_download_url_for_file_name(self.bucket_name, key)
+
+    def _get(self, key: str) -> bytes:
+        buffer = BytesIO()
+        self._get_bucket().download_file_by_name(key).save(buffer)
+        return buffer.getvalue()
+
+    async def put(self, key: str, data: Payload, content_type: str = TEXT_CONTENT_TYPE) -> str:
+        return await asyncio.to_thread(self._put, key, data, content_type)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._get, key)
+
+    def url_for(self, key: str) -> str:
+        self._get_bucket()
+        return self._api.get_download_url_for_file_name(self.bucket_name, key)
+
+    async def check(self) -> None:
+        # authorizes on the first call, afterwards only confirms it succeeded
+        await asyncio.to_thread(self._get_bucket)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Directory on the local filesystem, for development and offline runs.
+    Objects are written straight to their final path.
+    """
+
+    def __init__(self, *, root: str, base_url: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def _put(self, key: str, data: Payload) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                file.write(data)
+            else:
+                while chunk := data.read(64 * 1024):
+                    file.write(chunk)
+
+    def _get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as file:
+            return file.read()
+
+    async def put(self, key: str, data: Payload, content_type: str = TEXT_CONTENT_TYPE) -> str:
+        await asyncio.to_thread(self._put, key, data)
+        return self.url_for(key)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._get, key)
+
+    async def check(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        if not os.access(self.root, os.W_OK):
+            raise PermissionError(f"Storage directory is not writable: {self.root}")
+
+    def url_for(self, key: str) -> str:
+        if self.base_url:
+            return f"{self.base_url}/{key}"
+        return "file://" + self._path(key)
+
+
+class MemoryStorage(StorageBackend):
+    """Process-local dictionary, used by tests and benchmarks."""
+
+    def __init__(self):
+        self.objects: Dict[str, bytes] = {}
+        self.content_types: Dict[str, str] = {}
+
+    async def put(self, key: str, data: Payload, content_type: str = TEXT_CONTENT_TYPE) -> str:
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.read()
+        self.objects[key] = bytes(data)
+        self.content_types[key] = content_type
+        return self.url_for(key)
+
+    async def get(self, key: str) -> bytes:
+        return self.objects[key]
+
+    def url_for(self, key: str) -> str:
+        return f"memory://{key}"
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """Returns the process-wide backend selected by `STORAGE_BACKEND`."""
+    backend = settings.STORAGE_BACKEND
+    if backend == "b2":
+        return B2Storage(
+            key_id=settings.BACKBLAZE_ID,
+            key=settings.BACKBLAZE_KEY,
+            bucket_name=settings.BUCKET_NAME_ITEMS,
+        )
+    if backend == "local":
+        return LocalStorage(root=settings.STORAGE_LOCAL_ROOT, base_url=settings.STORAGE_PUBLIC_URL)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -1,43 +1,215 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from typing import AsyncGenerator
-from sqlalchemy.orm import declarative_base
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncio
+import logging
+import random
 import time
+from typing import AsyncGenerator, Optional
 
+from sqlalchemy import Delete, Insert, Update, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
 
 from app.settings.config import settings
+from app.core.cache import LRUCache
+from app.core.metrics import track_query_time
+from app.database.pool import PoolStats, engine_options, pool_status, track_pool_events
 
+logger = logging.getLogger(__name__)
 
 ASYNC_SQLALCHEMY_DATABASE_URL = (f"postgresql+asyncpg://{settings.POSTGRES_USER}:"
                            f"{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_SERVER}:"
                            f"{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
-# Створення асинхронного двигуна
-engine_async = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
-async_session_maker = async_sessionmaker(bind=engine_async, expire_on_commit=False)
+
+
+def replica_database_url() -> Optional[str]:
+    """Read-only replica with the primary's credentials and database name, if configured."""
+    if not settings.POSTGRES_REPLICA_SERVER:
+        return None
+    return (f"postgresql+asyncpg://{settings.POSTGRES_USER}:"
+            f"{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_REPLICA_SERVER}:"
+            f"{settings.POSTGRES_REPLICA_PORT or settings.POSTGRES_PORT}/{settings.POSTGRES_DB}")
+
 
 Base = declarative_base()
 
+_engine: Optional[AsyncEngine] = None
+pool_stats = PoolStats()
+
+_replica_engine: Optional[AsyncEngine] = None
+replica_pool_stats = PoolStats()
+# monotonic time until which the replica is considered down
+_replica_down_until = 0.0
+
+# Users who committed a write recently - their reads stay on the primary
+# for READ_YOUR_WRITES_SECONDS, so they never read a replica that is behind.
+# Per process: another worker may still route such a user to the replica.
+primary_pins = LRUCache(maxsize=10_000, ttl=settings.READ_YOUR_WRITES_SECONDS)
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Returns the process-wide engine, creating it on first use. Creating the
+    engine does not connect - the first connection is opened by the first query.
+    Pooling is configured by the DB_* settings (`app.database.pool`).
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **engine_options(pool_stats))
+        track_pool_events(_engine, pool_stats)
+        track_query_time(_engine)
+    return _engine
+
+
+def get_replica_engine() -> Optional[AsyncEngine]:
+    """Engine of the read replica (POSTGRES_REPLICA_SERVER), created on first use; None if not configured."""
+    global _replica_engine
+    url = replica_database_url()
+    if _replica_engine is None and url is not None:
+        options = engine_options(replica_pool_stats)
+        # a read falls back to the primary rather than waiting for a dead replica
+        options["connect_args"]["timeout"] = settings.REPLICA_CONNECT_TIMEOUT_SECONDS
+        _replica_engine = create_async_engine(url, **options)
+        track_pool_events(_replica_engine, replica_pool_stats)
+        track_query_time(_replica_engine)
+
+        @event.listens_for(_replica_engine.sync_engine, "handle_error")
+        def _replica_error(context):
+            if context.is_disconnect or context.connection is None:
+                mark_replica_down(context.original_exception)
+    return _replica_engine
+
+
+def replica_available() -> bool:
+    return replica_database_url() is not None and time.monotonic() >= _replica_down_until
+
+
+def mark_replica_down(error: BaseException) -> None:
+    """Sends reads to the primary for REPLICA_RETRY_SECONDS."""
+    global _replica_down_until
+    if time.monotonic() >= _replica_down_until:
+        logger.warning("Read replica is unavailable, using the primary for %ss: %r",
+                       settings.REPLICA_RETRY_SECONDS, error)
+    _replica_down_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def get_pool_status() -> dict:
+    return {
+        "primary": pool_status(_engine, pool_stats),
+        "replica": pool_status(_replica_engine, replica_pool_stats) if replica_database_url() else None,
+        "replica_available": replica_available(),
+    }
+
+
+class RoutingSession(Session):
+    """
+    Session bound to an engine when it first needs a connection, not when it
+    is created. With `info["read_only"]` set, plain reads go to the replica;
+    flushes and INSERT/UPDATE/DELETE statements always go to the primary.
+    If the replica cannot be reached when the session first connects to it,
+    the replica is marked down and the session continues on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.bind is not None:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        if (self.info.get("read_only") and not self._flushing
+                and not isinstance(clause, (Insert, Update, Delete)) and replica_available()):
+            return get_replica_engine().sync_engine
+        return get_engine().sync_engine
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        if _replica_engine is None or engine is not _replica_engine.sync_engine:
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        try:
+            # raises only when a new connection is opened: an open one is reused
+            return super()._connection_for_bind(engine, execution_options, **kw)
+        except Exception as error:
+            mark_replica_down(error)
+            self.info["read_only"] = False
+            return super()._connection_for_bind(get_engine().sync_engine, execution_options, **kw)
+
+
+def primary_bind() -> Engine:
+    """`bind_arguments={"bind": primary_bind()}` sends one statement to the primary regardless of routing."""
+    return get_engine().sync_engine
+
+
+def pin_to_primary(user_id: str) -> None:
+    """Sends the user's reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    if settings.READ_YOUR_WRITES_SECONDS > 0:
+        primary_pins.set(user_id, True)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_writer_to_primary(session):
+    writer_id = session.info.get("writer_id")
+    if writer_id is not None:
+        pin_to_primary(writer_id)
+
+
+def pinned_to_primary(user_id: Optional[str]) -> bool:
+    return user_id is not None and user_id in primary_pins
+
+
+def route_reads_to_replica(session: AsyncSession) -> bool:
+    """
+    Sends the session's reads to the replica, if it is configured and not
+    marked down; returns whether it does. Nothing connects until the first
+    query, so a session that runs none costs the replica nothing.
+    """
+    if not replica_available():
+        return False
+    session.info["read_only"] = True
+    return True
+
+
+# Створення фабрики асинхронних сесій
+async_session_maker = async_sessionmaker(sync_session_class=RoutingSession, expire_on_commit=False)
+
 
 # Асинхронна функція для отримання сесії
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
 
-while True:
-    try:
-        conn = psycopg2.connect(
-            host=settings.POSTGRES_SERVER,
-            database=settings.POSTGRES_DB,
-            user=settings.POSTGRES_USER,
-            password=settings.POSTGRES_PASSWORD,
-            cursor_factory=RealDictCursor,
-        )
-        cursor = conn.cursor()
-        print("Database connection was successful")
-        break
-
-    except Exception as error:
-        print("Connection to database failed")
-        print("Error:", error)
-        time.sleep(2)
+
+async def ping_database(timeout: Optional[float] = None) -> None:
+    """Runs `SELECT 1`; raises if the database cannot be reached within `timeout` seconds."""
+    async def ping():
+        async with get_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.wait_for(ping(), timeout=timeout or settings.DB_CONNECT_TIMEOUT_SECONDS)
+
+
+async def wait_for_database(*, attempts: Optional[int] = None, backoff_base: Optional[float] = None,
+                            backoff_max: Optional[float] = None) -> None:
+    """
+    Waits until the database answers, retrying with capped exponential backoff.
+    Raises the last error after `attempts` failures instead of hanging forever.
+    """
+    attempts = attempts or settings.DB_CONNECT_ATTEMPTS
+    backoff_base = backoff_base if backoff_base is not None else settings.DB_CONNECT_BACKOFF_BASE_SECONDS
+    backoff_max = backoff_max if backoff_max is not None else settings.DB_CONNECT_BACKOFF_MAX_SECONDS
+
+    for attempt in range(1, attempts + 1):
+        try:
+            await ping_database()
+            logger.info("Database connection was successful")
+            return
+        except Exception as error:
+            if attempt == attempts:
+                logger.error("Connection to database failed after %s attempts: %r", attempts, error)
+                raise
+            delay = min(backoff_max, backoff_base * 2 ** (attempt - 1)) * random.uniform(0.9, 1.1)
+            logger.warning("Connection to database failed (attempt %s/%s): %r; retrying in %.1fs",
+                           attempt, attempts, error, delay)
+            await asyncio.sleep(delay)
+
+
+async def dispose_engine() -> None:
+    """Closes pooled connections; the engines reconnect if they are used again."""
+    if _engine is not None:
+        await _engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import re
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database.async_connect import Base, dispose_engine, get_engine
+
+logger = logging.getLogger(__name__)
+
+# arbitrary application-wide key for pg_advisory_lock
+MIGRATIONS_LOCK_KEY = 724_311_905
+
+_CONCURRENT_INDEX = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)",
+                               re.IGNORECASE)
+
+
+class MigrationUnavailable(Exception):
+    """Raised by a migration's `run` when the database cannot apply it yet; it is retried on the next run."""
+
+
+class Migration(NamedTuple):
+    """
+    One schema change: SQL `statements` and/or a `run` callable taking a sync
+    `Connection`. Statements must be idempotent (`IF NOT EXISTS`) so that an
+    interrupted migration can simply be rerun.
+
+    `transactional=False` runs the migration in autocommit mode - required for
+    `CREATE INDEX CONCURRENTLY`, which does not block writes on large tables.
+    A failed or cancelled concurrent build leaves an INVALID index that
+    `IF NOT EXISTS` would keep skipping, so such a statement first drops an
+    invalid index of that name (`run` callables use `_drop_invalid_index`).
+    """
+    version: int
+    name: str
+    statements: Sequence[str] = ()
+    run: Optional[Callable[[Connection], None]] = None
+    transactional: bool = True
+
+
+def _drop_invalid_index(connection: Connection, name: str) -> None:
+    """Drops index `name` if an interrupted `CREATE INDEX CONCURRENTLY` left it INVALID; autocommit only."""
+    invalid = connection.execute(text(
+        "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"
+    ), {"name": name}).scalar()
+    if invalid:
+        logger.warning("Dropping invalid index %s left by an interrupted build", name)
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def _create_tables(connection: Connection) -> None:
+    # import every model so that the metadata is complete
+    from app.models import user, products, jobs, analytics, idempotency  # noqa: F401
+
+    Base.metadata.create_all(connection)
+
+
+def _create_sales_rollups(connection: Connection) -> None:
+    from app.core.analytics import REBUILD_ROLLUPS_SQL
+    from app.models import user  # noqa: F401 - target of the user_id foreign key
+    from app.models.analytics import SalesRollup
+
+    SalesRollup.__table__.create(connection, checkfirst=True)
+    # backfill from the receipts created before the rollups existed
+    connection.execute(text("DELETE FROM sales_rollups"))
+    connection.execute(text(REBUILD_ROLLUPS_SQL.format(user_filter="")))
+
+
+def _create_idempotency_keys(connection: Connection) -> None:
+    from app.models import user  # noqa: F401 - target of the user_id foreign key
+    from app.models.idempotency import IdempotencyKey
+
+    IdempotencyKey.__table__.create(connection, checkfirst=True)
+
+
+def _create_product_name_trigram_index(connection: Connection) -> None:
+    available = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')"
+    )).scalar()
+    if not available:
+        raise MigrationUnavailable("the pg_trgm extension is not installed on the database server")
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    _drop_invalid_index(connection, "ix_products_name_trgm")
+    # serves both `ILIKE '%...%'` and the `<%` word-similarity operator
+    connection.execute(text(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_name_trgm "
+        "ON products USING gin (name gin_trgm_ops)"
+    ))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial schema", run=_create_tables),
+    Migration(2, "receipt filter indexes", transactional=False, statements=[
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_receipts_user_id_created_at "
+        "ON receipts (user_id, created_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_receipts_user_id_total "
+        "ON receipts (user_id, total)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_receipts_user_id_payment_type_created_at "
+        "ON receipts (user_id, payment_type, created_at, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_receipt_id "
+        "ON products (receipt_id)",
+        "ANALYZE receipts",
+        "ANALYZE products",
+    ]),
+    Migration(3, "sales rollups", run=_create_sales_rollups),
+    Migration(4, "product name trigram index", transactional=False, run=_create_product_name_trigram_index),
+    Migration(5, "idempotency keys", run=_create_idempotency_keys),
+    # shared token buckets of RATE_LIMIT_BACKEND=postgres - losing them in a crash is harmless
+    Migration(6, "rate limit buckets", statements=[
+        "CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets ("
+        "key text PRIMARY KEY, tokens double precision NOT NULL, updated_at timestamptz NOT NULL)",
+    ]),
+]
+
+
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    if migration.transactional:
+        async with engine.begin() as conn:
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            if migration.run is not None:
+                await conn.run_sync(migration.run)
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": migration.version, "name": migration.name},
+            )
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in migration.statements:
+            index = _CONCURRENT_INDEX.match(statement.strip())
+            if index is not None:
+                await conn.run_sync(_drop_invalid_index, index.group(1))
+            await conn.execute(text(statement))
+        if migration.run is not None:
+            await conn.run_sync(migration.run)
+        await conn.execute(
+            text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+            {"version": migration.version, "name": migration.name},
+        )
+
+
+async def run_migrations(engine: AsyncEngine, migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """
+    Applies pending migrations in version order and returns their versions.
+    Applied versions are recorded in `schema_migrations`; a migration raising
+    `MigrationUnavailable` stays pending and later ones still apply. An advisory lock keeps
+    concurrently starting workers from applying the same migration twice.
+    Run manually with `python -m app.database.migrations`.
+    """
+    applied_now = []
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        try:
+            await lock_conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version INTEGER PRIMARY KEY, "
+                "name VARCHAR NOT NULL, "
+                "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+            ))
+            result = await lock_conn.execute(text("SELECT version FROM schema_migrations"))
+            applied = set(result.scalars().all())
+
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in applied:
+                    continue
+                try:
+                    await _apply(engine, migration)
+                except MigrationUnavailable as err:
+                    logger.warning("Skipped migration %s: %s (%s)", migration.version, migration.name, err)
+                    continue
+                applied_now.append(migration.version)
+                logger.info("Applied migration %s: %s", migration.version, migration.name)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    return applied_now
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        applied = await run_migrations(get_engine())
+        if not applied:
+            logger.info("Database schema is up to date.")
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
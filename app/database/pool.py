@@ -0,0 +1,160 @@
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Type
+from uuid import uuid4
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool
+
+from app.settings.config import settings
+
+
+class PoolStats:
+    """Counters of one engine's pool; survives `engine.dispose()`, which replaces the pool object."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # checkouts waiting for a connection right now
+        self.waiting = 0
+        self._waits = deque(maxlen=1000)
+        self._recent = deque(maxlen=1000)
+
+    def record_wait(self, seconds: float) -> None:
+        self.checkouts += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        self._waits.append(seconds)
+        self._recent.append((time.monotonic(), seconds))
+
+    def recent_wait(self, window: float) -> float:
+        """Average checkout wait over the last `window` seconds, 0 without checkouts."""
+        since = time.monotonic() - window
+        total = count = 0
+        for at, seconds in reversed(self._recent):
+            if at < since:
+                break
+            total += seconds
+            count += 1
+        return total / count if count else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+        return {
+            "checkouts": self.checkouts,
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_avg_ms": self.total_wait / self.checkouts * 1000 if self.checkouts else None,
+            "wait_p95_ms": waits[int(len(waits) * 0.95) - 1] * 1000 if len(waits) > 1 else None,
+            "wait_max_ms": self.max_wait * 1000,
+        }
+
+
+def instrumented_queue_pool(stats: PoolStats) -> Type[AsyncAdaptedQueuePool]:
+    """
+    `AsyncAdaptedQueuePool` that records how long every checkout waited for a
+    connection (including opening a new one) and how many gave up after
+    `pool_timeout` into `stats`.
+    """
+
+    class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+        pool_stats = stats
+        # log under `sqlalchemy.pool` like the stock pool, which SQLAlchemy keeps at WARNING
+        _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+        def _do_get(self):
+            started = time.perf_counter()
+            self.pool_stats.waiting += 1
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                self.pool_stats.timeouts += 1
+                raise
+            finally:
+                self.pool_stats.waiting -= 1
+                self.pool_stats.record_wait(time.perf_counter() - started)
+
+    return InstrumentedQueuePool
+
+
+def engine_options(stats: PoolStats) -> Dict[str, Any]:
+    """
+    `create_async_engine` keyword arguments built from the DB_* settings.
+
+    With DB_PGBOUNCER the app talks to PgBouncer in transaction pooling
+    mode: prepared statements are neither cached nor reused by name, since
+    consecutive transactions may run on different server connections, and
+    startup parameters are not sent. Set `statement_timeout` on the database
+    role in that case.
+    """
+    connect_args: Dict[str, Any] = {"timeout": settings.DB_CONNECT_TIMEOUT_SECONDS}
+    if settings.DB_PGBOUNCER:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    else:
+        connect_args.update(
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+            prepared_statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+        )
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+
+    options: Dict[str, Any] = {
+        "connect_args": connect_args,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    if settings.DB_POOL_CLASS == "null":
+        # a connection per checkout, e.g. when PgBouncer already pools them
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=instrumented_queue_pool(stats),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    return options
+
+
+def track_pool_events(engine: AsyncEngine, stats: PoolStats) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+    if settings.DB_POOL_CLASS == "null":
+        @event.listens_for(engine.sync_engine, "checkout")
+        def _checkout(dbapi_connection, connection_record, connection_proxy):
+            stats.checkouts += 1
+
+
+def pool_status(engine: Optional[AsyncEngine], stats: PoolStats) -> Dict[str, Any]:
+    """Current pool occupancy plus the accumulated `stats`."""
+    status: Dict[str, Any] = {"pool_class": settings.DB_POOL_CLASS, "pgbouncer": settings.DB_PGBOUNCER}
+    pool: Optional[Pool] = engine.pool if engine is not None else None
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # negative while the pool has not opened `size` connections yet
+            overflow=max(pool.overflow(), 0),
+            timeout_seconds=pool.timeout(),
+        )
+    status.update(stats.summary())
+    return status
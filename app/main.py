@@ -1,27 +1,83 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.main import api_router
+from app.api.admission import AdmissionMiddleware, admission
+from app.api.metrics import MetricsMiddleware, metrics_endpoint
+from app.api.profiler import QueryProfilerMiddleware
 from app.settings.config import settings
-from app.database.async_connect import engine_async
-from app.models import user
+from app.database.async_connect import dispose_engine, get_engine, wait_for_database
+from app.database.migrations import run_migrations
+from app.core.jobs import job_queue
+from app.core.group_commit import receipt_batcher
+from app.core.security import password_hasher
+from app.core.storage import get_storage
+from app.core.receipts import RENDER_RECEIPT_JOB, RENDER_RECEIPTS_JOB, render_receipt_job, render_receipts_job
+
+logger = logging.getLogger(__name__)
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
+def configure_logging():
+    # at startup, not on import: a process that only imports the app keeps its own logging setup,
+    # and a root logger configured already (e.g. by a log config file) is left alone
+    logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 async def init_db():
-    async with engine_async.begin() as conn:
-        try:
-            await conn.run_sync(user.Base.metadata.create_all)
-            print("All tables created successfully.")
-        except Exception as e:
-            print(f"Error during table creation: {e}")
+    # raises after DB_CONNECT_ATTEMPTS, so a worker without a database fails to start instead of hanging
+    await wait_for_database()
+    # a failed migration fails the startup too - the worker must not serve (or report ready) on a stale schema
+    try:
+        await run_migrations(get_engine())
+    except Exception:
+        logger.exception("Error during database migration")
+        raise
+    logger.info("Database schema is up to date.")
+
+async def warm_up_storage():
+    # B2 authorization takes a network round trip - do it in the background instead of delaying startup
+    try:
+        await get_storage().check()
+    except Exception as e:
+        logger.warning("Storage is not ready yet: %r", e)
+
+async def start_job_queue():
+    job_queue.register(RENDER_RECEIPT_JOB, render_receipt_job)
+    job_queue.register(RENDER_RECEIPTS_JOB, render_receipts_job)
+    await job_queue.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing connects at import time - logging, the engine, storage client and workers start here.
+    configure_logging()
+    await init_db()
+    storage_warm_up = asyncio.create_task(warm_up_storage())
+    await start_job_queue()
+    try:
+        yield
+    finally:
+        storage_warm_up.cancel()
+        # queued receipts are written before the job queue and the engine go away
+        await receipt_batcher.stop()
+        await job_queue.stop()
+        password_hasher.shutdown()
+        await admission.close()
+        await get_storage().close()
+        await dispose_engine()
 
 app = FastAPI(title=settings.PROJECT_NAME,
     docs_url="/swagger/docs",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
-    on_startup=[init_db])
+    lifespan=lifespan)
+
+# added before CORS, so that CORS wraps it and 429/503 responses carry CORS headers too
+app.add_middleware(AdmissionMiddleware)
 
 origins = ["*"]
 
@@ -33,4 +89,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.PROFILER_ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
+
+if settings.METRICS_ENABLED:
+    # added last, so it is the outermost middleware and also sees requests rejected by admission control
+    app.add_middleware(MetricsMiddleware)
+    app.add_route(settings.METRICS_PATH, metrics_endpoint, include_in_schema=False)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, PrimaryKeyConstraint
+
+from sqlalchemy.sql.sqltypes import TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.async_connect import Base
+
+
+class SalesRollup(Base):
+    """
+    Per-user sales aggregated into UTC day and hour buckets. Kept up to date
+    in the transaction that inserts receipts (`app.core.analytics`).
+    """
+    __tablename__ = "sales_rollups"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    # "day" or "hour"
+    granularity = Column(String, nullable=False)
+    # start of the bucket, UTC
+    bucket = Column(TIMESTAMP(timezone=True), nullable=False)
+    receipts_count = Column(Integer, nullable=False, server_default='0')
+    total = Column(Float, nullable=False, server_default='0')
+    payment_amount = Column(Float, nullable=False, server_default='0')
+    rest = Column(Float, nullable=False, server_default='0')
+    cash_count = Column(Integer, nullable=False, server_default='0')
+    cash_total = Column(Float, nullable=False, server_default='0')
+    card_count = Column(Integer, nullable=False, server_default='0')
+    card_total = Column(Float, nullable=False, server_default='0')
+
+    # date range lookups of one user go straight through the primary key
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "granularity", "bucket"),
+    )
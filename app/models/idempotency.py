@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, Index, PrimaryKeyConstraint
+from sqlalchemy.sql.expression import text
+
+from sqlalchemy.sql.sqltypes import TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID
+from app.database.async_connect import Base
+
+
+class IdempotencyKey(Base):
+    """
+    `Idempotency-Key` of a write request and the response it produced
+    (`app.core.idempotency`). The row is inserted in the request's own
+    transaction, so it exists exactly when the write was committed.
+    """
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    key = Column(String(255), nullable=False)
+    # sha256 of the request body - the same key with another body is rejected
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
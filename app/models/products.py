@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, JSON
+from sqlalchemy import Column, String, Float, ForeignKey, JSON, Index
 from sqlalchemy.sql.expression import text
 from sqlalchemy.orm import relationship
 
@@ -10,7 +10,7 @@ class Products(Base):
     __tablename__ = "products"
 
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=text('uuid_generate_v4()'), nullable=False)
-    receipt_id = Column(UUID, ForeignKey("receipts.id"))
+    receipt_id = Column(UUID, ForeignKey("receipts.id"), index=True)
     name = Column(String, index=True)
     price = Column(Float)
     quantity = Column(Float)
@@ -30,3 +30,16 @@ class Receipt(Base):
     recept_url = Column(String)
     products = relationship("Products", back_populates="receipt")
 
+    @property
+    def payment(self) -> dict:
+        """`payment` object of the API output."""
+        return {"type": self.payment_type, "amount": self.payment_amount}
+
+    # Every listing filters by user; the trailing columns serve the
+    # created_at range / keyset order, the total range and the payment filter.
+    __table_args__ = (
+        Index("ix_receipts_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_receipts_user_id_total", "user_id", "total"),
+        Index("ix_receipts_user_id_payment_type_created_at", "user_id", "payment_type", "created_at", "id"),
+    )
+
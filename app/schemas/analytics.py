@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import datetime
+
+
+class PaymentSplit(BaseModel):
+    count: int
+    total: float
+
+class SalesFigures(BaseModel):
+    receipts_count: int
+    total: float
+    payment_amount: float
+    rest: float
+    cash: PaymentSplit
+    card: PaymentSplit
+
+class SalesBucket(SalesFigures):
+    bucket: datetime
+
+class SalesReport(BaseModel):
+    granularity: Literal["day", "hour"]
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    summary: SalesFigures
+    buckets: List[SalesBucket]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, UUID4, Strict, Field, ConfigDict
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from datetime import datetime
 
 
@@ -14,16 +14,23 @@ class ReceiptInput(BaseModel):
     payment_amount: float
 
 class ProductOutput(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     name: str
     price: float
     quantity: float
     total: float
 
 class ReceiptPayment(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     type: str
     amount: float
 
 class ReceiptOutput(BaseModel):
+    # validated straight from a `Receipt` row with its `products` loaded
+    model_config = ConfigDict(from_attributes=True)
+
     id: Annotated[UUID4, Strict(False)]
     products: List[ProductOutput]
     payment: ReceiptPayment
@@ -31,3 +38,23 @@ class ReceiptOutput(BaseModel):
     rest: float
     created_at: datetime
     recept_url: str | None
+
+class ReceiptPage(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    total_count: Optional[int]
+    items: List[ReceiptOutput]
+    next_cursor: Optional[str]
+
+class ReceiptSearchResult(ReceiptOutput):
+    # 1 for a substring match, otherwise the trigram word similarity of the best matching product
+    score: float
+    matches: List[str]
+
+class ReceiptSearchPage(BaseModel):
+    items: List[ReceiptSearchResult]
+    next_offset: Optional[int]
+
+class ReceiptExportRecord(ReceiptOutput):
+    # keyset position of this receipt - pass it as `cursor` to continue the export after it
+    cursor: str
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import secrets
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -15,15 +16,125 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # startup waits for the database with capped exponential backoff, then gives up
+    DB_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    DB_CONNECT_ATTEMPTS: int = 10
+    DB_CONNECT_BACKOFF_BASE_SECONDS: float = 0.5
+    DB_CONNECT_BACKOFF_MAX_SECONDS: float = 5.0
+
+    # Read-only replica for GET requests (same user, password and database as the primary)
+    POSTGRES_REPLICA_SERVER: Optional[str] = None
+    POSTGRES_REPLICA_PORT: Optional[int] = None
+    REPLICA_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    # after a failure reads go to the primary for this long before the replica is tried again
+    REPLICA_RETRY_SECONDS: float = 10.0
+    # reads of a user who just wrote stay on the primary for this long, 0 - off
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Connection pool, per worker process. "null" opens a connection per
+    # checkout - use it when PgBouncer does the pooling.
+    DB_POOL_CLASS: Literal["queue", "null"] = "queue"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # -1 keeps connections forever; set below the server/balancer idle timeout
+    DB_POOL_RECYCLE_SECONDS: int = -1
+    DB_POOL_PRE_PING: bool = False
+    # prepared statements cached per connection (asyncpg and SQLAlchemy)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # server-side limit per statement, 0 - no limit (not sent with DB_PGBOUNCER)
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    # PgBouncer in transaction mode: no prepared statement caching or reuse
+    DB_PGBOUNCER: bool = False
 
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
     ALGORITHM: str
     SECRET_KEY: str = secrets.token_urlsafe(32)
 
-    BACKBLAZE_ID: str
-    BACKBLAZE_KEY: str
-    BUCKET_NAME_ITEMS: str
+    # bcrypt work factor; hashes with other rounds are re-hashed on next login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_WAITING: int = 64
+
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+
+    RECEIPT_TEXT_CACHE_SIZE: int = 50_000
+    RECEIPT_TEXT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # keep the text rendered by the upload job, so the default width is a hit right away
+    RECEIPT_TEXT_CACHE_PREWARM: bool = True
+
+    # "b2" - Backblaze B2, "local" - directory on disk, "memory" - in-process (tests)
+    STORAGE_BACKEND: Literal["b2", "local", "memory"] = "b2"
+    STORAGE_LOCAL_ROOT: str = "app/checks"
+    STORAGE_PUBLIC_URL: Optional[str] = None
+
+    BACKBLAZE_ID: str = ""
+    BACKBLAZE_KEY: str = ""
+    BUCKET_NAME_ITEMS: str = ""
+
+    JOBS_CONCURRENCY: int = 4
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_BACKOFF_BASE_SECONDS: float = 1.0
+    JOBS_BACKOFF_MAX_SECONDS: float = 300.0
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+    JOBS_LEASE_SECONDS: float = 120.0
+
+    # POST /receipts/bulk: items per request and receipts per background render job
+    BULK_RECEIPTS_MAX_ITEMS: int = 10_000
+    BULK_RENDER_JOB_SIZE: int = 100
+
+    # How GET /receipts/ and GET /receipts/{id}/ build responses: "orm" - ORM objects and
+    # pydantic models, "sql" - Postgres assembles the JSON documents (`app.core.receipt_json`)
+    RECEIPT_LIST_READ_ENGINE: Literal["orm", "sql"] = "orm"
+    RECEIPT_DETAIL_READ_ENGINE: Literal["orm", "sql"] = "orm"
+
+    # Idempotency-Key of POST /receipts/: how long a key is remembered, and responses cached in memory
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = 24 * 3600
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+
+    # How POST /receipts/ writes: "direct" - a transaction per request, "batched" - group commit
+    # (`app.core.group_commit`), flushed RECEIPT_BATCH_WINDOW_MS after the oldest queued receipt
+    # or as soon as RECEIPT_BATCH_MAX_ITEMS are queued
+    RECEIPT_WRITE_MODE: Literal["direct", "batched"] = "direct"
+    RECEIPT_BATCH_WINDOW_MS: float = 5.0
+    RECEIPT_BATCH_MAX_ITEMS: int = 100
+
+    # Admission control (`app.api.admission`): token buckets per user (JWT `user_id`, the client
+    # address without a token), separate for reads (GET/HEAD) and writes; an empty bucket - 429
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_READS_PER_SECOND: float = 20.0
+    RATE_LIMIT_READ_BURST: int = 40
+    RATE_LIMIT_WRITES_PER_SECOND: float = 10.0
+    RATE_LIMIT_WRITE_BURST: int = 20
+    # "memory" - buckets per worker process, "postgres" - shared by all workers
+    RATE_LIMIT_BACKEND: Literal["memory", "postgres"] = "memory"
+    RATE_LIMIT_BUCKETS: int = 100_000
+    RATE_LIMIT_DB_POOL_SIZE: int = 2
+    RATE_LIMIT_DB_TIMEOUT_SECONDS: float = 0.1
+    # Load shedding, per worker: 503 while this many requests are in flight, or while the average
+    # DB pool wait over the last LOAD_SHED_WINDOW_SECONDS is above LOAD_SHED_POOL_WAIT_MS; 0 - off
+    LOAD_SHED_MAX_IN_FLIGHT: int = 500
+    LOAD_SHED_POOL_WAIT_MS: float = 1000.0
+    LOAD_SHED_WINDOW_SECONDS: float = 2.0
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 1
+
+    # Per-route latency and DB/render/storage time in the Prometheus text format at METRICS_PATH
+    # (outside API_V1_STR); with METRICS_TOKEN set, scrapes need `Authorization: Bearer <token>`
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
+    METRICS_TOKEN: Optional[str] = None
+    LOG_LEVEL: str = "INFO"
 
+    # SQL profiler (`app.core.profiler`): statements and DB time per request. Statements slower than
+    # SLOW_QUERY_MS go to the `app.slow_queries` log with literals and parameters redacted; one run
+    # QUERY_REPEAT_THRESHOLD times in a request is logged as an N+1 candidate (0 - off). A superuser's
+    # request with the PROFILER_DEBUG_HEADER header gets the profile in response headers and the log.
+    PROFILER_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200.0
+    QUERY_REPEAT_THRESHOLD: int = 10
+    PROFILER_DEBUG_HEADER: str = "X-Debug-Queries"
 
 
 
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from uuid import UUID, uuid4
+
+import httpx
+import pytest_asyncio
+from sqlalchemy import text
+
+from app.core.security import create_access_token
+from app.database.async_connect import async_session_maker, get_engine
+from app.database.migrations import run_migrations
+
+
+@pytest_asyncio.fixture
+async def make_user():
+    """Creates throwaway users in the migrated test database; the engine is disposed afterwards."""
+    await run_migrations(get_engine())
+
+    async def make() -> UUID:
+        user_id = uuid4()
+        async with async_session_maker() as session:
+            await session.execute(text(
+                "INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :name, :name, 'x')"
+            ), {"id": user_id, "name": f"{user_id}@example.com"})
+            await session.commit()
+        return user_id
+
+    yield make
+    await get_engine().dispose()
+
+
+@pytest_asyncio.fixture
+async def user_id(make_user):
+    return await make_user()
+
+
+@pytest_asyncio.fixture
+async def api(user_id, monkeypatch):
+    """
+    Client of the whole app (in-process ASGI, no lifespan) authenticated as
+    `user_id`, with rate limiting off so that tests can send many requests.
+    """
+    from app.api.admission import admission
+    from app.main import app
+
+    monkeypatch.setattr(admission, "rate_limit", False)
+    headers = {"Authorization": f"Bearer {create_access_token(user_id, timedelta(minutes=5))}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test",
+                                 headers=headers) as client:
+        yield client
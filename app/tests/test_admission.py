@@ -0,0 +1,130 @@
+import asyncio
+from datetime import timedelta
+from uuid import uuid4
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.api.admission import EXEMPT_PATHS, AdmissionController, AdmissionMiddleware
+from app.core.rate_limit import MemoryRateLimitBackend, PostgresRateLimitBackend, RateLimitBackend
+from app.core.security import create_access_token
+from app.database.async_connect import ASYNC_SQLALCHEMY_DATABASE_URL, get_engine
+from app.database.migrations import run_migrations
+from app.database.pool import PoolStats
+from app.settings.config import settings
+
+
+@pytest_asyncio.fixture(params=["memory", "postgres"])
+async def backend(request):
+    if request.param == "memory":
+        yield MemoryRateLimitBackend(maxsize=100)
+        return
+    await run_migrations(get_engine())
+    await get_engine().dispose()
+    backend = PostgresRateLimitBackend(url=ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=1, pool_timeout=1)
+    yield backend
+    async with backend._get_engine().begin() as conn:
+        await conn.execute(text("DELETE FROM rate_limit_buckets WHERE key LIKE 'test:%'"))
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_refills(backend):
+    key = f"test:{uuid4()}"
+    assert [await backend.take(key, 10, 2) for _ in range(2)] == [0, 0]
+    wait = await backend.take(key, 10, 2)
+    assert 0 < wait <= 0.1
+    # a refused request does not spend anything
+    assert 0 < await backend.take(key, 10, 2) <= 0.1
+    await asyncio.sleep(0.12)
+    assert await backend.take(key, 10, 2) == 0
+    assert await backend.take(f"test:{uuid4()}", 10, 2) == 0
+
+
+def test_backend_without_take_fails_on_instantiation():
+    class NoTake(RateLimitBackend):
+        pass
+
+    with pytest.raises(TypeError, match="take"):
+        NoTake()
+
+
+async def slow(request):
+    await asyncio.sleep(float(request.query_params.get("sleep", 0)))
+    return PlainTextResponse("ok")
+
+
+def client(**options):
+    defaults = dict(backend=MemoryRateLimitBackend(maxsize=100), read_rate=0.5, read_burst=2, write_rate=0.5,
+                    write_burst=1, max_in_flight=0, max_pool_wait=0, pool_wait_window=1, pool=PoolStats())
+    controller = AdmissionController(**{**defaults, **options})
+    routes = [Route(path, slow, methods=["GET", "POST"]) for path in ["/", *EXEMPT_PATHS]]
+    app = AdmissionMiddleware(Starlette(routes=routes), controller)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test"), controller
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {create_access_token(user_id, timedelta(minutes=5))}"}
+
+
+@pytest.mark.asyncio
+async def test_reads_and_writes_have_separate_budgets_per_user():
+    http, controller = client()
+    alice, bob = auth(uuid4()), auth(uuid4())
+    async with http:
+        assert [(await http.get("/", headers=alice)).status_code for _ in range(3)] == [200, 200, 429]
+        assert [(await http.post("/", headers=alice)).status_code for _ in range(2)] == [200, 429]
+        assert (await http.get("/", headers=bob)).status_code == 200
+
+        limited = await http.get("/", headers=alice)
+        assert limited.status_code == 429 and limited.headers["Retry-After"] == "2"
+        assert limited.json() == {"detail": "Rate limit exceeded"}
+    assert controller.stats()["rate_limited"] == 3
+
+
+@pytest.mark.asyncio
+async def test_requests_over_the_in_flight_limit_are_shed():
+    http, controller = client(rate_limit=False, max_in_flight=2)
+    async with http:
+        slow_requests = [asyncio.create_task(http.get("/", params={"sleep": 0.2})) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        shed = await http.get("/")
+        assert shed.status_code == 503 and shed.headers["Retry-After"] == "1"
+        assert [response.status_code for response in await asyncio.gather(*slow_requests)] == [200, 200]
+        assert (await http.get("/")).status_code == 200
+    assert controller.in_flight == 0 and controller.stats()["shed_in_flight"] == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_are_shed_while_the_pool_is_slow():
+    pool = PoolStats()
+    http, controller = client(rate_limit=False, max_pool_wait=0.5, pool_wait_window=0.1, pool=pool)
+    async with http:
+        pool.record_wait(0.01)
+        assert (await http.get("/")).status_code == 200
+        pool.record_wait(2.0)
+        assert (await http.get("/")).status_code == 503
+        # the signal fades once the slow checkouts leave the window
+        await asyncio.sleep(0.15)
+        assert (await http.get("/")).status_code == 200
+    assert controller.stats()["shed_pool_wait"] == 1
+
+
+@pytest.mark.asyncio
+async def test_health_and_metrics_are_not_limited_or_shed():
+    pool = PoolStats()
+    http, controller = client(read_burst=1, max_pool_wait=0.5, pool_wait_window=60, pool=pool)
+    probes = [f"{settings.API_V1_STR}/health/live", f"{settings.API_V1_STR}/health/ready", settings.METRICS_PATH]
+    async with http:
+        for path in probes * 3:
+            assert (await http.get(path)).status_code == 200
+        pool.record_wait(2.0)
+        assert (await http.get("/")).status_code == 503
+        for path in probes:
+            assert (await http.get(path)).status_code == 200
+    assert controller.stats()["admitted"] == 0
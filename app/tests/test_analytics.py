@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.future import select
+
+from app.core.analytics import load_rollups, rebuild_rollups
+from app.core.receipts import BulkReceipt, copy_receipts, insert_receipt, price_receipt
+from app.database.async_connect import async_session_maker
+from app.models.analytics import SalesRollup
+from app.schemas.products import ReceiptInput
+
+
+def receipt(price, payment_type):
+    receipt_input = ReceiptInput(products=[{"name": "item", "price": price, "quantity": 2}],
+                                 payment_type=payment_type, payment_amount=price * 2 + 1)
+    products_data, total, rest = price_receipt(receipt_input)
+    return BulkReceipt(id=uuid4(), receipt_input=receipt_input, products_data=products_data, total=total, rest=rest)
+
+
+async def rollup_rows(user_id):
+    async with async_session_maker() as session:
+        result = await session.execute(select(SalesRollup).where(SalesRollup.user_id == user_id))
+        return sorted((row.granularity, row.bucket, row.receipts_count, round(row.total, 2), row.cash_count,
+                       round(row.cash_total, 2), row.card_count, round(row.card_total, 2))
+                      for row in result.scalars())
+
+
+@pytest.mark.asyncio
+async def test_incremental_rollups_match_a_rebuild(user_id):
+    yesterday = datetime(2024, 5, 1, 23, 30, tzinfo=timezone.utc)
+    async with async_session_maker() as session:
+        for price, payment_type in [(10, "cash"), (2.5, "card")]:
+            products_data, total, rest = price_receipt(receipt(price, payment_type).receipt_input)
+            await insert_receipt(session=session, user_id=user_id, total=total, rest=rest,
+                                 payment_type=payment_type, payment_amount=price * 2 + 1, products_data=products_data)
+        await copy_receipts(session=session, user_id=user_id, created_at=yesterday,
+                            receipts=[receipt(1, "cash"), receipt(3, "card"), receipt(4, "card")])
+        await session.commit()
+
+    incremental = await rollup_rows(user_id)
+    async with async_session_maker() as session:
+        await rebuild_rollups(session, user_id)
+        await session.commit()
+
+    assert await rollup_rows(user_id) == incremental
+    day = [row for row in incremental if row[0] == "day" and row[1] == datetime(2024, 5, 1, tzinfo=timezone.utc)]
+    assert day == [("day", datetime(2024, 5, 1, tzinfo=timezone.utc), 3, 16.0, 1, 2.0, 2, 14.0)]
+    assert len([row for row in incremental if row[0] == "hour"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_loaded_for_a_date_range(user_id):
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    async with async_session_maker() as session:
+        for day in range(5):
+            await copy_receipts(session=session, user_id=user_id, created_at=start + timedelta(days=day, hours=12),
+                                receipts=[receipt(day + 1, "cash")])
+        await session.commit()
+
+        rollups = await load_rollups(session, user_id=user_id, granularity="day",
+                                     start=start + timedelta(days=1, hours=18), end=start + timedelta(days=3, hours=1))
+
+    assert [(rollup.bucket.day, rollup.total) for rollup in rollups] == [(2, 4.0), (3, 6.0), (4, 8.0)]
@@ -0,0 +1,189 @@
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.core.json_stream import iter_json_items
+from app.core.receipts import (RENDER_RECEIPTS_JOB, BulkReceipt, copy_receipts, price_receipt,
+                               render_receipts_job)
+from app.core.storage import MemoryStorage
+from app.database.async_connect import async_session_maker
+from app.models.products import Receipt
+from app.schemas.products import ReceiptInput
+from app.settings.config import settings
+
+ITEMS = [
+    {"products": [{"name": "Молоко", "price": 10.5, "quantity": 2}], "payment_type": "cash", "payment_amount": 30},
+    {"products": [], "payment_type": "card", "payment_amount": 0},
+    {"products": [{"name": "a \\\"b\\\" ]", "price": 1e3, "quantity": 0.5}], "payment_type": "card", "payment_amount": 500},
+]
+
+BULK = "/swagger/api/v1/products/receipts/bulk"
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    yield user_id
+    # the render jobs the endpoint enqueues would be picked up by other tests' job queues
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "DELETE FROM jobs WHERE kind = :kind AND EXISTS (SELECT 1 FROM receipts r WHERE r.user_id = :id "
+            "AND r.id::text IN (SELECT json_array_elements_text(payload -> 'receipt_ids')))"
+        ), {"kind": RENDER_RECEIPTS_JOB, "id": user_id})
+        await session.commit()
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def decode(data: bytes, size: int, ndjson: bool):
+    return [item async for item in iter_json_items(chunked(data, size), ndjson=ndjson)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+async def test_json_array_items_are_decoded_across_chunk_borders(size):
+    data = json.dumps(ITEMS + [12345, "x"], ensure_ascii=False, indent=1).encode("utf-8")
+
+    assert await decode(data, size, ndjson=False) == [(item, None) for item in ITEMS + [12345, "x"]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 3, 1000])
+async def test_ndjson_reports_malformed_lines_in_place(size):
+    lines = [json.dumps(ITEMS[0], ensure_ascii=False), "{broken", "", json.dumps(ITEMS[1])]
+    data = "\n".join(lines).encode("utf-8")
+
+    items = await decode(data, size, ndjson=True)
+
+    assert [value for value, _ in items] == [ITEMS[0], None, ITEMS[1]]
+    assert items[1][1].startswith("Invalid JSON")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("data", [b"", b"{}", b"[1 2]", b"[{}, oops]", b"[{}", b"[] []", b"[\xff]"])
+async def test_malformed_json_array_is_rejected(data):
+    with pytest.raises(ValueError):
+        await decode(data, 2, ndjson=False)
+
+
+def bulk_receipts():
+    receipts = []
+    for item in ITEMS:
+        receipt_input = ReceiptInput.model_validate(item)
+        products_data, total, rest = price_receipt(receipt_input)
+        receipts.append(BulkReceipt(id=uuid4(), receipt_input=receipt_input, products_data=products_data,
+                                    total=total, rest=rest))
+    return receipts
+
+
+@pytest.mark.asyncio
+async def test_copied_receipts_are_rendered_by_one_batch_job(user_id):
+    receipts = bulk_receipts()
+    created_at = datetime.now(timezone.utc)
+
+    async with async_session_maker() as session:
+        await copy_receipts(session=session, user_id=user_id, receipts=receipts, created_at=created_at)
+        await session.commit()
+
+    storage = MemoryStorage()
+    await render_receipts_job({"receipt_ids": [str(receipt.id) for receipt in receipts]}, storage=storage)
+
+    async with async_session_maker() as session:
+        query = (select(Receipt).options(selectinload(Receipt.products))
+                 .where(Receipt.user_id == user_id).order_by(Receipt.total))
+        stored = (await session.execute(query)).scalars().all()
+
+    assert [(receipt.total, receipt.rest, len(receipt.products)) for receipt in stored] == [
+        (0.0, 0.0, 0), (21.0, 9.0, 1), (500.0, 0.0, 1)]
+    assert all(receipt.created_at == created_at for receipt in stored)
+    assert {receipt.recept_url for receipt in stored} == {f"memory://{receipt.id}" for receipt in receipts}
+    assert set(storage.objects) == {str(receipt.id) for receipt in receipts}
+
+
+@pytest.mark.asyncio
+async def test_copy_is_rolled_back_with_the_session(user_id):
+    # a fresh session that has run nothing yet, as with a cached principal
+    async with async_session_maker() as session:
+        await copy_receipts(session=session, user_id=user_id, receipts=bulk_receipts(),
+                            created_at=datetime.now(timezone.utc))
+        await session.rollback()
+
+    async with async_session_maker() as session:
+        counts = (await session.execute(text(
+            "SELECT (SELECT count(*) FROM receipts WHERE user_id = :id), "
+            "(SELECT count(*) FROM products p JOIN receipts r ON r.id = p.receipt_id WHERE r.user_id = :id), "
+            "(SELECT count(*) FROM sales_rollups WHERE user_id = :id)"
+        ), {"id": user_id})).one()
+    assert tuple(counts) == (0, 0, 0)
+
+
+async def stored_receipts(user_id):
+    async with async_session_maker() as session:
+        return dict((await session.execute(text(
+            "SELECT id::text, total FROM receipts WHERE user_id = :id"), {"id": user_id})).all())
+
+
+BULK_ITEMS = [
+    ITEMS[0],
+    {"products": [{"name": "Хліб", "price": 30, "quantity": 1}], "payment_type": "cash", "payment_amount": 20},
+    {"payment_type": "cash"},
+    ITEMS[2],
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+async def test_bulk_endpoint_reports_every_item_in_request_order(api, user_id, content_type):
+    if content_type == "application/json":
+        body = json.dumps(BULK_ITEMS, ensure_ascii=False)
+    else:
+        body = "\n".join(json.dumps(item, ensure_ascii=False) for item in BULK_ITEMS)
+    response = await api.post(BULK, content=body.encode("utf-8"), headers={"Content-Type": content_type})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["rejected"]) == (2, 2)
+    assert [(item["index"], item["status"]) for item in result["items"]] == [
+        (0, "created"), (1, "rejected"), (2, "invalid"), (3, "created")]
+    created, rejected, invalid, _ = result["items"]
+    assert (created["total"], created["rest"]) == (21.0, 9.0) and "created_at" in created
+    assert rejected["detail"] == "Insufficient funds"
+    assert {error["loc"][0] for error in invalid["detail"]} == {"products", "payment_amount"}
+    assert await stored_receipts(user_id) == {item["id"]: item["total"] for item in result["items"]
+                                             if item["status"] == "created"}
+
+
+@pytest.mark.asyncio
+async def test_bulk_endpoint_picks_the_format_by_content_type(api, user_id):
+    lines = [json.dumps(ITEMS[0]), "{broken", json.dumps(ITEMS[1])]
+    response = await api.post(BULK, content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    assert [item["status"] for item in response.json()["items"]] == ["created", "invalid", "created"]
+    assert response.json()["items"][1]["detail"].startswith("Invalid JSON")
+
+    # the same lines are not a JSON array
+    response = await api.post(BULK, content="\n".join(lines), headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    # and an array sent as ndjson is a single line holding a list, not a receipt
+    response = await api.post(BULK, content=json.dumps(ITEMS), headers={"Content-Type": "application/x-ndjson"})
+    assert [item["status"] for item in response.json()["items"]] == ["invalid"]
+    assert len(await stored_receipts(user_id)) == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_endpoint_rejects_malformed_and_oversized_requests(api, user_id, monkeypatch):
+    response = await api.post(BULK, content=b"[{}, oops]", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+
+    monkeypatch.setattr(settings, "BULK_RECEIPTS_MAX_ITEMS", 2)
+    response = await api.post(BULK, content=json.dumps(ITEMS), headers={"Content-Type": "application/json"})
+    assert response.status_code == 413
+    assert response.json() == {"detail": "At most 2 receipts per request"}
+    assert await stored_receipts(user_id) == {}
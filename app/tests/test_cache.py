@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.future import select
+
+from app.api.deps import get_current_user, verify_access_token
+from app.core.cache import LRUCache
+from app.core.principals import invalidate_principal, principal_cache
+from app.core.profiler import finish_profile, start_profile
+from app.core.security import create_access_token
+from app.database.async_connect import async_session_maker
+from app.models.user import User
+from app.settings.config import settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("user", "principal")
+
+    clock.now = 59.9
+    assert cache.get("user") == "principal"
+    clock.now = 60.0
+    assert cache.get("user") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_and_stats():
+    cache = LRUCache(maxsize=10)
+    cache.set("user", "principal")
+    cache.get("user")
+    cache.invalidate("user")
+    cache.get("user")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["invalidations"] == 1
+    assert stats["size"] == 0
+
+
+def test_memory_bound_evicts_least_recently_used():
+    cache = LRUCache(maxsize=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.get("a")
+
+    cache.set("c", "xxxx")
+
+    assert "b" not in cache
+    assert cache.bytes == 8
+    cache.set("huge", "x" * 11)
+    assert "huge" not in cache and cache.bytes == 8
+
+    cache.set("a", "x")
+    assert cache.bytes == 5
+    cache.invalidate("c")
+    assert cache.bytes == 1
+
+
+def test_token_with_malformed_user_id_is_rejected():
+    token = jwt.encode({"user_id": "not-a-uuid"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    credentials_exception = HTTPException(status_code=401)
+
+    with pytest.raises(HTTPException) as error:
+        verify_access_token(token, credentials_exception)
+    assert error.value is credentials_exception
+
+
+async def current_user_statements(token):
+    """The user `get_current_user` returns for `token` and the number of statements it ran."""
+    profile, profile_token = start_profile()
+    try:
+        async with async_session_maker() as session:
+            user = await get_current_user(session, token)
+    finally:
+        finish_profile(profile_token)
+    return user, profile.count
+
+
+@pytest.mark.asyncio
+async def test_cached_user_needs_no_query(user_id):
+    invalidate_principal(user_id)
+    token = create_access_token(user_id, timedelta(minutes=5))
+
+    user, statements = await current_user_statements(token)
+    assert user.id == user_id and statements == 1
+
+    user, statements = await current_user_statements(token)
+    assert user.id == user_id and statements == 0
+
+
+@pytest.mark.asyncio
+async def test_user_update_and_delete_invalidate_the_cache(user_id):
+    token = create_access_token(user_id, timedelta(minutes=5))
+    await current_user_statements(token)
+    assert principal_cache.get(user_id) is not None
+
+    async with async_session_maker() as session:
+        user = (await session.execute(select(User).where(User.id == user_id))).scalar_one()
+        user.is_active = False
+        await session.commit()
+    assert principal_cache.get(user_id) is None
+    with pytest.raises(HTTPException) as error:
+        await current_user_statements(token)
+    assert error.value.status_code == 400
+
+    async with async_session_maker() as session:
+        await session.delete((await session.execute(select(User).where(User.id == user_id))).scalar_one())
+        await session.commit()
+    assert principal_cache.get(user_id) is None
+    with pytest.raises(HTTPException) as error:
+        await current_user_statements(token)
+    assert error.value.status_code == 401
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text, tuple_
+
+from app.core import export
+from app.core.pagination import decode_cursor
+from app.core.receipts import receipts_query
+from app.database.async_connect import async_session_maker
+from app.models.products import Receipt
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id, monkeypatch):
+    # tiny fetches, so that receipts are split across server-side cursor batches
+    monkeypatch.setattr(export, "EXPORT_FETCH_ROWS", 7)
+    async with async_session_maker() as session:
+        # receipt n has n % 4 products
+        await session.execute(text(
+            "INSERT INTO receipts (user_id, created_at, total, rest, payment_type, payment_amount) "
+            "SELECT :id, now() - make_interval(secs => n), n, 0, 'cash', n FROM generate_series(1, 50) AS n"
+        ), {"id": user_id})
+        await session.execute(text(
+            "INSERT INTO products (receipt_id, name, price, quantity, total) "
+            "SELECT r.id, 'item, ' || i, 1, 1, 1 FROM receipts r, generate_series(1, 3) AS i "
+            "WHERE r.user_id = :id AND i <= r.total::int % 4"
+        ), {"id": user_id})
+        await session.commit()
+    return user_id
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks]).decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_ndjson_export_groups_products_and_resumes_from_cursor(user_id):
+    query = receipts_query(user_id=user_id)
+    records = [json.loads(line) for line in (await collect(export.export_ndjson(export.export_query(query)))).splitlines()]
+
+    assert [record["total"] for record in records] == [float(n) for n in range(1, 51)]
+    assert [len(record["products"]) for record in records] == [n % 4 for n in range(1, 51)]
+
+    created_at, receipt_id = decode_cursor(records[19]["cursor"])
+    resumed = query.where(tuple_(Receipt.created_at, Receipt.id) < tuple_(created_at, receipt_id))
+    rest = [json.loads(line) for line in (await collect(export.export_ndjson(export.export_query(resumed)))).splitlines()]
+
+    assert rest == records[20:]
+
+
+@pytest.mark.asyncio
+async def test_csv_export_has_a_row_per_product(user_id):
+    query = export.export_query(receipts_query(user_id=user_id, max_total=4))
+    rows = list(csv.DictReader(io.StringIO(await collect(export.export_csv(query)))))
+
+    assert sorted((row["total"], row["product_name"]) for row in rows) == [
+        ("1.0", "item, 1"),
+        ("2.0", "item, 1"), ("2.0", "item, 2"),
+        ("3.0", "item, 1"), ("3.0", "item, 2"), ("3.0", "item, 3"),
+        ("4.0", ""),
+    ]
@@ -0,0 +1,113 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from app.core.group_commit import ReceiptBatcher
+from app.core.metrics import finish_request, start_request
+from app.core.receipts import RENDER_RECEIPTS_JOB, BulkReceipt, price_receipt
+from app.database.async_connect import async_session_maker
+from app.schemas.products import ReceiptInput
+
+
+def receipt(amount=10):
+    receipt_input = ReceiptInput.model_validate(
+        {"products": [{"name": "Молоко", "price": 2.5, "quantity": 2}], "payment_type": "cash",
+         "payment_amount": amount})
+    products_data, total, rest = price_receipt(receipt_input)
+    return BulkReceipt(id=uuid4(), receipt_input=receipt_input, products_data=products_data, total=total, rest=rest)
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    yield user_id
+    # the render jobs would be picked up by other tests' job queues
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "DELETE FROM jobs WHERE kind = :kind AND EXISTS (SELECT 1 FROM receipts r WHERE r.user_id = :id "
+            "AND r.id::text IN (SELECT json_array_elements_text(payload -> 'receipt_ids')))"
+        ), {"kind": RENDER_RECEIPTS_JOB, "id": user_id})
+        await session.commit()
+
+
+async def stored(user_id):
+    async with async_session_maker() as session:
+        receipts = dict((await session.execute(text(
+            "SELECT id, created_at FROM receipts WHERE user_id = :id"), {"id": user_id})).all())
+        products = (await session.execute(text(
+            "SELECT count(*) FROM products p JOIN receipts r ON r.id = p.receipt_id WHERE r.user_id = :id"
+        ), {"id": user_id})).scalar()
+        rendered = (await session.execute(text(
+            "SELECT count(*) FROM jobs, json_array_elements_text(payload -> 'receipt_ids') AS receipt_id "
+            "WHERE kind = :kind AND receipt_id::uuid IN (SELECT id FROM receipts WHERE user_id = :id)"
+        ), {"kind": RENDER_RECEIPTS_JOB, "id": user_id})).scalar()
+    return receipts, products, rendered
+
+
+@pytest.mark.asyncio
+async def test_concurrent_receipts_share_commits(user_id):
+    batcher = ReceiptBatcher(window=0.05, max_items=4)
+    receipts = [receipt() for _ in range(10)]
+    try:
+        results = await asyncio.gather(*[batcher.submit(user_id=user_id, receipt=item) for item in receipts])
+    finally:
+        await batcher.stop()
+
+    assert [receipt_id for receipt_id, _ in results] == [item.id for item in receipts]
+    assert batcher.stats()["batches"] == 3 and batcher.stats()["batch_size_max"] == 4
+    assert await stored(user_id) == (dict(results), 10, 10)
+
+
+@pytest.mark.asyncio
+async def test_lone_receipt_is_written_after_the_window(user_id):
+    batcher = ReceiptBatcher(window=0.02, max_items=100)
+    try:
+        receipt_id, created_at = await asyncio.wait_for(batcher.submit(user_id=user_id, receipt=receipt()), 1)
+    finally:
+        await batcher.stop()
+    assert (await stored(user_id))[0] == {receipt_id: created_at}
+
+
+@pytest.mark.asyncio
+async def test_failing_receipt_does_not_fail_its_batch(user_id):
+    batcher = ReceiptBatcher(window=0.05, max_items=100)
+    good = [receipt(), receipt()]
+    try:
+        results = await asyncio.gather(
+            batcher.submit(user_id=user_id, receipt=good[0]),
+            # no such user - violates the foreign key
+            batcher.submit(user_id=uuid4(), receipt=receipt()),
+            batcher.submit(user_id=user_id, receipt=good[1]),
+            return_exceptions=True,
+        )
+    finally:
+        await batcher.stop()
+
+    assert isinstance(results[1], Exception)
+    assert (await stored(user_id))[0] == dict([results[0], results[2]])
+    assert batcher.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_queued_receipts(user_id):
+    batcher = ReceiptBatcher(window=60, max_items=100)
+    pending = asyncio.create_task(batcher.submit(user_id=user_id, receipt=receipt()))
+    await asyncio.sleep(0.01)
+    await batcher.stop()
+    receipt_id, _ = await pending
+    assert receipt_id in (await stored(user_id))[0]
+
+
+@pytest.mark.asyncio
+async def test_flusher_does_not_run_in_the_context_of_the_first_request(user_id):
+    batcher = ReceiptBatcher(window=0.01, max_items=10)
+    phases, token = start_request()
+    try:
+        await batcher.submit(user_id=user_id, receipt=receipt())
+    finally:
+        finish_request(token)
+    await batcher.stop()
+    # the batch was written by the flusher this request started, but not as part of the request
+    assert phases["db"] == 0
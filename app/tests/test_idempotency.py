@@ -0,0 +1,130 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from app.core import idempotency
+from app.core.idempotency import IdempotencyKeyReused, StoredResponse, run_idempotent
+from app.database.async_connect import async_session_maker
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    idempotency.idempotency_cache.clear()
+    return user_id
+
+
+class Handler:
+    def __init__(self, body="{}", delay=0.0, error=None):
+        self.calls = 0
+        self.body = body
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return StoredResponse("hash", 200, self.body)
+
+
+async def call(user_id, key, handler, hashed="hash"):
+    async with async_session_maker() as session:
+        return await run_idempotent(session, user_id=user_id, key=key, hashed=hashed, handler=handler)
+
+
+@pytest.mark.asyncio
+async def test_repeated_key_replays_from_cache_then_database(user_id):
+    handler = Handler('{"id":1}')
+    assert await call(user_id, "k", handler) == (StoredResponse("hash", 200, '{"id":1}'), False)
+    assert await call(user_id, "k", handler) == (StoredResponse("hash", 200, '{"id":1}'), True)
+
+    idempotency.idempotency_cache.clear()
+    assert await call(user_id, "k", handler) == (StoredResponse("hash", 200, '{"id":1}'), True)
+    assert handler.calls == 1
+
+    with pytest.raises(IdempotencyKeyReused):
+        await call(user_id, "k", handler, hashed="other")
+    # a reused key is rejected by the database path too
+    idempotency.idempotency_cache.clear()
+    with pytest.raises(IdempotencyKeyReused):
+        await call(user_id, "k", handler, hashed="other")
+    assert handler.calls == 1
+    # keys are per user
+    other_user = Handler()
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :name, :name, 'x')"
+        ), {"id": (other_id := uuid4()), "name": f"{uuid4()}@example.com"})
+        await session.commit()
+    assert (await call(other_id, "k", other_user))[1] is False
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_run_once(user_id):
+    handler = Handler('{"id":2}', delay=0.1)
+    results = await asyncio.gather(*[call(user_id, "concurrent", handler) for _ in range(5)])
+    assert handler.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+    assert {stored.body for stored, _ in results} == {'{"id":2}'}
+
+
+@pytest.mark.asyncio
+async def test_duplicate_from_another_process_waits_for_the_commit(user_id):
+    claimed = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def slow_handler():
+        claimed.set()
+        await finish.wait()
+        return StoredResponse("hash", 200, '{"id":3}')
+
+    first = asyncio.create_task(call(user_id, "shared", slow_handler))
+    await claimed.wait()
+    # another process has neither the cache entry nor the in-flight future
+    async with async_session_maker() as session:
+        params = {"user_id": user_id, "key": "shared", "request_hash": "hash", "ttl": 60}
+        second = asyncio.create_task(session.execute(idempotency.CLAIM_KEY_SQL, params))
+        await asyncio.sleep(0.2)
+        assert not second.done()
+        finish.set()
+        assert (await second).first() is None
+    assert await first == (StoredResponse("hash", 200, '{"id":3}'), False)
+
+
+@pytest.mark.asyncio
+async def test_failed_request_stores_nothing(user_id):
+    with pytest.raises(ValueError):
+        await call(user_id, "failing", Handler(error=ValueError("boom")))
+    handler = Handler('{"id":4}')
+    assert await call(user_id, "failing", handler) == (StoredResponse("hash", 200, '{"id":4}'), False)
+
+
+@pytest.mark.asyncio
+async def test_expired_key_is_claimed_again(user_id):
+    await call(user_id, "old", Handler('{"id":5}'))
+    idempotency.idempotency_cache.clear()
+    async with async_session_maker() as session:
+        await session.execute(text("UPDATE idempotency_keys SET expires_at = now() - interval '1 second' "
+                                   "WHERE user_id = :id"), {"id": user_id})
+        await session.commit()
+
+    handler = Handler('{"id":6}')
+    assert await call(user_id, "old", handler) == (StoredResponse("hash", 200, '{"id":6}'), False)
+
+
+@pytest.mark.asyncio
+async def test_purge_deletes_only_expired_keys(user_id):
+    await call(user_id, "expired", Handler())
+    await call(user_id, "live", Handler())
+    async with async_session_maker() as session:
+        await session.execute(text("UPDATE idempotency_keys SET expires_at = now() - interval '1 second' "
+                                   "WHERE user_id = :id AND key = 'expired'"), {"id": user_id})
+        assert await idempotency.purge_expired_keys(session) >= 1
+        await session.commit()
+        keys = (await session.execute(text("SELECT key FROM idempotency_keys WHERE user_id = :id"),
+                                      {"id": user_id})).scalars().all()
+    assert keys == ["live"]
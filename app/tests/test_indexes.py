@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.future import select
+
+from app.core.pagination import explain
+from app.core.receipts import receipts_query
+from app.database.async_connect import async_session_maker, get_engine
+from app.database.migrations import Migration, run_migrations
+from app.models.products import Products, Receipt
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO receipts (user_id, created_at, total, rest, payment_type, payment_amount) "
+            "SELECT :id, now() - make_interval(mins => n), n % 500, 0, "
+            "CASE WHEN n % 2 = 0 THEN 'cash' ELSE 'card' END, n % 500 "
+            "FROM generate_series(1, 2000) AS n"
+        ), {"id": user_id})
+        await session.commit()
+    async with get_engine().connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE receipts"))
+    return user_id
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain_without_seqscan(statement):
+    async with async_session_maker() as session:
+        # forbid sequential scans so the plan shows whether an index can serve the query at all
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        return list(plan_nodes(await explain(session, statement)))
+
+
+def used_indexes(nodes, table):
+    scans = [node for node in nodes if node.get("Relation Name") == table or node.get("Index Name")]
+    assert not [node for node in scans if node["Node Type"] == "Seq Scan"], scans
+    return {node["Index Name"] for node in scans if "Index Name" in node}
+
+
+FILTERS = [
+    {},
+    {"min_total": 100, "max_total": 200},
+    {"payment_type": "cash"},
+    {"start_date": datetime.now(timezone.utc) - timedelta(hours=3), "end_date": datetime.now(timezone.utc)},
+    {"payment_type": "card", "start_date": datetime.now(timezone.utc) - timedelta(hours=3)},
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("filters", FILTERS)
+async def test_receipt_list_uses_user_index(user_id, filters):
+    query = (receipts_query(user_id=user_id, **filters)
+             .order_by(Receipt.created_at.desc(), Receipt.id.desc())
+             .limit(10))
+
+    indexes = used_indexes(await explain_without_seqscan(query), "receipts")
+
+    assert indexes and all(name.startswith("ix_receipts_user_id_") for name in indexes), indexes
+
+
+@pytest.mark.asyncio
+async def test_receipt_products_are_loaded_by_index(user_id):
+    query = select(Products).where(Products.receipt_id.in_([uuid4(), uuid4()]))
+
+    assert used_indexes(await explain_without_seqscan(query), "products") == {"ix_products_receipt_id"}
+
+
+@pytest.mark.asyncio
+async def test_invalid_index_of_interrupted_build_is_rebuilt(caplog):
+    migration = Migration(900_001, "test: unique index", transactional=False, statements=[
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_migration_test_x ON migration_test (x)",
+    ])
+    engine = get_engine()
+    try:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("DROP TABLE IF EXISTS migration_test"))
+            await conn.execute(text("CREATE TABLE migration_test (x int)"))
+            await conn.execute(text("INSERT INTO migration_test VALUES (1), (1)"))
+            # the duplicate fails the build half-way and leaves the index INVALID
+            with pytest.raises(Exception):
+                await conn.execute(text(migration.statements[0]))
+            await conn.execute(text("DELETE FROM migration_test WHERE ctid = (SELECT max(ctid) FROM migration_test)"))
+
+        assert await run_migrations(engine, [migration]) == [900_001]
+        assert "Dropping invalid index ix_migration_test_x" in caplog.text
+
+        async with engine.connect() as conn:
+            valid = (await conn.execute(text(
+                "SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_migration_test_x'::regclass"
+            ))).scalar()
+        assert valid is True
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS migration_test"))
+            await conn.execute(text("DELETE FROM schema_migrations WHERE version = 900001"))
+        await engine.dispose()
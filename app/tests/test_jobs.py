@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from app.core.jobs import JobQueue, enqueue_job
+from app.core.metrics import job_duration, job_phase_duration
+from app.core.receipts import render_receipt_job
+from app.core.storage import MemoryStorage
+from app.database.async_connect import async_session_maker, get_engine
+from app.models.jobs import Job
+from app.models.products import Receipt, Products
+
+
+@pytest_asyncio.fixture
+async def queue():
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Job.metadata.create_all)
+    queue = JobQueue(concurrency=2, max_attempts=2, backoff_base=0.05, backoff_max=0.05,
+                     poll_interval=0.05, lease_seconds=30)
+    yield queue
+    await queue.stop()
+    await get_engine().dispose()
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.05)
+
+
+async def job_row(job_id):
+    async with async_session_maker() as session:
+        return (await session.execute(select(Job).where(Job.id == job_id))).scalar_one_or_none()
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_is_removed(queue):
+    seen = []
+
+    async def handler(payload):
+        seen.append(payload["value"])
+
+    kind = f"test-{uuid4()}"
+    queue.register(kind, handler)
+    await queue.start()
+
+    async with async_session_maker() as session:
+        job_id = await enqueue_job(session=session, kind=kind, payload={"value": 42})
+        await session.commit()
+    queue.notify()
+
+    async def done():
+        return await job_row(job_id) is None
+
+    await wait_for(done)
+    assert seen == [42]
+    stats = await queue.stats()
+    assert stats["completed"] == 1
+    assert stats["latency_seconds"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_is_retried_then_marked_failed(queue):
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        raise RuntimeError("storage is down")
+
+    kind = f"test-{uuid4()}"
+    queue.register(kind, handler)
+    await queue.start()
+
+    async with async_session_maker() as session:
+        job_id = await enqueue_job(session=session, kind=kind, payload={})
+        await session.commit()
+    queue.notify()
+
+    async def failed():
+        job = await job_row(job_id)
+        return job is not None and job.status == "failed"
+
+    await wait_for(failed)
+    job = await job_row(job_id)
+    assert job.attempts == 2
+    assert "storage is down" in job.last_error
+    assert len(calls) == 2
+    assert queue.retried == 1 and queue.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_render_receipt_job_uploads_to_fake_storage(queue):
+    storage = MemoryStorage()
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Receipt.metadata.create_all)
+    async with async_session_maker() as session:
+        receipt_id = (await session.execute(
+            insert(Receipt).values(total=21.0, rest=9.0, payment_type="cash", payment_amount=30.0)
+            .returning(Receipt.id)
+        )).scalar_one()
+        await session.execute(insert(Products).values(
+            receipt_id=receipt_id, name="Product 1", price=10.5, quantity=2, total=21.0
+        ))
+        await session.commit()
+
+    await render_receipt_job({"receipt_id": str(receipt_id)}, storage=storage)
+
+    async with async_session_maker() as session:
+        receipt = (await session.execute(select(Receipt).where(Receipt.id == receipt_id))).scalar_one()
+    assert receipt.recept_url == f"memory://{receipt_id}"
+    assert "Product 1" in (await storage.get(str(receipt_id))).decode("utf-8")
+
+    # a second run must not upload again
+    storage.objects.clear()
+    await render_receipt_job({"receipt_id": str(receipt_id)}, storage=storage)
+    assert storage.objects == {}
+
+
+@pytest.mark.asyncio
+async def test_job_render_and_storage_time_is_recorded_by_kind(queue):
+    storage = MemoryStorage()
+    kind = f"test-{uuid4()}"
+    queue.register(kind, lambda payload: render_receipt_job(payload, storage=storage))
+    await queue.start()
+
+    async with async_session_maker() as session:
+        receipt_id = (await session.execute(
+            insert(Receipt).values(total=21.0, rest=9.0, payment_type="cash", payment_amount=30.0)
+            .returning(Receipt.id)
+        )).scalar_one()
+        await session.execute(insert(Products).values(
+            receipt_id=receipt_id, name="Product 1", price=10.5, quantity=2, total=21.0
+        ))
+        job_id = await enqueue_job(session=session, kind=kind, payload={"receipt_id": str(receipt_id)})
+        await session.commit()
+    queue.notify()
+
+    async def done():
+        return await job_row(job_id) is None
+
+    await wait_for(done)
+    assert job_duration.count((kind,)) == 1
+    for phase in ("db", "render", "storage"):
+        assert job_phase_duration.count((kind, phase)) == 1
+        assert job_phase_duration.sum((kind, phase)) > 0
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_database_errors_when_finishing_jobs():
+    def session_maker():
+        raise ConnectionError("db down")
+
+    queue = JobQueue(concurrency=1, max_attempts=2, backoff_base=0.05, backoff_max=0.05,
+                     poll_interval=0.05, lease_seconds=30, session_maker=session_maker)
+    seen = []
+
+    async def handler(payload):
+        seen.append(payload["value"])
+        if payload["value"] == 1:
+            raise RuntimeError("handler failed")
+
+    queue.register("test", handler)
+    await queue.start()
+    try:
+        # neither the failure nor the completion of a job can be recorded
+        for value in (1, 2, 3):
+            await queue._queue.put({"id": uuid4(), "kind": "test", "payload": {"value": value}, "attempts": 1,
+                                    "created_at": datetime.now(timezone.utc)})
+        await asyncio.wait_for(queue._queue.join(), timeout=5)
+        assert seen == [1, 2, 3]
+        assert not any(task.done() for task in queue._tasks)
+    finally:
+        await queue.stop()
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.api import metrics as api_metrics
+from app.api.metrics import MetricsMiddleware, metrics_endpoint
+from app.core.metrics import Counter, Histogram, request_duration, request_phase_duration, requests_total, timed
+from app.database.async_connect import async_session_maker, get_engine
+
+
+def test_histogram_and_counter_text_format():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 3)
+    counter = Counter("hits_total", "Hits.", ("path",))
+    counter.inc(('say "hi"\\',))
+
+    assert histogram.collect() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 3.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+    assert counter.collect()[2] == 'hits_total{path="say \\"hi\\"\\\\"} 1'
+
+
+def app_with_metrics():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with async_session_maker() as session:
+            await session.execute(text("SELECT pg_sleep(0.02)"))
+        with timed("render"):
+            await asyncio.sleep(0.01)
+        return {"id": item_id}
+
+    app.add_route("/metrics", metrics_endpoint)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=MetricsMiddleware(app)), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_requests_are_recorded_by_route_with_their_phases():
+    route = "/items/{item_id}"
+    before = request_duration.count(("GET", route))
+    db_before = request_phase_duration.sum((route, "db"))
+    render_before = request_phase_duration.sum((route, "render"))
+    try:
+        async with app_with_metrics() as http:
+            assert (await http.get("/items/1")).status_code == 200
+            assert (await http.get("/items/2")).status_code == 200
+            assert (await http.get("/items/x")).status_code == 422
+            assert (await http.get("/nowhere")).status_code == 404
+            body = (await http.get("/metrics")).text
+    finally:
+        await get_engine().dispose()
+
+    assert request_duration.count(("GET", route)) == before + 3
+    assert requests_total.value(("GET", route, "200")) >= 2
+    assert requests_total.value(("GET", "unmatched", "404")) >= 1
+    assert request_phase_duration.sum((route, "db")) - db_before >= 0.04
+    assert request_phase_duration.sum((route, "render")) - render_before >= 0.02
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"}' in body
+    assert 'http_request_phase_seconds_bucket{route="/items/{item_id}",phase="db",le="+Inf"}' in body
+    assert "http_requests_in_flight 1" in body
+
+
+@pytest.mark.asyncio
+async def test_metrics_token(monkeypatch):
+    monkeypatch.setattr(api_metrics.settings, "METRICS_TOKEN", "secret")
+    async with app_with_metrics() as http:
+        assert (await http.get("/metrics")).status_code == 401
+        response = await http.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from app.core.pagination import encode_cursor, decode_cursor
+from app.database.async_connect import async_session_maker
+
+RECEIPTS = "/swagger/api/v1/products/receipts/"
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 1, 31, 23, 59, 59, 123456, tzinfo=timezone.utc)
+    receipt_id = uuid4()
+
+    cursor = encode_cursor(created_at, receipt_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, receipt_id)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "", encode_cursor(datetime.now(timezone.utc), uuid4())[:-4]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    async with async_session_maker() as session:
+        # pairs of receipts share created_at, so pages have to break ties by id
+        await session.execute(text(
+            "INSERT INTO receipts (user_id, created_at, total, rest, payment_type, payment_amount) "
+            "SELECT :id, timestamptz '2025-03-01 12:00+00' - make_interval(mins => n / 2), n, 0, "
+            "CASE WHEN n % 3 = 0 THEN 'cash' ELSE 'card' END, n FROM generate_series(1, 25) AS n"
+        ), {"id": user_id})
+        await session.commit()
+    return user_id
+
+
+async def all_pages(api, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        response = await api.get(RECEIPTS, params={**params, "pagination": "cursor", "count": "none",
+                                                   **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.json()
+        ids += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+async def listed(api, **params):
+    response = await api.get(RECEIPTS, params={**params, "limit": 100})
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_every_receipt_once(api):
+    everything = await listed(api)
+    ids, pages = await all_pages(api, limit=7)
+
+    assert everything["total_count"] == 25
+    assert ids == [item["id"] for item in everything["items"]]
+    assert len(set(ids)) == 25 and pages == 4
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_keep_the_filters(api):
+    filters = {"payment_type": "card", "min_total": 5, "max_total": 20}
+    expected = [item["id"] for item in (await listed(api, **filters))["items"]]
+    ids, _ = await all_pages(api, limit=3, **filters)
+
+    assert len(expected) == 11
+    assert ids == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor(datetime.now(timezone.utc), uuid4())[:-4]])
+async def test_malformed_cursor_is_a_bad_request(api, cursor):
+    response = await api.get(RECEIPTS, params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_count_modes(api):
+    exact = (await api.get(RECEIPTS, params={"count": "exact", "limit": 2})).json()
+    estimated = (await api.get(RECEIPTS, params={"count": "estimated", "limit": 2})).json()
+    none = (await api.get(RECEIPTS, params={"count": "none", "limit": 2})).json()
+
+    assert exact["total_count"] == 25
+    assert isinstance(estimated["total_count"], int) and estimated["total_count"] >= 0
+    assert none["total_count"] is None
+    assert exact["items"] == estimated["items"] == none["items"]
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database.async_connect import ASYNC_SQLALCHEMY_DATABASE_URL
+from app.database.pool import PoolStats, engine_options, pool_status, track_pool_events
+from app.settings.config import settings
+
+
+def make_engine(monkeypatch, **overrides):
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    stats = PoolStats()
+    engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **engine_options(stats))
+    track_pool_events(engine, stats)
+    return engine, stats
+
+
+@pytest.mark.asyncio
+async def test_starved_pool_counts_waits_and_timeouts(monkeypatch):
+    engine, stats = make_engine(monkeypatch, DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT_SECONDS=0.2)
+    try:
+        async with engine.connect() as held:
+            await held.execute(text("SELECT 1"))
+            assert pool_status(engine, stats)["checked_out"] == 1
+
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        status = pool_status(engine, stats)
+        assert status["timeouts"] == 1 and status["checkouts"] == 2 and status["connects"] == 1
+        assert status["checked_out"] == 0 and status["wait_max_ms"] >= 200
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_is_applied(monkeypatch):
+    engine, _ = make_engine(monkeypatch, DB_STATEMENT_TIMEOUT_MS=50)
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SHOW statement_timeout"))).scalar() == "50ms"
+            with pytest.raises(exc.DBAPIError):
+                await conn.execute(text("SELECT pg_sleep(1)"))
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pgbouncer_mode_does_not_reuse_prepared_statements(monkeypatch):
+    engine, stats = make_engine(monkeypatch, DB_POOL_CLASS="null", DB_PGBOUNCER=True)
+    connect_args = engine_options(stats)["connect_args"]
+    assert connect_args["statement_cache_size"] == connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["prepared_statement_name_func"]() != connect_args["prepared_statement_name_func"]()
+    assert "server_settings" not in connect_args
+    try:
+        for value in range(3):
+            async with engine.connect() as conn:
+                assert (await conn.execute(text("SELECT CAST(:value AS integer)"), {"value": value})).scalar() == value
+
+        assert pool_status(engine, stats)["connects"] == 3
+    finally:
+        await engine.dispose()
@@ -0,0 +1,126 @@
+import logging
+from datetime import timedelta
+from uuid import uuid4
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import text
+
+from app.api.profiler import QueryProfilerMiddleware
+from app.core import profiler
+from app.core.metrics import request_queries
+from app.core.principals import invalidate_principal
+from app.core.profiler import QueryProfile, normalize_sql
+from app.core.security import create_access_token
+from app.database.async_connect import async_session_maker, get_engine
+
+
+def test_normalize_sql_redacts_literals_and_parameters():
+    statement = ("SELECT t1.id FROM receipts AS t1 WHERE t1.user_id = $1::UUID AND t1.total > 10.5 "
+                 "AND t1.payment_type = 'cash' AND t1.id IN ($2::UUID, $3::UUID,\n $4::UUID) LIMIT $5::INTEGER")
+    assert normalize_sql(statement) == ("SELECT t1.id FROM receipts AS t1 WHERE t1.user_id = ?::UUID AND t1.total > ? "
+                                        "AND t1.payment_type = ? AND t1.id IN (...) LIMIT ?::INTEGER")
+    assert normalize_sql("SELECT pg_sleep(:seconds), 'it''s'::text") == "SELECT pg_sleep(?), ?::text"
+
+
+def test_query_profile_groups_statements():
+    profile = QueryProfile()
+    for _ in range(3):
+        profile.record("SELECT * FROM users WHERE id = $1::UUID", 0.002)
+    profile.record("SELECT 1", 0.01)
+
+    assert profile.count == 4
+    assert profile.seconds == pytest.approx(0.016)
+    assert profile.repeated(3) == [("SELECT * FROM users WHERE id = ?::UUID", 3, pytest.approx(0.006))]
+    assert profile.repeated(4) == []
+    assert [sql for sql, _, _ in profile.summary()] == ["SELECT ?", "SELECT * FROM users WHERE id = ?::UUID"]
+
+
+@pytest_asyncio.fixture
+async def users():
+    """An active superuser and a regular user, as Authorization headers."""
+    ids = {}
+    async with async_session_maker() as session:
+        for name, superuser in (("admin", True), ("user", False)):
+            suffix = uuid4().hex[:12]
+            ids[name] = await session.scalar(
+                text("INSERT INTO users (username, email, hashed_password, is_superuser) "
+                     "VALUES (:username, :email, 'x', :superuser) RETURNING id"),
+                {"username": f"profiler-{suffix}", "email": f"profiler-{suffix}@example.com", "superuser": superuser})
+        await session.commit()
+    yield {name: {"Authorization": f"Bearer {create_access_token(user_id, timedelta(minutes=5))}"}
+           for name, user_id in ids.items()}
+    async with async_session_maker() as session:
+        await session.execute(text("DELETE FROM users WHERE id = ANY(:ids)"), {"ids": list(ids.values())})
+        await session.commit()
+    for user_id in ids.values():
+        invalidate_principal(user_id)
+    await get_engine().dispose()
+
+
+def app_with_profiler():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with async_session_maker() as session:
+            for n in range(item_id):
+                await session.execute(text("SELECT id FROM users WHERE username = :name"), {"name": str(n)})
+        return {"id": item_id}
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=QueryProfilerMiddleware(app)), base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_debug_headers_only_for_superusers(users):
+    debug = {"X-Debug-Queries": "1"}
+    route = "/items/{item_id}"
+    before = request_queries.count((route,))
+    async with app_with_profiler() as http:
+        admin = await http.get("/items/3", headers={**users["admin"], **debug})
+        user = await http.get("/items/3", headers={**users["user"], **debug})
+        anonymous = await http.get("/items/3", headers=debug)
+
+    assert admin.headers["X-Query-Count"] == "3"
+    assert admin.headers["X-Query-Repeated"] == "1"
+    assert admin.headers["Server-Timing"].startswith("db;dur=")
+    for response in (user, anonymous):
+        assert response.status_code == 200
+        assert "X-Query-Count" not in response.headers
+    assert request_queries.count((route,)) == before + 3
+
+
+@pytest.mark.asyncio
+async def test_repeated_statements_are_logged(monkeypatch, caplog):
+    monkeypatch.setattr(profiler.settings, "QUERY_REPEAT_THRESHOLD", 4)
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.profiler"):
+            async with app_with_profiler() as http:
+                await http.get("/items/3")
+                await http.get("/items/4")
+    finally:
+        await get_engine().dispose()
+
+    warnings = [record.getMessage() for record in caplog.records if record.name == "app.profiler"]
+    assert warnings == [next(message for message in warnings if "4 executions" in message)]
+    assert warnings[0].startswith("Possible N+1 in GET /items/{item_id}")
+    assert warnings[0].endswith(": SELECT id FROM users WHERE username = ?")
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged_without_parameters(monkeypatch, caplog):
+    monkeypatch.setattr(profiler.settings, "SLOW_QUERY_MS", 20)
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+            async with async_session_maker() as session:
+                await session.execute(text("SELECT pg_sleep(:seconds), 'secret'"), {"seconds": 0.03})
+                await session.execute(text("SELECT 1"))
+    finally:
+        await get_engine().dispose()
+
+    [record] = [record for record in caplog.records if record.name == "app.slow_queries"]
+    message = record.getMessage()
+    assert "1 parameters redacted" in message and message.endswith("SELECT pg_sleep(?), ?")
+    assert "secret" not in message and "0.03" not in message
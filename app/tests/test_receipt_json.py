@@ -0,0 +1,161 @@
+import json
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.api.routers import products as products_router
+from app.core.receipt_json import complete, documents_query, receipt_page_json
+from app.core.receipts import receipts_query
+from app.database.async_connect import async_session_maker
+import app.models.user  # noqa: F401 - receipts.user_id references users
+from app.models.products import Products, Receipt
+from app.schemas import products
+from app.settings.config import settings
+
+RECEIPTS = "/swagger/api/v1/products/receipts/"
+AWKWARD_NAMES = ['лапки " і \\ слеш /', "рядок\nтаб\t\x01\x7f", "emoji \U0001F9FE", ""]
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id):
+    async with async_session_maker() as session:
+        moments = [datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+                   datetime(2025, 1, 2, 3, 4, 5, 120, tzinfo=timezone.utc),
+                   datetime(2025, 6, 30, 23, 59, 59, 999999, tzinfo=timezone.utc)]
+        prices = [21.0, 10.5, 0.1 + 0.2, 123456789012.25, -0.0, 0.0001]
+        for index, created_at in enumerate(moments * 3):
+            items = [Products(name=AWKWARD_NAMES[(index + n) % len(AWKWARD_NAMES)], price=prices[(index + n) % 6],
+                              quantity=float(n + 1), total=prices[(index + n) % 6] * (n + 1))
+                     for n in range(index % 4)]
+            session.add(Receipt(user_id=user_id, created_at=created_at, total=sum(item.total for item in items),
+                                rest=0.5, payment_type="cash" if index % 2 else "card", payment_amount=100.0,
+                                recept_url=None if index % 3 else f"https://example.com/{index}.txt",
+                                products=items))
+        await session.commit()
+    return user_id
+
+
+async def pydantic_documents(session, query):
+    result = await session.execute(query.options(selectinload(Receipt.products)))
+    return [products.ReceiptOutput.model_validate(receipt).model_dump_json() for receipt in result.scalars()]
+
+
+@pytest.mark.asyncio
+async def test_documents_match_pydantic_output_byte_for_byte(user_id):
+    query = receipts_query(user_id=user_id).order_by(Receipt.created_at.desc(), Receipt.id.desc())
+    async with async_session_maker() as session:
+        rows = (await session.execute(documents_query(query))).all()
+        expected = await pydantic_documents(session, query)
+
+    assert complete(rows) and len(rows) == 9
+    assert [row.document for row in rows] == expected
+
+    page = receipt_page_json(9, [row.document for row in rows], "abc")
+    assert page == products.ReceiptPage.model_validate(
+        {"total_count": 9, "items": [json.loads(document) for document in expected], "next_cursor": "abc"}
+    ).model_dump_json().encode()
+
+
+@pytest.mark.asyncio
+async def test_unreproducible_values_fall_back(user_id):
+    async with async_session_maker() as session:
+        receipt_id = (await session.execute(select(Receipt.id).where(Receipt.user_id == user_id))).scalars().first()
+        # Postgres prints 1e-05, pydantic 0.00001
+        await session.execute(text("UPDATE receipts SET rest = 0.00001 WHERE id = :id"), {"id": receipt_id})
+        await session.commit()
+        rows = (await session.execute(documents_query(receipts_query(user_id=user_id)))).all()
+
+    assert not complete(rows)
+    assert [row.id for row in rows if row.document is None] == [receipt_id]
+
+
+def test_page_json_without_cursor():
+    assert receipt_page_json(None, [], None) == b'{"total_count":null,"items":[],"next_cursor":null}'
+    assert json.loads(receipt_page_json(2, ['{"id":"%s"}' % UUID(int=1)] * 2, None))["total_count"] == 2
+
+
+@pytest.fixture
+def completed(monkeypatch):
+    """Outcomes of the list endpoint's `complete` check: True when the SQL documents were sent."""
+    outcomes = []
+
+    def spy(rows):
+        outcomes.append(complete(rows))
+        return outcomes[-1]
+
+    monkeypatch.setattr(products_router, "complete", spy)
+    return outcomes
+
+
+async def get_with(api, monkeypatch, engine, path, **params):
+    monkeypatch.setattr(settings, "RECEIPT_LIST_READ_ENGINE", engine)
+    monkeypatch.setattr(settings, "RECEIPT_DETAIL_READ_ENGINE", engine)
+    response = await api.get(path, params=params)
+    return response.status_code, response.content
+
+
+async def cursor_pages(api, monkeypatch, engine):
+    pages, cursor = [], None
+    while True:
+        status_code, body = await get_with(api, monkeypatch, engine, RECEIPTS, pagination="cursor", limit=4,
+                                           **({"cursor": cursor} if cursor else {}))
+        assert status_code == 200
+        pages.append(body)
+        cursor = json.loads(body)["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.asyncio
+async def test_sql_engine_lists_what_the_orm_lists(api, monkeypatch, completed):
+    for params in ({}, {"limit": 100, "payment_type": "cash"}, {"offset": 3, "limit": 4, "count": "none"}):
+        assert await get_with(api, monkeypatch, "sql", RECEIPTS, **params) == \
+            await get_with(api, monkeypatch, "orm", RECEIPTS, **params)
+
+    # keyset pages, including their next_cursor
+    sql_pages = await cursor_pages(api, monkeypatch, "sql")
+    assert len(sql_pages) == 3
+    assert sql_pages == await cursor_pages(api, monkeypatch, "orm")
+    assert completed == [True] * 6
+
+
+@pytest.mark.asyncio
+async def test_sql_engine_falls_back_to_the_orm_for_unreproducible_values(api, monkeypatch, completed, user_id):
+    async with async_session_maker() as session:
+        receipt_id = (await session.execute(select(Receipt.id).where(Receipt.user_id == user_id))).scalars().first()
+        await session.execute(text("UPDATE receipts SET rest = 0.00001 WHERE id = :id"), {"id": receipt_id})
+        await session.commit()
+
+    status_code, body = await get_with(api, monkeypatch, "sql", RECEIPTS, limit=100)
+    assert completed == [False]
+    assert (status_code, body) == await get_with(api, monkeypatch, "orm", RECEIPTS, limit=100)
+    # as pydantic prints it (Postgres would print 1e-05)
+    assert b'"rest":0.00001' in body
+    assert await get_with(api, monkeypatch, "sql", f"{RECEIPTS}{receipt_id}/") == \
+        await get_with(api, monkeypatch, "orm", f"{RECEIPTS}{receipt_id}/")
+
+
+@pytest.mark.asyncio
+async def test_sql_engine_gets_a_receipt_as_the_orm_does(api, monkeypatch, user_id, make_user):
+    async with async_session_maker() as session:
+        receipt_ids = (await session.execute(select(Receipt.id).where(Receipt.user_id == user_id))).scalars().all()
+    for receipt_id in receipt_ids:
+        status_code, body = await get_with(api, monkeypatch, "sql", f"{RECEIPTS}{receipt_id}/")
+        assert status_code == 200
+        assert (status_code, body) == await get_with(api, monkeypatch, "orm", f"{RECEIPTS}{receipt_id}/")
+
+    # a missing receipt and another user's receipt are both not found
+    other_user = await make_user()
+    async with async_session_maker() as session:
+        session.add(other_receipt := Receipt(user_id=other_user, total=1.0, rest=0.0, payment_type="cash",
+                                             payment_amount=1.0))
+        await session.commit()
+    for receipt_id in (uuid4(), other_receipt.id):
+        for engine in ("sql", "orm"):
+            assert await get_with(api, monkeypatch, engine, f"{RECEIPTS}{receipt_id}/") == \
+                (404, b'{"detail":"Receipt not found"}')
@@ -0,0 +1,114 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.receipt_text import (get_layout, render_receipt_lines, render_receipt_widths,
+                                   render_receipts, split_long_words)
+
+
+def legacy_split_long_words(text, line_width):
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        if len(current_line) + len(word) + 1 <= line_width:
+            current_line += (" " if current_line else "") + word
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def legacy_render(receipt, line_width):
+    """The hand-written layout the compiled one replaced, kept as the reference output."""
+    lines = ["ФОП Джонсонюк Борис".center(line_width, ' '), "=" * line_width]
+    for index, product in enumerate(receipt.products):
+        quantity_price = f"{product.quantity:.2f} x {product.price:.2f}"
+        total_price = f"{product.total:.2f}"
+        lines.extend(legacy_split_long_words(product.name, line_width))
+        spaces = line_width - len(quantity_price) - len(total_price)
+        lines.append(f"{quantity_price}{' ' * spaces}{total_price}")
+        if index < len(receipt.products) - 1:
+            lines.append("-" * line_width)
+    lines.append("=" * line_width)
+    total = receipt.total
+    lines.append(f"СУМА{' ' * (line_width - len('СУМА') - len(f'{total:.2f}'))}{total:.2f}")
+    payment_name = "Готівка" if receipt.payment_type == "cash" else "Картка"
+    amount = receipt.payment_amount
+    lines.append(f"{payment_name}{' ' * (line_width - len(payment_name) - len(f'{amount:.2f}'))}{amount:.2f}")
+    rest = receipt.rest
+    lines.append(f"Решта{' ' * (line_width - len('Решта') - len(f'{rest:.2f}'))}{rest:.2f}")
+    lines.append("=" * line_width)
+    lines.append(receipt.created_at.strftime("%d.%m.%Y %H:%M").center(line_width, ' '))
+    lines.append("Дякуємо за покупку!".center(line_width, ' '))
+    return lines
+
+
+WORDS = ["Молоко", "хліб", "Cheese", "a", "", "x" * 31, "y" * 32, "z" * 47, "Ковбаса\tлікарська",
+         "  пробіли  ", "nbsp word", "рядок\nдругий", "Вода мінеральна 1.5л", "!"]
+
+
+def random_receipt(rng):
+    products = []
+    for _ in range(rng.randint(0, 6)):
+        price = rng.choice([0.0, 0.5, 12.345, 99.99, rng.uniform(0, 1e9)])
+        quantity = rng.choice([1.0, 2.5, rng.uniform(0, 1e4)])
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 8)))
+        products.append(SimpleNamespace(name=name, price=price, quantity=quantity, total=price * quantity))
+    total = sum(product.total for product in products)
+    payment_amount = total + rng.choice([0, 0.01, 1e12])
+    return SimpleNamespace(
+        products=products,
+        total=total,
+        payment_type=rng.choice(["cash", "card", "other"]),
+        payment_amount=payment_amount,
+        rest=payment_amount - total,
+        created_at=datetime(rng.randint(1, 2100), rng.randint(1, 12), rng.randint(1, 28),
+                            rng.randint(0, 23), rng.randint(0, 59)),
+    )
+
+
+def render(receipt, line_width):
+    return render_receipt_lines(products=receipt.products, total=receipt.total,
+                                payment_type=receipt.payment_type, payment_amount=receipt.payment_amount,
+                                rest=receipt.rest, created_at=receipt.created_at, line_width=line_width)
+
+
+@pytest.mark.parametrize("line_width", [1, 5, 10, 20, 32, 42, 48, 80])
+def test_split_long_words_matches_legacy(line_width):
+    rng = random.Random(line_width)
+    for text in WORDS + [" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 10))) for _ in range(500)]:
+        assert split_long_words(text, line_width) == legacy_split_long_words(text, line_width), text
+
+
+def test_word_as_wide_as_the_line_keeps_leading_empty_line():
+    assert split_long_words("y" * 32, 32) == ["", "y" * 32]
+    assert split_long_words("y" * 31, 32) == ["y" * 31]
+
+
+@pytest.mark.parametrize("line_width", [10, 32, 42, 48])
+def test_compiled_layout_matches_legacy_output(line_width):
+    rng = random.Random(line_width)
+    for _ in range(300):
+        receipt = random_receipt(rng)
+        assert render(receipt, line_width) == legacy_render(receipt, line_width)
+
+
+def test_batch_and_multi_width_rendering_match_single_renders():
+    rng = random.Random(0)
+    receipts = [random_receipt(rng) for _ in range(50)]
+
+    assert render_receipts(receipts, 42) == [legacy_render(receipt, 42) for receipt in receipts]
+    for receipt in receipts:
+        assert render_receipt_widths(receipt, (32, 42, 48)) == {
+            width: legacy_render(receipt, width) for width in (32, 42, 48)
+        }
+
+
+def test_layouts_are_compiled_once_per_width():
+    assert get_layout(42) is get_layout(42)
+    assert get_layout(42) is not get_layout(48)
@@ -0,0 +1,84 @@
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import column, insert, select, table, text
+
+from app.database import async_connect
+from app.database.async_connect import (async_session_maker, get_engine, get_replica_engine, pinned_to_primary,
+                                        replica_available, replica_pool_stats, route_reads_to_replica)
+from app.settings.config import settings
+
+
+# one server behind a second DSN stands in for the replica
+@pytest_asyncio.fixture
+async def replica(monkeypatch):
+    monkeypatch.setattr(settings, "POSTGRES_REPLICA_SERVER", "localhost")
+    monkeypatch.setattr(async_connect, "_replica_engine", None)
+    monkeypatch.setattr(async_connect, "_replica_down_until", 0.0)
+    yield
+    await async_connect.dispose_engine()
+
+
+async def used_engine(session):
+    return (await session.connection()).engine
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_writes_to_primary(replica):
+    async with async_session_maker() as session:
+        assert route_reads_to_replica(session)
+        assert await used_engine(session) is get_replica_engine()
+        assert (await session.execute(text("SELECT 1"))).scalar() == 1
+
+        # writes and flushes of a replica-routed session still go to the primary
+        sync_session = session.sync_session
+        probe = table("replica_probe", column("name"))
+        assert sync_session.get_bind(clause=select(probe)) is get_replica_engine().sync_engine
+        assert sync_session.get_bind(clause=insert(probe).values(name="x")) is get_engine().sync_engine
+        sync_session._flushing = True
+        try:
+            assert sync_session.get_bind(clause=select(probe)) is get_engine().sync_engine
+        finally:
+            sync_session._flushing = False
+
+    async with async_session_maker() as session:
+        assert await used_engine(session) is get_engine()
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_falls_back_to_primary(replica, monkeypatch):
+    monkeypatch.setattr(settings, "POSTGRES_REPLICA_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "POSTGRES_REPLICA_PORT", 1)
+
+    async with async_session_maker() as session:
+        assert route_reads_to_replica(session)
+        # the first query finds the replica down and runs on the primary
+        assert (await session.execute(text("SELECT 1"))).scalar() == 1
+        assert not replica_available()
+        assert await used_engine(session) is get_engine()
+
+    # while marked down the replica is not even tried
+    async with async_session_maker() as session:
+        assert not route_reads_to_replica(session)
+    assert async_connect.get_pool_status()["replica_available"] is False
+
+
+@pytest.mark.asyncio
+async def test_routed_session_connects_only_when_it_queries(replica):
+    checkouts = replica_pool_stats.checkouts
+    async with async_session_maker() as session:
+        assert route_reads_to_replica(session)
+        assert not session.in_transaction()
+    assert replica_pool_stats.checkouts == checkouts
+
+
+@pytest.mark.asyncio
+async def test_commit_pins_writer_to_primary(replica):
+    writer_id = str(uuid4())
+    assert not pinned_to_primary(writer_id)
+    async with async_session_maker() as session:
+        session.info["writer_id"] = writer_id
+        await session.execute(text("SELECT 1"))
+        await session.commit()
+    assert pinned_to_primary(writer_id)
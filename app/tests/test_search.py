@@ -0,0 +1,73 @@
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from app.core import search
+from app.core.pagination import explain
+from app.core.search import search_receipts, trigram_available
+from app.database.async_connect import async_session_maker
+
+# receipt n (1 is the newest) contains these products
+RECEIPTS = [["Молоко 2.5%", "Хліб"], ["Кава мелена"], ["молоко_козине", "Сир"], ["Молокосмоктач"]]
+
+
+async def add_receipts(session, user_id, receipts):
+    for n, names in enumerate(receipts, start=1):
+        receipt_id = uuid4()
+        await session.execute(text(
+            "INSERT INTO receipts (id, user_id, created_at, total, rest, payment_type, payment_amount) "
+            "VALUES (:id, :user_id, now() - make_interval(mins => :n), 1, 0, 'cash', 1)"
+        ), {"id": receipt_id, "user_id": user_id, "n": n})
+        for name in names:
+            await session.execute(text(
+                "INSERT INTO products (receipt_id, name, price, quantity, total) VALUES (:id, :name, 1, 1, 1)"
+            ), {"id": receipt_id, "name": name})
+
+
+@pytest_asyncio.fixture
+async def user_id(user_id, make_user, monkeypatch):
+    monkeypatch.setattr(search, "_trigram_available", None)
+    # another user's receipts never show up
+    other_user_id = await make_user()
+    async with async_session_maker() as session:
+        await add_receipts(session, user_id, RECEIPTS)
+        await add_receipts(session, other_user_id, RECEIPTS)
+        await session.commit()
+    return user_id
+
+
+@pytest.mark.asyncio
+async def test_substring_search_is_scoped_ranked_and_paginated(user_id):
+    async with async_session_maker() as session:
+        hits = await search_receipts(session, user_id=user_id, query="молоко", fuzzy=False)
+        assert [hit.matches for hit in hits] == [["Молоко 2.5%"], ["молоко_козине"], ["Молокосмоктач"]]
+        assert all(hit.score == 1 and hit.receipt.user_id == user_id for hit in hits)
+
+        page = await search_receipts(session, user_id=user_id, query="молоко", offset=1, limit=1, fuzzy=False)
+        assert [hit.receipt.id for hit in page] == [hits[1].receipt.id]
+        assert [len(hit.receipt.products) for hit in page] == [2]
+
+
+@pytest.mark.asyncio
+async def test_like_wildcards_in_query_are_literal(user_id):
+    async with async_session_maker() as session:
+        assert [hit.matches for hit in await search_receipts(session, user_id=user_id, query="о_к")] == \
+            [["молоко_козине"]]
+        assert [hit.matches for hit in await search_receipts(session, user_id=user_id, query="2.5%")] == \
+            [["Молоко 2.5%"]]
+        assert await search_receipts(session, user_id=user_id, query="%%%") == []
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_search_uses_trigram_index(user_id):
+    async with async_session_maker() as session:
+        if not await trigram_available(session):
+            pytest.skip("pg_trgm is not installed on this database server")
+        hits = await search_receipts(session, user_id=user_id, query="молако")
+        assert hits and hits[0].matches[0].lower().startswith("молоко") and hits[0].score < 1
+
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = await explain(session, text("SELECT id FROM products WHERE name ILIKE '%олок%'"))
+        assert "ix_products_name_trgm" in str(plan)
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core.security import PasswordHasher, pwd_context
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_in_executor():
+    hasher = PasswordHasher(workers=1, max_waiting=4)
+    try:
+        hashed = await hasher.hash("password123")
+
+        assert await hasher.verify_and_update("password123", hashed) == (True, None)
+        assert (await hasher.verify_and_update("wrong", hashed))[0] is False
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_rehash_when_work_factor_changed():
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password123")
+    hasher = PasswordHasher(workers=1, max_waiting=4)
+    try:
+        verified, new_hash = await hasher.verify_and_update("password123", old_hash)
+    finally:
+        hasher.shutdown()
+
+    assert verified
+    assert new_hash is not None and new_hash != old_hash
+    assert not pwd_context.needs_update(new_hash)
+
+
+@pytest.mark.asyncio
+async def test_requests_beyond_queue_limit_are_rejected():
+    hasher = PasswordHasher(workers=1, max_waiting=1)
+    try:
+        results = await asyncio.gather(*(hasher.hash("password123") for _ in range(3)),
+                                       return_exceptions=True)
+    finally:
+        hasher.shutdown()
+
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 503
+    assert hasher.rejected == 1
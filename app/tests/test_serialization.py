@@ -0,0 +1,42 @@
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models.products import Products, Receipt
+from app.schemas import products
+
+
+def make_receipt(items=2):
+    product_rows = [Products(name=f"Товар {index}", price=10.5, quantity=2.0, total=21.0) for index in range(items)]
+    return Receipt(id=uuid4(), products=product_rows, total=21.0 * items, rest=0.0, payment_type="card",
+                   payment_amount=21.0 * items, created_at=datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+                   recept_url=None)
+
+
+def hand_built(receipt):
+    return products.ReceiptOutput(
+        id=receipt.id,
+        products=[products.ProductOutput(name=product.name, price=product.price, quantity=product.quantity,
+                                         total=product.total) for product in receipt.products],
+        payment=products.ReceiptPayment(type=receipt.payment_type, amount=receipt.payment_amount),
+        total=receipt.total,
+        rest=receipt.rest,
+        created_at=receipt.created_at,
+        recept_url=receipt.recept_url,
+    )
+
+
+def test_receipt_output_validates_from_orm_row():
+    receipt = make_receipt()
+    assert products.ReceiptOutput.model_validate(receipt) == hand_built(receipt)
+
+
+def test_page_json_matches_response_model_output():
+    receipts = [make_receipt(items) for items in range(3)]
+    page = products.ReceiptPage.model_validate(
+        {"total_count": 3, "items": receipts, "next_cursor": None}, from_attributes=True
+    )
+    expected = {"total_count": 3, "items": [hand_built(receipt) for receipt in receipts], "next_cursor": None}
+    assert json.loads(page.model_dump_json()) == jsonable_encoder(expected)
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+import pytest
+
+from app import main
+from app.database.async_connect import get_engine
+
+
+@pytest.mark.asyncio
+async def test_failed_migration_fails_startup(monkeypatch):
+    async def broken_migrations(engine):
+        raise RuntimeError("migration 7 failed")
+
+    monkeypatch.setattr(main, "run_migrations", broken_migrations)
+    try:
+        with pytest.raises(RuntimeError, match="migration 7 failed"):
+            async with main.app.router.lifespan_context(main.app):
+                pass
+    finally:
+        await get_engine().dispose()
+    assert not main.job_queue.running
+
+
+def test_import_leaves_logging_alone():
+    code = "import logging, app.main; assert not logging.getLogger().handlers"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
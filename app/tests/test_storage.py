@@ -0,0 +1,47 @@
+from io import BytesIO
+
+import pytest
+
+from app.core.storage import LocalStorage, MemoryStorage, StorageBackend
+
+
+@pytest.mark.asyncio
+async def test_memory_storage_accepts_bytes_and_streams():
+    storage = MemoryStorage()
+
+    assert await storage.put("a", b"receipt") == "memory://a"
+    assert await storage.put("b", BytesIO("чек".encode("utf-8"))) == "memory://b"
+
+    assert await storage.get("a") == b"receipt"
+    assert (await storage.get("b")).decode("utf-8") == "чек"
+
+
+@pytest.mark.asyncio
+async def test_local_storage_writes_final_file(tmp_path):
+    storage = LocalStorage(root=str(tmp_path), base_url="http://localhost:8000/checks/")
+
+    url = await storage.put("receipt-1", BytesIO(b"x" * 200_000))
+
+    assert url == "http://localhost:8000/checks/receipt-1"
+    assert await storage.get("receipt-1") == b"x" * 200_000
+    assert [path.name for path in tmp_path.iterdir()] == ["receipt-1"]
+
+
+@pytest.mark.asyncio
+async def test_local_storage_rejects_keys_outside_root(tmp_path):
+    storage = LocalStorage(root=str(tmp_path / "checks"))
+
+    with pytest.raises(ValueError):
+        await storage.put("../escape", b"x")
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class NoUrls(StorageBackend):
+        async def put(self, key, data, content_type=None):
+            return key
+
+        async def get(self, key):
+            return b""
+
+    with pytest.raises(TypeError, match="url_for"):
+        NoUrls()
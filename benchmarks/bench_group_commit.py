@@ -0,0 +1,134 @@
+"""
+Throughput and latency of receipt writes: a transaction per receipt vs group commit.
+
+    python -m benchmarks.bench_group_commit --receipts 2000 --concurrency 1 16 64 --window-ms 2 5 --max-items 100
+
+For every concurrency level, `--receipts` receipts are written by that many
+concurrent writers the way `POST /receipts/` does it: "direct" with
+`insert_receipt`, a render job and a commit each, "batched" through
+`app.core.group_commit.ReceiptBatcher` for every `--window-ms`. The rows
+are written to the configured database under a throwaway user and removed
+afterwards.
+"""
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def make_receipt():
+    from app.core.receipts import BulkReceipt, price_receipt
+    from app.schemas.products import ReceiptInput
+
+    receipt_input = ReceiptInput.model_validate({
+        "products": [{"name": f"Товар {n}", "price": 10.5, "quantity": 2} for n in range(3)],
+        "payment_type": "cash", "payment_amount": 100,
+    })
+    products_data, total, rest = price_receipt(receipt_input)
+    return BulkReceipt(id=uuid4(), receipt_input=receipt_input, products_data=products_data, total=total, rest=rest)
+
+
+async def write_direct(user_id, receipt):
+    from app.core.jobs import enqueue_job
+    from app.core.receipts import RENDER_RECEIPT_JOB, insert_receipt
+    from app.database.async_connect import async_session_maker
+
+    async with async_session_maker() as session:
+        receipt_id, _ = await insert_receipt(
+            session=session, user_id=user_id, total=receipt.total, rest=receipt.rest,
+            payment_type=receipt.receipt_input.payment_type,
+            payment_amount=receipt.receipt_input.payment_amount, products_data=receipt.products_data)
+        await enqueue_job(session=session, kind=RENDER_RECEIPT_JOB,
+                          payload={"receipt_id": str(receipt_id), "line_width": 32})
+        await session.commit()
+
+
+async def run(write, receipts, concurrency):
+    """Seconds taken overall and the sorted per-receipt latencies in ms."""
+    queue = list(reversed(receipts))
+    latencies = []
+
+    async def writer():
+        while queue:
+            receipt = queue.pop()
+            started = time.perf_counter()
+            await write(receipt)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[writer() for _ in range(concurrency)])
+    return time.perf_counter() - started, sorted(latencies)
+
+
+async def cleanup(user_id):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker
+
+    async with async_session_maker() as session:
+        receipts = "SELECT id::text FROM receipts WHERE user_id = :id"
+        await session.execute(text(
+            f"DELETE FROM jobs WHERE payload ->> 'receipt_id' IN ({receipts}) OR EXISTS ("
+            f"SELECT 1 FROM json_array_elements_text(coalesce(payload -> 'receipt_ids', '[]')) AS receipt_id "
+            f"WHERE receipt_id IN ({receipts}))"
+        ), {"id": user_id})
+        await session.execute(text("DELETE FROM products WHERE receipt_id IN "
+                                   "(SELECT id FROM receipts WHERE user_id = :id)"), {"id": user_id})
+        await session.execute(text("DELETE FROM receipts WHERE user_id = :id"), {"id": user_id})
+        await session.execute(text("DELETE FROM sales_rollups WHERE user_id = :id"), {"id": user_id})
+        await session.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        await session.commit()
+
+
+async def main_async(args):
+    from sqlalchemy import text
+
+    from app.core.group_commit import ReceiptBatcher
+    from app.database.async_connect import async_session_maker, dispose_engine
+
+    user_id = uuid4()
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :name, :name, 'x')"
+        ), {"id": user_id, "name": f"bench-group-commit-{user_id}"})
+        await session.commit()
+
+    try:
+        print(f"{'mode':<18}{'writers':>8}{'receipts/s':>12}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'batch':>7}")
+        for concurrency in args.concurrency:
+            modes = [("direct", lambda receipt: write_direct(user_id, receipt), None)]
+            for window in args.window_ms:
+                batcher = ReceiptBatcher(window=window / 1000, max_items=args.max_items)
+                modes.append((f"batched {window:g} ms",
+                              lambda receipt, batcher=batcher: batcher.submit(user_id=user_id, receipt=receipt),
+                              batcher))
+            for name, write, batcher in modes:
+                receipts = [make_receipt() for _ in range(args.receipts)]
+                try:
+                    elapsed, latencies = await run(write, receipts, concurrency)
+                finally:
+                    if batcher is not None:
+                        await batcher.stop()
+                batch = f"{batcher.stats()['batch_size_avg']:>7}" if batcher is not None else f"{1:>7}"
+                print(f"{name:<18}{concurrency:>8}{len(receipts) / elapsed:>12.0f}{percentile(latencies, 0.5):>8.1f}"
+                      f"{percentile(latencies, 0.95):>8.1f}{percentile(latencies, 0.99):>8.1f}{batch}")
+    finally:
+        await cleanup(user_id)
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--window-ms", type=float, nargs="+", default=[2, 5])
+    parser.add_argument("--max-items", type=int, default=100)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+End-to-end HTTP load test: a weighted mix of login, receipt creation,
+filtered listing and text rendering at a fixed concurrency, with
+p50/p95/p99 latency and requests/s.
+
+    python -m benchmarks.bench_load --concurrency 32 --duration 30 --mix login=1 create=4 list=4 text=3 --json load.json
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000 --compare load.json --threshold 0.1
+
+Without `--url` the app runs in-process: ASGI calls with the lifespan
+(migrations, job queue) running, no network, STORAGE_BACKEND=memory and
+rate limiting off unless set in the environment. With `--url` requests go
+to a running server, e.g. `uvicorn app.main:app`; start it with
+RATE_LIMIT_ENABLED=false, or most of the load ends up as 429.
+
+`--users` throwaway users are created through the API, log in and write
+`--seed-receipts` receipts each. Then `--concurrency` workers send requests
+for `--duration` seconds, each picking a scenario by its `--mix` weight
+and a random user; requests finished during the first `--warmup` seconds
+are not counted. The users and everything they wrote are removed directly
+in the configured database afterwards, so a `--url` server has to use the
+same database.
+
+`--json` saves the results; `--compare` checks p95, p99 and requests/s of
+every scenario against a saved run and exits with status 1 when one is
+more than `--threshold` worse.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from uuid import uuid4
+
+API = "/swagger/api/v1"
+PASSWORD = "bench-load-password"
+SCENARIOS = ("login", "create", "list", "text")
+LIST_FILTERS = (
+    {},
+    {"payment_type": "cash"},
+    {"min_total": 50},
+    {"min_total": 20, "max_total": 200, "payment_type": "card"},
+    {"pagination": "cursor", "count": "none"},
+)
+# compared with --compare; the direction that is better
+METRICS = {"p95_ms": "lower", "p99_ms": "lower", "rps": "higher"}
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def parse_mix(items):
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS or not weight:
+            raise argparse.ArgumentTypeError(f"expected <scenario>=<weight> with a scenario of {SCENARIOS}: {item}")
+        mix[name] = float(weight)
+    return mix
+
+
+def make_receipt(rng):
+    products = [{"name": f"Товар {rng.randrange(1000)}", "price": round(rng.uniform(1, 100), 2),
+                 "quantity": rng.choice((1, 2, 3, 0.5))} for _ in range(rng.randint(1, 5))]
+    total = sum(product["price"] * product["quantity"] for product in products)
+    return {"products": products, "payment_type": rng.choice(("cash", "card")),
+            "payment_amount": round(total + rng.uniform(0, 20), 2)}
+
+
+class User:
+    def __init__(self, email):
+        self.email = email
+        self.headers = {}
+        self.receipt_ids = []
+
+
+async def create_receipt(client, user, rng):
+    response = await client.post(f"{API}/products/receipts/", json=make_receipt(rng), headers=user.headers)
+    if response.status_code == 200:
+        user.receipt_ids.append(response.json()["id"])
+    return response
+
+
+async def login(client, user, rng):
+    response = await client.post(f"{API}/login/access-token", data={"username": user.email, "password": PASSWORD})
+    if response.status_code == 200:
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return response
+
+
+async def list_receipts(client, user, rng):
+    return await client.get(f"{API}/products/receipts/", params={"limit": 10, **rng.choice(LIST_FILTERS)},
+                            headers=user.headers)
+
+
+async def render_text(client, user, rng):
+    receipt_id = rng.choice(user.receipt_ids)
+    return await client.get(f"{API}/products/receipts/{receipt_id}/text",
+                            params={"line_width": rng.choice((24, 32, 48))})
+
+
+REQUESTS = {"login": login, "create": create_receipt, "list": list_receipts, "text": render_text}
+
+
+async def setup(client, args, users):
+    rng = random.Random(args.seed)
+    for _ in range(args.users):
+        user = User(f"bench-load-{uuid4().hex[:12]}@example.com")
+        # added first, so that cleanup finds it even if the setup fails half-way
+        users.append(user)
+        response = await client.post(f"{API}/users/create-user",
+                                     json={"username": user.email, "email": user.email, "password": PASSWORD})
+        response.raise_for_status()
+        (await login(client, user, rng)).raise_for_status()
+        for _ in range(args.seed_receipts):
+            (await create_receipt(client, user, rng)).raise_for_status()
+
+
+async def cleanup(emails):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker
+
+    users = "SELECT id FROM users WHERE email = ANY(:emails)"
+    receipts = f"SELECT id FROM receipts WHERE user_id IN ({users})"
+    async with async_session_maker() as session:
+        params = {"emails": emails}
+        await session.execute(text(
+            f"DELETE FROM jobs WHERE payload ->> 'receipt_id' IN (SELECT id::text FROM ({receipts}) AS r) OR EXISTS ("
+            f"SELECT 1 FROM json_array_elements_text(coalesce(payload -> 'receipt_ids', '[]')) AS receipt_id "
+            f"WHERE receipt_id IN (SELECT id::text FROM ({receipts}) AS r))"
+        ), params)
+        await session.execute(text(f"DELETE FROM products WHERE receipt_id IN ({receipts})"), params)
+        await session.execute(text(f"DELETE FROM receipts WHERE user_id IN ({users})"), params)
+        await session.execute(text(f"DELETE FROM sales_rollups WHERE user_id IN ({users})"), params)
+        await session.execute(text(f"DELETE FROM idempotency_keys WHERE user_id IN ({users})"), params)
+        await session.execute(text("DELETE FROM users WHERE email = ANY(:emails)"), params)
+        await session.commit()
+
+
+async def worker(client, users, mix, rng, started, warmup, deadline, latencies, statuses):
+    names, weights = list(mix), list(mix.values())
+    while True:
+        begin = time.perf_counter()
+        if begin >= deadline:
+            return
+        name = rng.choices(names, weights)[0]
+        try:
+            status = (await REQUESTS[name](client, rng.choice(users), rng)).status_code
+        except Exception as e:
+            status = type(e).__name__
+        end = time.perf_counter()
+        if end - started < warmup:
+            continue
+        statuses[name][status] += 1
+        if isinstance(status, int) and status < 400:
+            latencies[name].append(end - begin)
+
+
+def summarize(latencies, statuses, seconds):
+    results = {}
+    for name in sorted(statuses, key=SCENARIOS.index) + ["total"]:
+        if name == "total":
+            samples = sorted(sample for values in latencies.values() for sample in values)
+            counts = sum(statuses.values(), Counter())
+        else:
+            samples = sorted(latencies[name])
+            counts = statuses[name]
+        requests = sum(counts.values())
+        results[name] = {
+            "requests": requests,
+            "errors": requests - len(samples),
+            "rps": len(samples) / seconds,
+        }
+        if samples:
+            results[name].update({
+                "mean_ms": sum(samples) / len(samples) * 1000,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "max_ms": samples[-1] * 1000,
+            })
+    return results
+
+
+def print_results(results, statuses):
+    print(f"{'scenario':<10}{'requests':>10}{'errors':>8}{'req/s':>9}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'max ms':>9}")
+    for name, row in results.items():
+        timings = "".join(f"{row[metric]:>9.1f}" if metric in row else f"{'-':>9}"
+                          for metric in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        print(f"{name:<10}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9.1f}{timings}")
+    for name, counts in statuses.items():
+        failed = {status: count for status, count in counts.items() if not isinstance(status, int) or status >= 400}
+        if failed:
+            print(f"{name} errors: " + ", ".join(f"{status} x{count}" for status, count in failed.items()))
+
+
+async def run(client, args, mix, users):
+    await setup(client, args, users)
+    latencies, statuses = defaultdict(list), defaultdict(Counter)
+    started = time.perf_counter()
+    deadline = started + args.warmup + args.duration
+    await asyncio.gather(*(worker(client, users, mix, random.Random(args.seed + n), started, args.warmup, deadline,
+                                  latencies, statuses) for n in range(args.concurrency)))
+    # requests still in flight at the deadline finish after it
+    seconds = max(time.perf_counter(), deadline) - started - args.warmup
+    return latencies, statuses, seconds
+
+
+async def main_async(args, mix):
+    import httpx
+
+    users = []
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        lifespan = None
+    else:
+        os.environ.setdefault("STORAGE_BACKEND", "memory")
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                   timeout=args.timeout)
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+    try:
+        async with client:
+            latencies, statuses, seconds = await run(client, args, mix, users)
+    finally:
+        from app.database.async_connect import dispose_engine
+
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        await cleanup([user.email for user in users])
+        await dispose_engine()
+    return summarize(latencies, statuses, seconds), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="a running server; in-process ASGI if omitted")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed-receipts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds run before measuring")
+    parser.add_argument("--mix", nargs="+", default=["login=1", "create=4", "list=4", "text=3"],
+                        help="<scenario>=<weight> for scenarios " + ", ".join(SCENARIOS))
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="tolerated relative slowdown")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    from benchmarks import results as saved
+
+    baseline = saved.load(args.compare, "load") if args.compare else None
+    results, statuses = asyncio.run(main_async(args, mix))
+    print_results(results, statuses)
+    if args.json:
+        parameters = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        saved.save(args.json, "load", {**parameters, "mix": mix}, results)
+    if baseline and not saved.report(saved.compare(baseline, results, METRICS, args.threshold), baseline,
+                                     args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Overhead of the request metrics: `MetricsMiddleware` per request and the query timing events per statement.
+
+    python -m benchmarks.bench_metrics --requests 5000 --queries 2000 --rounds 7
+
+Requests are ASGI calls straight into a FastAPI app with one route, with
+and without the middleware, so the difference is the middleware alone.
+Statements are `SELECT 1` on the configured database through an engine
+with and without `track_query_time`, inside a request's phase context.
+Both variants run in alternating rounds; the medians are reported.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+
+def build_app():
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+
+    app = FastAPI()
+
+    @app.get("/receipts/{receipt_id}")
+    async def receipt(receipt_id: str):
+        return Response(b"{}", media_type="application/json")
+
+    return app
+
+
+async def call(app, path):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def time_requests(app, count):
+    for n in range(min(count, 1000)):
+        await call(app, f"/receipts/{n}")
+    started = time.perf_counter()
+    for n in range(count):
+        await call(app, f"/receipts/{n}")
+    return (time.perf_counter() - started) / count * 1e6
+
+
+async def time_queries(engine, count):
+    from sqlalchemy import text
+
+    from app.core.metrics import finish_request, start_request
+
+    _, token = start_request()
+    try:
+        async with engine.connect() as conn:
+            for _ in range(100):
+                await conn.execute(text("SELECT 1"))
+            started = time.perf_counter()
+            for _ in range(count):
+                await conn.execute(text("SELECT 1"))
+            elapsed = time.perf_counter() - started
+    finally:
+        finish_request(token)
+    return elapsed / count * 1e6
+
+
+async def interleaved(rounds, plain, measured):
+    """Median per-call time of both variants, alternating them so that drift affects both alike."""
+    plain_times, measured_times = [], []
+    for _ in range(rounds):
+        plain_times.append(await plain())
+        measured_times.append(await measured())
+    return statistics.median(plain_times), statistics.median(measured_times)
+
+
+async def main_async(args):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.api.metrics import MetricsMiddleware
+    from app.core.metrics import track_query_time
+    from app.database.async_connect import ASYNC_SQLALCHEMY_DATABASE_URL
+
+    app = build_app()
+    wrapped = MetricsMiddleware(app)
+    bare, measured = await interleaved(args.rounds, lambda: time_requests(app, args.requests),
+                                       lambda: time_requests(wrapped, args.requests))
+    print(f"{'':<24}{'plain us':>10}{'metrics us':>12}{'overhead us':>13}")
+    print(f"{'request (ASGI call)':<24}{bare:>10.1f}{measured:>12.1f}{measured - bare:>13.1f}")
+
+    plain_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    timed_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    track_query_time(timed_engine)
+    try:
+        plain, timed = await interleaved(args.rounds, lambda: time_queries(plain_engine, args.queries),
+                                         lambda: time_queries(timed_engine, args.queries))
+    finally:
+        await plain_engine.dispose()
+        await timed_engine.dispose()
+    print(f"{'statement (SELECT 1)':<24}{plain:>10.1f}{timed:>12.1f}{timed - plain:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=7)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Micro-benchmarks of the pure functions every request runs: word wrap and
+receipt text layout, receipt pricing, `ReceiptOutput` construction and
+JWT issue/verify.
+
+    python -m benchmarks.bench_micro --sizes 1 10 100 1000 10000 --widths 24 32 48 --json micro.json
+    python -m benchmarks.bench_micro --compare micro.json --threshold 0.15 --filter render
+
+Every case is a function of one input built beforehand, timed with
+`timeit` in `--repeat` rounds of at least `--min-time` seconds each; the
+best round ("min") and the median round are reported per call. Inputs are
+deterministic: Ukrainian product names, short ones and ones much longer
+than a line, `--sizes` line items per receipt and `--widths` columns.
+
+The rounds are interleaved - each round times every case once - so that
+the machine getting faster or slower during the run shifts all cases
+alike instead of the few timed at that moment. They run in `--processes`
+fresh interpreters, as speed also differs per process (memory layout,
+hash seeds); the reported median is the median of theirs.
+
+`--json` saves the results; `--compare` checks the median time of every
+case against a saved run and exits with status 1 when one is more than
+`--threshold` slower, or `--short-threshold` for cases that took less than
+SHORT_CASE_US in the saved run. The change of a fixed stdlib workload
+timed alongside ("calibration") is scaled out first, so a machine that is
+slower overall than at the baseline does not fail every case. On a shared
+one-vCPU VM, repeated runs then stayed within about 10% of the baseline
+(17% for cases under 10 us) instead of 50%. Compare runs on the same
+machine only.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+NAMES = ["Молоко 2.5%", "Хліб білий нарізний", "Сир твердий Гауда ваговий", "Вода мінеральна 1.5л", "Яблука"]
+LONG_NAME = ("Ковбаса лікарська варена вищого ґатунку в натуральній оболонці, охолоджена, "
+             "ваговий товар - ціна за кілограм, виробник ТОВ «Глобино», Полтавська область")
+TEXTS = {
+    "short": "Молоко 2.5%",
+    "long": LONG_NAME,
+    "spaced": "Хліб  білий   нарізний  ",
+}
+RECEIPT_ID = UUID("4c7a2f4e-8d7b-4f7e-9b7e-2f5d1c3a9e10")
+CREATED_AT = datetime(2026, 1, 15, 12, 30, tzinfo=timezone.utc)
+# compared with --compare; the direction that is better
+METRICS = {"median_us": "lower"}
+# cases faster than this are compared with --short-threshold
+SHORT_CASE_US = 10
+# a fixed stdlib workload timed along with the cases (see `normalize`)
+CALIBRATION = "calibration"
+
+
+def make_receipt_input(items):
+    from app.schemas.products import ReceiptInput
+
+    names = NAMES + [LONG_NAME]
+    products = [{"name": names[n % len(names)], "price": 10 + n % 97 * 1.25, "quantity": 1 + n % 3 * 0.5}
+                for n in range(items)]
+    return ReceiptInput.model_validate({"products": products, "payment_type": "cash",
+                                        "payment_amount": sum(p["price"] * p["quantity"] for p in products) + 100})
+
+
+def split_cases(widths):
+    from app.core.receipt_text import split_long_words
+
+    for kind, text in TEXTS.items():
+        for width in widths:
+            yield f"split_long_words {kind} width={width}", \
+                lambda text=text, width=width: split_long_words(text, width)
+
+
+def render_cases(sizes, widths):
+    from app.core.receipt_text import render_receipt_lines
+    from app.core.receipts import price_receipt
+
+    for items in sizes:
+        receipt_input = make_receipt_input(items)
+        products_data, total, rest = price_receipt(receipt_input)
+        prepared = dict(products=products_data, total=total, payment_type=receipt_input.payment_type,
+                        payment_amount=receipt_input.payment_amount, rest=rest, created_at=CREATED_AT)
+        for width in widths:
+            yield f"render_receipt_lines items={items} width={width}", \
+                lambda prepared=prepared, width=width: render_receipt_lines(**prepared, line_width=width)
+
+
+def price_cases(sizes):
+    from app.core.receipts import price_receipt
+
+    for items in sizes:
+        receipt_input = make_receipt_input(items)
+        yield f"price_receipt items={items}", lambda receipt_input=receipt_input: price_receipt(receipt_input)
+
+
+def output_cases(sizes):
+    from app.core.receipts import price_receipt
+    from app.schemas import products
+
+    def build(receipt_input, products_data, total, rest):
+        # as create_receipt builds and encodes its response
+        return products.ReceiptOutput(
+            id=RECEIPT_ID, products=products_data,
+            payment=products.ReceiptPayment(type=receipt_input.payment_type, amount=receipt_input.payment_amount),
+            total=total, rest=rest, created_at=CREATED_AT, recept_url=None,
+        ).model_dump_json()
+
+    for items in sizes:
+        receipt_input = make_receipt_input(items)
+        priced = price_receipt(receipt_input)
+        yield f"ReceiptOutput items={items}", lambda receipt_input=receipt_input, priced=priced: build(
+            receipt_input, *priced)
+
+
+def token_cases():
+    from fastapi import HTTPException
+
+    from app.api.deps import verify_access_token
+    from app.core.security import create_access_token
+
+    token = create_access_token(RECEIPT_ID, timedelta(days=1))
+    credentials_exception = HTTPException(status_code=401)
+    yield "create_access_token", lambda: create_access_token(RECEIPT_ID, timedelta(minutes=30))
+    yield "verify_access_token", lambda: verify_access_token(token, credentials_exception)
+
+
+def calibration_case():
+    import json
+
+    document = {"items": [{"name": f"{NAMES[n % len(NAMES)]} {n}", "price": n * 1.25} for n in range(50)]}
+
+    def work():
+        text = json.dumps(document, ensure_ascii=False)
+        return sorted(text.split(","), key=len)
+
+    return CALIBRATION, work
+
+
+def cases(args):
+    yield from split_cases(args.widths)
+    yield from render_cases(args.sizes, args.widths)
+    yield from price_cases(args.sizes)
+    yield from output_cases(args.sizes)
+    yield from token_cases()
+
+
+def measure(functions, repeat, min_time):
+    """
+    Per-call seconds of each round, per case name; every round times each
+    case once, with a call count picked so that it takes at least `min_time`.
+    """
+    timers = []
+    for name, function in functions:
+        timer = timeit.Timer(function)
+        number = 1
+        while timer.timeit(number) < min_time:
+            number *= 2
+        timers.append((name, timer, number))
+    rounds = {name: [] for name, _, _ in timers}
+    for _ in range(repeat):
+        for name, timer, number in timers:
+            rounds[name].append(timer.timeit(number) / number)
+    return rounds
+
+
+def measure_in_processes(args):
+    """
+    Runs the rounds in `--processes` fresh interpreters one after another and
+    returns `{case: {"min_us", "median_us"}}` with the best minimum and the
+    median of their medians.
+    """
+    from benchmarks import results as saved
+
+    command = [sys.executable, "-m", "benchmarks.bench_micro", "--processes", "1",
+               "--sizes", *map(str, args.sizes), "--widths", *map(str, args.widths),
+               "--repeat", str(args.repeat), "--min-time", str(args.min_time)]
+    if args.filter:
+        command += ["--filter", args.filter]
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        for number in range(args.processes):
+            path = os.path.join(directory, f"{number}.json")
+            subprocess.run(command + ["--json", path], check=True, stdout=subprocess.DEVNULL)
+            runs.append(saved.load(path, "micro")["results"])
+    return {case: {"min_us": min(run[case]["min_us"] for run in runs),
+                   "median_us": statistics.median(run[case]["median_us"] for run in runs)}
+            for case in runs[0]}
+
+
+def normalize(results, baseline):
+    """
+    `results` scaled by how much the calibration workload sped up or slowed
+    down since `baseline`, so that a machine running slower than it did then
+    does not read as a regression of every case.
+    """
+    previous, current = baseline["results"].get(CALIBRATION), results.get(CALIBRATION)
+    if not previous or not current:
+        return results
+    factor = previous["median_us"] / current["median_us"]
+    print(f"\ncalibration {current['median_us'] / previous['median_us'] - 1:+.1%} since the baseline, "
+          f"scaled out of the comparison")
+    return {case: {metric: value * factor for metric, value in values.items()}
+            for case, values in results.items() if case != CALIBRATION}
+
+
+def thresholds(baseline, threshold, short_threshold):
+    """Per-case thresholds: `short_threshold` for the cases under SHORT_CASE_US in `baseline`."""
+    return {case: short_threshold if values.get("median_us", 0) < SHORT_CASE_US else threshold
+            for case, values in baseline["results"].items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000], help="line items")
+    parser.add_argument("--widths", type=int, nargs="+", default=[24, 32, 48])
+    parser.add_argument("--repeat", type=int, default=15, help="rounds")
+    parser.add_argument("--min-time", type=float, default=0.02, help="seconds per case and round")
+    parser.add_argument("--processes", type=int, default=3, help="fresh interpreters the rounds run in")
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.15, help="tolerated relative slowdown")
+    parser.add_argument("--short-threshold", type=float, default=0.3,
+                        help=f"tolerated relative slowdown of cases under {SHORT_CASE_US} us")
+    args = parser.parse_args()
+
+    from benchmarks import results as saved
+
+    baseline = saved.load(args.compare, "micro") if args.compare else None
+    if args.processes > 1:
+        results = measure_in_processes(args)
+    else:
+        selected = [(name, function) for name, function in cases(args) if not args.filter or args.filter in name]
+        selected.append(calibration_case())
+        results = {name: {"min_us": min(rounds) * 1e6, "median_us": statistics.median(rounds) * 1e6}
+                   for name, rounds in measure(selected, args.repeat, args.min_time).items()}
+    print(f"{'case':<48}{'min us':>12}{'median us':>12}")
+    for name, values in results.items():
+        print(f"{name:<48}{values['min_us']:>12.2f}{values['median_us']:>12.2f}")
+
+    if args.json:
+        parameters = {key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        saved.save(args.json, "micro", parameters, results)
+    if baseline and not saved.report(
+            saved.compare(baseline, normalize(results, baseline), METRICS, args.threshold,
+                          thresholds(baseline, args.threshold, args.short_threshold)),
+            baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
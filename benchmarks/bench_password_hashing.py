@@ -0,0 +1,91 @@
+"""
+Event-loop lag during a login storm: bcrypt called inline in a coroutine
+(the old `crud.authenticate`) versus `security.password_hasher`.
+
+    python -m benchmarks.bench_password_hashing --logins 40 --concurrency 20
+
+A ticker coroutine sleeps for a fixed interval and records how late it wakes
+up; with the executor the lag should stay flat while logins are running.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+TICK = 0.005
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def storm(login, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await login()
+
+    await asyncio.gather(*(one() for _ in range(logins)))
+
+
+async def run(mode, hashed, args):
+    from app.core.security import PasswordHasher, verify_password
+
+    hasher = PasswordHasher(workers=args.workers, max_waiting=args.logins, executor=args.executor)
+
+    async def inline_login():
+        verify_password("password123", hashed)
+
+    async def executor_login():
+        await hasher.verify_and_update("password123", hashed)
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    started = time.perf_counter()
+    await storm(inline_login if mode == "inline" else executor_login, args.logins, args.concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+    hasher.shutdown()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "logins_per_sec": args.logins / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if len(lags) > 1 else lags[-1] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+        "ticks": len(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    args = parser.parse_args()
+
+    # must be set before app.core.security builds its CryptContext
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from app.core.security import get_password_hash
+
+    hashed = get_password_hash("password123")
+
+    print(f"{'mode':<10}{'logins/s':>10}{'lag p50 ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}{'ticks':>8}")
+    for mode in ("inline", "executor"):
+        result = asyncio.run(run(mode, hashed, args))
+        print(f"{result['mode']:<10}{result['logins_per_sec']:>10.1f}{result['lag_p50_ms']:>12.2f}"
+              f"{result['lag_p99_ms']:>12.2f}{result['lag_max_ms']:>12.2f}{result['ticks']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+A/B of the receipt read engines (RECEIPT_LIST_READ_ENGINE /
+RECEIPT_DETAIL_READ_ENGINE): ORM objects + pydantic ("orm") versus JSON
+documents assembled by Postgres ("sql").
+
+    python -m benchmarks.bench_receipt_reads --receipts 2000 --products 5 --page-size 10 100 --requests 200
+
+Seeds one user with `--receipts` receipts in the configured database, then
+calls `GET /receipts/` and `GET /receipts/{id}/` in-process (ASGI, no
+network) with each engine. Both engines must return identical bytes.
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+API = "/swagger/api/v1/products"
+
+
+async def seed(receipts, products):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker, get_engine
+    from app.database.migrations import run_migrations
+
+    await run_migrations(get_engine())
+    user_id = uuid4()
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) VALUES (:id, :name, :name, 'x')"
+        ), {"id": user_id, "name": f"bench-{user_id}@example.com"})
+        await session.execute(text(
+            "INSERT INTO receipts (user_id, created_at, total, rest, payment_type, payment_amount, recept_url) "
+            "SELECT :id, now() - make_interval(secs => n), n * 1.25, 0.75, "
+            "CASE WHEN n % 2 = 0 THEN 'cash' ELSE 'card' END, n * 1.25 + 0.75, 'https://example.com/' || n "
+            "FROM generate_series(1, :receipts) AS n"
+        ), {"id": user_id, "receipts": receipts})
+        await session.execute(text(
+            "INSERT INTO products (receipt_id, name, price, quantity, total) "
+            "SELECT r.id, 'Товар №' || i, 12.5, i, 12.5 * i FROM receipts r, generate_series(1, :products) AS i "
+            "WHERE r.user_id = :id"
+        ), {"id": user_id, "products": products})
+        receipt_id = (await session.execute(text(
+            "SELECT id FROM receipts WHERE user_id = :id LIMIT 1"), {"id": user_id})).scalar()
+        await session.commit()
+    return user_id, receipt_id
+
+
+async def cleanup(user_id):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker
+
+    async with async_session_maker() as session:
+        params = {"id": user_id}
+        await session.execute(text("DELETE FROM products WHERE receipt_id IN "
+                                   "(SELECT id FROM receipts WHERE user_id = :id)"), params)
+        await session.execute(text("DELETE FROM receipts WHERE user_id = :id"), params)
+        await session.execute(text("DELETE FROM users WHERE id = :id"), params)
+        await session.commit()
+
+
+async def run(client, url, params, headers, requests):
+    body = None
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for _ in range(requests):
+        response = await client.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        body = response.content
+    return body, (time.perf_counter() - wall) / requests, (time.process_time() - cpu) / requests
+
+
+async def main_async(args):
+    import httpx
+
+    from app.core.security import create_access_token
+    from app.database.async_connect import dispose_engine
+    from app.main import app
+    from app.settings.config import settings
+
+    user_id, receipt_id = await seed(args.receipts, args.products)
+    headers = {"Authorization": "Bearer " + create_access_token(user_id, timedelta(hours=1))}
+    cases = [(f"list, page {size}", "RECEIPT_LIST_READ_ENGINE", f"{API}/receipts/",
+              {"limit": size, "pagination": "cursor", "count": "none"}) for size in args.page_size]
+    cases.append(("detail", "RECEIPT_DETAIL_READ_ENGINE", f"{API}/receipts/{receipt_id}/", {}))
+
+    print(f"{'endpoint':<16}{'engine':>7}{'ms/request':>12}{'cpu ms':>9}{'speedup':>9}")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for name, setting, url, params in cases:
+                bodies = {}
+                baseline = None
+                for engine in ("orm", "sql"):
+                    setattr(settings, setting, engine)
+                    await run(client, url, params, headers, 5)
+                    bodies[engine], wall, cpu = await run(client, url, params, headers, args.requests)
+                    baseline = baseline or wall
+                    print(f"{name:<16}{engine:>7}{wall * 1000:>12.2f}{cpu * 1000:>9.2f}{baseline / wall:>8.2f}x")
+                assert bodies["orm"] == bodies["sql"], f"{name}: the engines returned different bodies"
+    finally:
+        await cleanup(user_id)
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--page-size", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Per-receipt cost of the text layout: the old hand-written f-string layout
+versus the compiled `app.core.receipt_text` layout, single and multi-width.
+
+    python -m benchmarks.bench_receipt_render --receipts 2000 --products 5
+
+Every mode renders the same receipts for the 32-, 42- and 48-column widths
+terminals ask for, so the numbers are directly comparable.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+WIDTHS = (32, 42, 48)
+NAMES = ["Молоко 2.5%", "Хліб білий нарізний", "Сир твердий Гауда ваговий", "Вода мінеральна 1.5л",
+         "Ковбаса лікарська варена вищого ґатунку", "Яблука"]
+
+
+def legacy_split_long_words(text, line_width):
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        if len(current_line) + len(word) + 1 <= line_width:
+            current_line += (" " if current_line else "") + word
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+
+def legacy_render(receipt, line_width):
+    products = list(receipt.products)
+    lines = ["ФОП Джонсонюк Борис".center(line_width, ' '), "=" * line_width]
+    for index, product in enumerate(products):
+        quantity_price = f"{product.quantity:.2f} x {product.price:.2f}"
+        total_price = f"{product.total:.2f}"
+        for wrapped_line in legacy_split_long_words(product.name, line_width):
+            lines.append(wrapped_line)
+        spaces = line_width - len(quantity_price) - len(total_price)
+        lines.append(f"{quantity_price}{' ' * spaces}{total_price}")
+        if index < len(products) - 1:
+            lines.append("-" * line_width)
+    lines.append("=" * line_width)
+    total = receipt.total
+    lines.append(f"СУМА{' ' * (line_width - len('СУМА') - len(f'{total:.2f}'))}{total:.2f}")
+    payment_name = "Готівка" if receipt.payment_type == "cash" else "Картка"
+    amount = receipt.payment_amount
+    lines.append(f"{payment_name}{' ' * (line_width - len(payment_name) - len(f'{amount:.2f}'))}{amount:.2f}")
+    rest = receipt.rest
+    lines.append(f"Решта{' ' * (line_width - len('Решта') - len(f'{rest:.2f}'))}{rest:.2f}")
+    lines.append("=" * line_width)
+    lines.append(receipt.created_at.strftime("%d.%m.%Y %H:%M").center(line_width, ' '))
+    lines.append("Дякуємо за покупку!".center(line_width, ' '))
+    return lines
+
+
+def make_receipts(count, products, seed=0):
+    rng = random.Random(seed)
+    receipts = []
+    for _ in range(count):
+        items = []
+        for _ in range(products):
+            price = round(rng.uniform(1, 500), 2)
+            quantity = float(rng.randint(1, 5))
+            items.append(SimpleNamespace(name=rng.choice(NAMES), price=price, quantity=quantity,
+                                         total=price * quantity))
+        total = sum(item.total for item in items)
+        receipts.append(SimpleNamespace(products=items, total=total, payment_type=rng.choice(["cash", "card"]),
+                                        payment_amount=total + 10, rest=10.0, created_at=datetime.now()))
+    return receipts
+
+
+def legacy(receipts):
+    for receipt in receipts:
+        for width in WIDTHS:
+            legacy_render(receipt, width)
+
+
+def compiled(receipts):
+    from app.core.receipt_text import render_receipts
+
+    for width in WIDTHS:
+        render_receipts(receipts, width)
+
+
+def compiled_multi_width(receipts):
+    from app.core.receipt_text import render_receipt_widths
+
+    for receipt in receipts:
+        render_receipt_widths(receipt, WIDTHS)
+
+
+def measure(render, receipts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(receipts)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    receipts = make_receipts(args.receipts, args.products)
+    renders = args.receipts * len(WIDTHS)
+
+    print(f"{'mode':<22}{'us/receipt/width':>18}{'renders/s':>12}{'speedup':>9}")
+    baseline = None
+    for name, render in (("legacy", legacy), ("compiled", compiled), ("compiled multi-width", compiled_multi_width)):
+        elapsed = measure(render, receipts, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<22}{elapsed / renders * 1e6:>18.2f}{renders / elapsed:>12.0f}{baseline / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Latency of `app.core.search.search_receipts` over a large products table.
+
+    python -m benchmarks.bench_search --users 2000 --receipts 100 --products 5 --queries 200
+
+Seeds `users * receipts * products` product rows in the configured
+database (removed afterwards), then reports p50/p95/p99 per query kind for
+a random user. Fuzzy queries use the trigram index when pg_trgm is
+installed and fall back to substring search otherwise.
+"""
+import argparse
+import asyncio
+import random
+import time
+from uuid import uuid4
+
+WORDS = ["Молоко", "Хліб", "Сир", "Кава", "Чай", "Вода", "Сік", "Масло", "Яблука", "Банани", "Печиво", "Шоколад",
+         "Ковбаса", "Йогурт", "Кефір", "Рис", "Гречка", "Цукор", "Сіль", "Борошно"]
+QUERIES = {
+    "substring, common": ("олок", False),
+    "substring, rare": ("Шоколад 7", False),
+    "fuzzy": ("Шакалад", True),
+}
+
+
+async def seed(tag, users, receipts, products):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker, get_engine
+
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "INSERT INTO users (username, email, hashed_password) "
+            "SELECT :tag || '-' || n, :tag || '-' || n || '@example.com', 'x' FROM generate_series(1, :users) AS n"
+        ), {"tag": tag, "users": users})
+        await session.execute(text(
+            "INSERT INTO receipts (user_id, created_at, total, rest, payment_type, payment_amount) "
+            "SELECT u.id, now() - make_interval(mins => n), 1, 0, 'cash', 1 "
+            "FROM users u, generate_series(1, :receipts) AS n WHERE u.username LIKE :tag || '-%'"
+        ), {"tag": tag, "receipts": receipts})
+        await session.execute(text(
+            "INSERT INTO products (receipt_id, name, price, quantity, total) "
+            "SELECT r.id, (CAST(:words AS text[]))[1 + abs(hashtext(r.id::text || i)) % :count] || ' ' || (i * 7 % 100), "
+            "1, 1, 1 "
+            "FROM receipts r JOIN users u ON u.id = r.user_id, generate_series(1, :products) AS i "
+            "WHERE u.username LIKE :tag || '-%'"
+        ), {"tag": tag, "products": products, "words": WORDS, "count": len(WORDS)})
+        user_ids = (await session.execute(text(
+            "SELECT id FROM users WHERE username LIKE :tag || '-%'"), {"tag": tag})).scalars().all()
+        await session.commit()
+    async with get_engine().connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE receipts"))
+        await conn.execute(text("ANALYZE products"))
+    return user_ids
+
+
+async def cleanup(tag):
+    from sqlalchemy import text
+
+    from app.database.async_connect import async_session_maker
+
+    async with async_session_maker() as session:
+        users = "SELECT id FROM users WHERE username LIKE :tag || '-%'"
+        await session.execute(text(f"DELETE FROM products WHERE receipt_id IN "
+                                   f"(SELECT id FROM receipts WHERE user_id IN ({users}))"), {"tag": tag})
+        await session.execute(text(f"DELETE FROM receipts WHERE user_id IN ({users})"), {"tag": tag})
+        await session.execute(text(f"DELETE FROM users WHERE id IN ({users})"), {"tag": tag})
+        await session.commit()
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def main_async(args):
+    from app.core.search import search_receipts, trigram_available
+    from app.database.async_connect import async_session_maker, dispose_engine
+
+    tag = f"bench-search-{uuid4().hex[:8]}"
+    rng = random.Random(0)
+    try:
+        started = time.perf_counter()
+        user_ids = await seed(tag, args.users, args.receipts, args.products)
+        print(f"seeded {args.users * args.receipts * args.products} products in {time.perf_counter() - started:.1f}s")
+        async with async_session_maker() as session:
+            print(f"pg_trgm: {await trigram_available(session)}")
+        print(f"{'query':<20}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}")
+        for name, (query, fuzzy) in QUERIES.items():
+            samples = []
+            for _ in range(args.queries):
+                async with async_session_maker() as session:
+                    started = time.perf_counter()
+                    await search_receipts(session, user_id=rng.choice(user_ids), query=query, fuzzy=fuzzy)
+                    samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            print(f"{name:<20}{percentile(samples, 0.5):>8.1f}{percentile(samples, 0.95):>8.1f}"
+                  f"{percentile(samples, 0.99):>8.1f}")
+    finally:
+        await cleanup(tag)
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--receipts", type=int, default=100)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+CPU cost of serializing one `GET /receipts/` page: the old path (hand-built
+`ReceiptOutput` models, then FastAPI's `response_model` pass and stdlib
+JSON) versus validating once from the ORM rows and encoding with pydantic-core.
+
+    python -m benchmarks.bench_serialization --pages 200 --page-size 10 50 200 --products 5
+
+Both paths serialize the same transient `Receipt` objects, so database
+time is left out; the outputs are checked to decode to the same JSON.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+from uuid import uuid4
+
+NAMES = ["Молоко 2.5%", "Хліб білий нарізний", "Сир твердий Гауда ваговий", "Вода мінеральна 1.5л", "Яблука"]
+
+
+def make_receipts(count, products, seed=0):
+    from app.models.products import Products, Receipt
+
+    rng = random.Random(seed)
+    receipts = []
+    for _ in range(count):
+        items = []
+        for _ in range(products):
+            price = round(rng.uniform(1, 500), 2)
+            quantity = float(rng.randint(1, 5))
+            items.append(Products(id=uuid4(), name=rng.choice(NAMES), price=price, quantity=quantity,
+                                  total=price * quantity))
+        total = round(sum(item.total for item in items), 2)
+        receipts.append(Receipt(id=uuid4(), products=items, total=total, payment_type=rng.choice(["cash", "card"]),
+                                payment_amount=total + 10, rest=10.0, created_at=datetime.now(timezone.utc),
+                                recept_url=f"https://example.com/{uuid4()}.txt"))
+    return receipts
+
+
+async def legacy(receipts, field):
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    from app.schemas import products
+
+    content = {
+        "total_count": len(receipts),
+        "items": [
+            products.ReceiptOutput(
+                id=receipt.id,
+                products=[
+                    products.ProductOutput(
+                        name=product.name,
+                        price=product.price,
+                        quantity=product.quantity,
+                        total=product.total
+                    ) for product in receipt.products
+                ],
+                payment=products.ReceiptPayment(type=receipt.payment_type, amount=receipt.payment_amount),
+                total=receipt.total,
+                rest=receipt.rest,
+                created_at=receipt.created_at,
+                recept_url=receipt.recept_url
+            ) for receipt in receipts
+        ],
+        "next_cursor": None
+    }
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def single_pass(receipts, field):
+    from app.schemas import products
+
+    page = products.ReceiptPage.model_validate(
+        {"total_count": len(receipts), "items": receipts, "next_cursor": None}, from_attributes=True
+    )
+    return page.model_dump_json().encode()
+
+
+async def measure(serialize, receipts, field, pages):
+    started = time.process_time()
+    for _ in range(pages):
+        await serialize(receipts, field)
+    return (time.process_time() - started) / pages
+
+
+async def compare(receipts, field, pages):
+    assert json.loads(await legacy(receipts, field)) == json.loads(await single_pass(receipts, field))
+    return await measure(legacy, receipts, field, pages), await measure(single_pass, receipts, field, pages)
+
+
+def main():
+    from fastapi.utils import create_model_field
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-size", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--products", type=int, default=5)
+    args = parser.parse_args()
+
+    # the response_model of the old endpoint
+    field = create_model_field(name="Response_get_all_receipts", type_=Dict[str, Any], mode="serialization")
+
+    print(f"{'page size':>10}{'legacy ms/page':>16}{'single-pass ms/page':>21}{'speedup':>9}")
+    for size in args.page_size:
+        receipts = make_receipts(size, args.products)
+        old, new = asyncio.run(compare(receipts, field, args.pages))
+        print(f"{size:>10}{old * 1000:>16.3f}{new * 1000:>21.3f}{old / new:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Import time and cold-start time of the application, each measured in a
+fresh interpreter.
+
+    python -m benchmarks.bench_startup --runs 5
+
+"import" is `import app.main`; "cold start" additionally runs the lifespan
+(database readiness check, migrations, job queue) until the app can serve,
+then shuts it down. The slowest `app.*` modules are listed from
+`python -X importtime`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+COLD_START_SCRIPT = """
+import asyncio, time
+started = time.perf_counter()
+from app.main import app
+
+async def start():
+    async with app.router.lifespan_context(app):
+        print(time.perf_counter() - started)
+
+asyncio.run(start())
+"""
+
+
+def run(script, env):
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_modules(env, count):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip().startswith("app"):
+            modules.append((int(parts[0].split(":")[1]), parts[2].strip()))
+    return sorted(modules, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest app modules to list")
+    parser.add_argument("--skip-cold-start", action="store_true", help="only measure imports (no database needed)")
+    args = parser.parse_args()
+
+    env = {**os.environ, "STORAGE_BACKEND": os.environ.get("STORAGE_BACKEND", "memory")}
+    measurements = [("import", IMPORT_SCRIPT)]
+    if not args.skip_cold_start:
+        measurements.append(("cold start", COLD_START_SCRIPT))
+
+    print(f"{'phase':<12}{'min ms':>10}{'median ms':>12}{'max ms':>10}")
+    for name, script in measurements:
+        started = time.perf_counter()
+        times = [run(script, env) * 1000 for _ in range(args.runs)]
+        print(f"{name:<12}{min(times):>10.1f}{statistics.median(times):>12.1f}{max(times):>10.1f}"
+              f"   ({time.perf_counter() - started:.1f}s total)")
+
+    print("\nslowest app modules (self time):")
+    for self_us, module in slowest_modules(env, args.top):
+        print(f"  {self_us / 1000:>8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Machine-readable benchmark results: a run saved as JSON and compared with a baseline run.
+
+    {"benchmark": "load", "environment": {...}, "parameters": {...},
+     "results": {"<case>": {"<metric>": <number>, ...}, ...}}
+
+`compare` checks the metrics the benchmark names, each with the direction
+that is better ("lower" for latencies, "higher" for throughput); a change
+in the worse direction by more than the threshold is a regression.
+"""
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+
+def environment() -> dict:
+    """What the numbers depend on besides the code: interpreter, machine and commit."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save(path: str, benchmark: str, parameters: dict, results: Dict[str, Dict[str, float]]) -> None:
+    document = {"benchmark": benchmark, "environment": environment(), "parameters": parameters, "results": results}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def load(path: str, benchmark: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        document = json.load(file)
+    if document.get("benchmark") != benchmark:
+        raise ValueError(f"{path} holds {document.get('benchmark')!r} results, not {benchmark!r}")
+    return document
+
+
+class Change(NamedTuple):
+    case: str
+    metric: str
+    baseline: float
+    current: float
+    # relative change: 0.1 - 10% up, -0.1 - 10% down
+    change: float
+    regressed: bool
+
+
+def compare(baseline: dict, current: Dict[str, Dict[str, float]], metrics: Dict[str, str],
+            threshold: float, thresholds: Optional[Dict[str, float]] = None) -> List[Change]:
+    """
+    Changes of `metrics` ({name: "lower" or "higher"}) in the cases present
+    in both runs; `thresholds` overrides `threshold` per case.
+    """
+    changes = []
+    for case, values in current.items():
+        previous = baseline["results"].get(case)
+        if previous is None:
+            continue
+        for metric, better in metrics.items():
+            if metric not in values or metric not in previous or not previous[metric]:
+                continue
+            change = (values[metric] - previous[metric]) / previous[metric]
+            worse = change if better == "lower" else -change
+            limit = thresholds.get(case, threshold) if thresholds else threshold
+            changes.append(Change(case, metric, previous[metric], values[metric], change, worse > limit))
+    return changes
+
+
+def report(changes: List[Change], baseline: dict, threshold: float) -> bool:
+    """Prints the comparison; True if nothing regressed."""
+    commit: Optional[str] = baseline["environment"].get("commit")
+    print(f"\ncompared with {commit or 'baseline'} from {baseline['environment']['created_at']}, "
+          f"threshold {threshold:.0%}")
+    print(f"{'case':<44}{'metric':>10}{'baseline':>12}{'current':>12}{'change':>9}")
+    for change in changes:
+        flag = "  REGRESSION" if change.regressed else ""
+        print(f"{change.case:<44}{change.metric:>10}{change.baseline:>12.4g}{change.current:>12.4g}"
+              f"{change.change:>+9.1%}{flag}")
+    regressions = [change for change in changes if change.regressed]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {threshold:.0%}", file=sys.stderr)
+    return not regressions